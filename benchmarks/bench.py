@@ -0,0 +1,303 @@
+# Бенчмарки горячих путей: сохранение, загрузка, пагинация, статистика, розыгрыш раундов и вывод экранов
+# Запуск: python -m benchmarks.bench --sizes 1000 10000 --output bench.json [--baseline old.json]
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from game.settings import DATE_FORMAT, GAME_LEVELS, get_level_name, clear
+from game.score import ScoreManager
+from game.simulator import Simulator
+from game.engine import GameEngine, run_game
+from game.frontends import NullFrontend
+from game.rules import resolve_round, get_ruleset, RULESET_TABLES
+from game.render import FrameRenderer
+from game.legacy import iter_legacy_results
+
+# Допустимое замедление медианы относительно базовой линии
+REGRESSION_THRESHOLD = 1.2
+
+
+def generate_history(path, size, seed=0):
+    # Пишет синтетический game_results.json из size записей в формате json.dump(indent=2)
+    rng = random.Random(seed)
+    players = [f"Игрок{i}" for i in range(max(10, size // 100))]
+    levels = list(GAME_LEVELS.values())
+    start = datetime(2025, 1, 1)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("[\n")
+        for i in range(size):
+            rounds = rng.choice(levels)
+            record = {
+                "Дата": (start + timedelta(seconds=rng.randrange(365 * 24 * 3600))).strftime(DATE_FORMAT),
+                "Игрок": rng.choice(players),
+                "Уровень игры": get_level_name(rounds),
+                "Количество раундов": rounds,
+                "Итоговый счет": rng.randint(-3 * rounds, 3 * rounds)
+            }
+            text = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            file.write(("  " if i == 0 else ",\n  ") + text)
+        file.write("\n]")
+
+
+def measure(func, repeat):
+    # Время каждого вызова func в секундах
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def measure_peak_memory(func):
+    # Пиковое выделение памяти за один вызов func в байтах
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(sorted_values, fraction):
+    # Перцентиль по отсортированному списку
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(timings, operations_per_call, peak_memory):
+    # Сводка метрик: пропускная способность, перцентили задержек, пиковая память
+    ordered = sorted(timings)
+    total_time = sum(timings)
+    return {
+        "calls": len(timings),
+        "throughput_per_s": operations_per_call * len(timings) / total_time if total_time > 0 else None,
+        "latency_ms": {
+            "mean": total_time / len(timings) * 1000,
+            "p50": percentile(ordered, 0.50) * 1000,
+            "p90": percentile(ordered, 0.90) * 1000,
+            "p99": percentile(ordered, 0.99) * 1000,
+            "max": ordered[-1] * 1000
+        },
+        "peak_memory_bytes": peak_memory
+    }
+
+
+def bench_case(name, func, repeat, operations_per_call=1):
+    # Замер одной операции: сначала время, затем отдельный проход для памяти
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        func()
+        timings = measure(func, repeat)
+        peak_memory = measure_peak_memory(func)
+    print(f"  {name}: p50 {percentile(sorted(timings), 0.5) * 1000:.3f} мс", file=sys.stderr)
+    return summarize(timings, operations_per_call, peak_memory)
+
+
+def bench_history(size, repeat, workdir):
+    # Все замеры для истории из size записей
+    results_file = os.path.join(workdir, f"history_{size}.json")
+    generate_history(results_file, size)
+    heavy_repeat = max(1, min(repeat, 5)) if size > 100_000 else repeat
+    cases = {}
+    # Потоковое чтение старого массива, через которое идет перенос истории при первом открытии
+    cases["parse_legacy"] = bench_case(
+        "parse_legacy", lambda: sum(1 for _ in iter_legacy_results(results_file)), heavy_repeat, size)
+    score_manager = ScoreManager(results_file)
+    per_page = 8
+    total_pages = score_manager._calculate_total_pages(size, per_page)
+    rng = random.Random(size)
+
+    started = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        score_manager.storage.count()
+        score_manager.get_statistics()
+    cases["first_open"] = {"seconds": time.perf_counter() - started}
+
+    cases["load_results"] = bench_case("load_results", score_manager._load_results, heavy_repeat, size)
+    loaded = score_manager._load_results()
+    cases["sort_all"] = bench_case(
+        "sort_all", lambda: sorted(loaded, key=lambda x: x.get('Дата', ''), reverse=True), heavy_repeat, size)
+    del loaded
+    cases["display_page"] = bench_case(
+        "display_page",
+        lambda: score_manager._display_page(rng.randrange(total_pages), per_page, total_pages, size), repeat)
+    cases["show_statistics"] = bench_case("show_statistics", score_manager._show_statistics, repeat)
+    cases["save_result"] = bench_case(
+        "save_result", lambda: score_manager.save_result("Бенчмарк", 5, rng.randint(-15, 15)), repeat)
+    return cases
+
+
+def bench_rounds(repeat):
+    # Замер розыгрыша раундов: чистое правило, игра движка против голых бросков и полная игра симулятора
+    rng = random.Random(0)
+    rolls = [(rng.randint(1, 6), rng.randint(1, 6)) for _ in range(100_000)]
+    simulator = Simulator(0)
+    resolve = get_ruleset().resolve
+    cases = {
+        "resolve_round": bench_case(
+            "resolve_round", lambda: [resolve_round(p, c) for p, c in rolls], repeat, len(rolls)),
+        "ruleset_resolve": bench_case(
+            "ruleset_resolve", lambda: [resolve(p, c) for p, c in rolls], repeat, len(rolls)),
+        "simulate_long_game": bench_case(
+            "simulate_long_game", lambda: simulator.run(10_000, "3"), repeat, 10_000)
+    }
+    # Цена движка: игры с пустым фронтендом против тех же бросков голым randint (с перебросами ничьих)
+    games, rounds_total = 1_000, 10
+
+    def play_engine_games():
+        for _ in range(games):
+            run_game(GameEngine("Бенчмарк", rounds_total, rng=rng), NullFrontend())
+
+    def play_raw_games():
+        randint = rng.randint
+        for _ in range(games):
+            score = 0
+            for _ in range(rounds_total):
+                player_roll = computer_roll = 0
+                while player_roll == computer_roll:
+                    player_roll, computer_roll = randint(1, 6), randint(1, 6)
+                score += player_roll - computer_roll
+
+    cases["engine_null_game"] = bench_case("engine_null_game", play_engine_games, repeat, games)
+    cases["raw_dice_game"] = bench_case("raw_dice_game", play_raw_games, repeat, games)
+    # Полная игра по каждым правилам из настроек: цена не должна расти с числом кубиков
+    for name, ruleset in RULESET_TABLES.items():
+        ruleset_simulator = Simulator(0, ruleset)
+        cases[f"simulate_long_game_{name}"] = bench_case(
+            f"simulate_long_game_{name}", lambda: ruleset_simulator.run(10_000, "3"), repeat, 10_000)
+    return cases
+
+
+class CountingWriter(io.RawIOBase):
+    # Сырой поток в /dev/null, считающий вызовы записи и байты (как write() в терминал)
+
+    def __init__(self):
+        self.fd = os.open(os.devnull, os.O_WRONLY)
+        self.writes = 0
+        self.bytes = 0
+
+    def writable(self):
+        return True
+
+    def fileno(self):
+        return self.fd
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+        return os.write(self.fd, data)
+
+    def close(self):
+        if not self.closed:
+            os.close(self.fd)
+        super().close()
+
+
+def bench_render(size, screens, workdir):
+    # Байты и вызовы записи на экран результатов: обычный построчный вывод против покадрового
+    results_file = os.path.join(workdir, f"render_{size}.json")
+    generate_history(results_file, size)
+    score_manager = ScoreManager(results_file)
+    per_page = 8
+    total_pages = score_manager._calculate_total_pages(size, per_page)
+    os.environ.setdefault("COLUMNS", "120")
+    os.environ.setdefault("LINES", "50")
+    cases = {}
+    for kind in ("plain", "frame"):
+        raw = CountingWriter()
+        stream = io.TextIOWrapper(raw, encoding="utf-8", line_buffering=True)
+        output = FrameRenderer(stream) if kind == "frame" else stream
+        started = time.perf_counter()
+        with redirect_stdout(output):
+            for screen in range(screens):
+                # Листание вперед-назад по первым страницам, как при навигации в меню
+                clear()
+                score_manager._display_page(screen % min(total_pages, 3), per_page, total_pages, size)
+                score_manager._show_statistics()
+                output.write("Выберите действие: ")
+                output.flush()
+        elapsed = time.perf_counter() - started
+        writes, written = (output.writes, output.bytes_written) if kind == "frame" else (raw.writes, raw.bytes)
+        stream.close()
+        cases[kind] = {
+            "bytes_per_screen": written / screens,
+            "writes_per_screen": writes / screens,
+            "ms_per_screen": elapsed / screens * 1000
+        }
+        print(f"  {kind}: {written / screens:.0f} байт, {writes / screens:.1f} записей на экран", file=sys.stderr)
+    return cases
+
+
+def compare_with_baseline(report, baseline):
+    # Отношение медиан текущего прогона к базовой линии; список регрессий
+    regressions = []
+    comparison = {}
+    for group, cases in report["results"].items():
+        for name, metrics in cases.items():
+            old = baseline.get("results", {}).get(group, {}).get(name)
+            if not old or "latency_ms" not in metrics or "latency_ms" not in old:
+                continue
+            ratio = metrics["latency_ms"]["p50"] / old["latency_ms"]["p50"] if old["latency_ms"]["p50"] else None
+            comparison[f"{group}.{name}"] = ratio
+            if ratio is not None and ratio > REGRESSION_THRESHOLD:
+                regressions.append(f"{group}.{name}")
+    return comparison, regressions
+
+
+def main():
+    # Разбор аргументов и запуск всех замеров
+    parser = argparse.ArgumentParser(description="Бенчмарки игры 'КОСТИ'")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="размеры синтетических историй (10^3..10^7)")
+    parser.add_argument("--repeat", type=int, default=50, help="повторов на операцию")
+    parser.add_argument("--output", help="файл для JSON-отчета (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON-отчет прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    report = {
+        "created": datetime.now().strftime(DATE_FORMAT),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": {}
+    }
+    workdir = tempfile.mkdtemp(prefix="dice_bench_")
+    try:
+        for size in args.sizes:
+            print(f"История из {size} записей:", file=sys.stderr)
+            report["results"][f"history_{size}"] = bench_history(size, args.repeat, workdir)
+        print("Розыгрыш раундов:", file=sys.stderr)
+        report["results"]["rounds"] = bench_rounds(min(args.repeat, 20))
+        print("Вывод экранов:", file=sys.stderr)
+        report["results"]["render"] = bench_render(args.sizes[0], args.repeat, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            report["baseline_ratio_p50"], regressions = compare_with_baseline(report, json.load(file))
+        report["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# Нагрузочная проверка хранилища результатов из нескольких процессов
+# Писатели одновременно сохраняют результаты, читатели в это время читают журнал, страницы и статистику;
+# в конце проверяется, что ни один результат не потерян и агрегат статистики совпадает с пересчетом
+# Запуск: python -m benchmarks.stress --writers 8 --readers 4 --games 500 [--backend sqlite]
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from benchmarks.bench import generate_history
+from game.score import ScoreManager, make_result
+from game.stats import StatsAggregate, load_aggregate
+from game.storage import create_storage
+
+
+def run_writer(results_file, backend, writer, games, batch):
+    # Сохраняет games результатов пачками по batch; имя игрока - номер писателя
+    score_manager = ScoreManager(results_file, create_storage(results_file, backend))
+    for start in range(0, games, batch):
+        score_manager.save_results([make_result(f"Писатель{writer}", 5, (start + i) % 7 - 3)
+                                    for i in range(min(batch, games - start))])
+    return games
+
+
+def run_reader(results_file, backend, stop_file):
+    # Пока нет stop_file, читает журнал, страницы и статистику; возвращает (проходов, ошибок)
+    score_manager = ScoreManager(results_file, create_storage(results_file, backend))
+    passes = errors = 0
+    previous = 0
+    while not os.path.exists(stop_file):
+        total = sum(1 for _ in score_manager.storage.iter_results())
+        page = score_manager.storage.read_page(0, 8)
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+            stats = score_manager.get_statistics()
+        # Число записей только растет, страница не пустая, агрегат не отстает от прочитанного раньше
+        if total < previous or not page or stats.total.games < previous:
+            errors += 1
+        previous = total
+        passes += 1
+    return passes, errors
+
+
+def main():
+    # Запуск писателей и читателей в пуле процессов и итоговая проверка
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка хранилища результатов 'КОСТИ'")
+    parser.add_argument("--writers", type=int, default=8, help="процессов-писателей")
+    parser.add_argument("--readers", type=int, default=4, help="процессов-читателей")
+    parser.add_argument("--games", type=int, default=500, help="результатов на писателя")
+    parser.add_argument("--batch", type=int, default=1, help="результатов в одном сохранении")
+    parser.add_argument("--history", type=int, default=1000, help="записей в старом JSON-массиве")
+    parser.add_argument("--backend", default="jsonl", choices=["jsonl", "sqlite", "segments"], help="хранилище")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="dice_stress_")
+    try:
+        results_file = os.path.join(workdir, "game_results.json")
+        stop_file = os.path.join(workdir, "stop")
+        # Старый JSON-массив: писатели одновременно запускают его перенос в журнал
+        generate_history(results_file, args.history)
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.writers + args.readers) as executor:
+            readers = [executor.submit(run_reader, results_file, args.backend, stop_file)
+                       for _ in range(args.readers)]
+            writers = [executor.submit(run_writer, results_file, args.backend, writer, args.games, args.batch)
+                       for writer in range(args.writers)]
+            written = sum(future.result() for future in writers)
+            elapsed = time.perf_counter() - started
+            # Читатели работают, пока идет запись
+            open(stop_file, 'w').close()
+            passes = sum(future.result()[0] for future in readers)
+            errors = sum(future.result()[1] for future in readers)
+        print(f"Записано {written} результатов за {elapsed:.2f} с ({written / elapsed:.0f} в секунду)")
+        print(f"Проходов читателей: {passes}")
+
+        storage = create_storage(results_file, args.backend)
+
+        results = list(storage.iter_results())
+        expected = args.history + written
+        counts = {}
+        for result in results:
+            counts[result["Игрок"]] = counts.get(result["Игрок"], 0) + 1
+        lost = [writer for writer in range(args.writers) if counts.get(f"Писатель{writer}", 0) != args.games]
+        stats = load_aggregate(ScoreManager(results_file, storage).stats_file)
+        rebuilt = StatsAggregate.from_results(results)
+        checks = {
+            "читатели не видели откатов и пустых страниц": not errors,
+            "все записи на месте": len(results) == expected,
+            "ни один писатель не потерял результаты": not lost,
+            "count() совпадает с журналом": storage.count() == expected,
+            "агрегат совпадает с пересчетом":
+                stats is not None and stats.to_dict()["total"] == rebuilt.to_dict()["total"],
+        }
+        for name, ok in checks.items():
+            print(f"  {'OK ' if ok else 'ОШИБКА'} {name}")
+        return 0 if all(checks.values()) else 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# Потоковая аналитика результатов
+# Все метрики считаются за один проход по генератору результатов с постоянной памятью на метрику
+
+from collections import Counter, deque
+from datetime import datetime
+from .settings import DATE_FORMAT, ANALYTICS_WINDOW
+from .rules import get_outcome
+
+
+class RollingWinRate:
+    # Процент побед за последние window игр
+
+    def __init__(self, window=ANALYTICS_WINDOW):
+        # Окно последних исходов
+        self.window = deque(maxlen=window)
+        self.wins = 0
+
+    def add(self, result):
+        # Учитывает одну игру
+        if len(self.window) == self.window.maxlen and self.window[0] > 0:
+            self.wins -= 1
+        outcome = get_outcome(result.get('Итоговый счет', 0))
+        self.window.append(outcome)
+        if outcome > 0:
+            self.wins += 1
+
+    def get_value(self):
+        # Процент побед в окне
+        return (self.wins / len(self.window)) * 100 if self.window else 0
+
+
+class StreakTracker:
+    # Самые длинные серии побед и поражений каждого игрока
+
+    def __init__(self):
+        # Для игрока хранится [текущий исход, длина текущей серии, лучшая серия побед, худшая серия поражений]
+        self.players = {}
+
+    def add(self, result):
+        # Учитывает одну игру
+        player = result.get('Игрок', 'Неизвестно')
+        outcome = get_outcome(result.get('Итоговый счет', 0))
+        state = self.players.setdefault(player, [0, 0, 0, 0])
+        if outcome != 0 and outcome == state[0]:
+            state[1] += 1
+        else:
+            state[0] = outcome
+            state[1] = 1 if outcome != 0 else 0
+        if outcome > 0:
+            state[2] = max(state[2], state[1])
+        elif outcome < 0:
+            state[3] = max(state[3], state[1])
+
+    def get_longest(self, player):
+        # (самая длинная серия побед, самая длинная серия поражений) игрока
+        state = self.players.get(player, [0, 0, 0, 0])
+        return state[2], state[3]
+
+    def get_top(self, k, losses=False):
+        # Игроки с самыми длинными сериями побед (или поражений): список (игрок, длина)
+        index = 3 if losses else 2
+        ranked = sorted(self.players.items(), key=lambda item: (-item[1][index], item[0]))
+        return [(player, state[index]) for player, state in ranked[:k] if state[index] > 0]
+
+
+class ScoreHistogram:
+    # Распределение итоговых счетов по уровням
+
+    def __init__(self):
+        # Счетчик счетов для каждого уровня
+        self.levels = {}
+
+    def add(self, result):
+        # Учитывает одну игру
+        level = result.get('Уровень игры', 'Неизвестно')
+        self.levels.setdefault(level, Counter())[result.get('Итоговый счет', 0)] += 1
+
+    def get_histogram(self, level):
+        # Список (счет, число игр) по возрастанию счета
+        return sorted(self.levels.get(level, Counter()).items())
+
+
+class ActivityHistogram:
+    # Количество игр по часам суток и дням недели
+
+    def __init__(self):
+        # 24 часа и 7 дней недели
+        self.hours = [0] * 24
+        self.weekdays = [0] * 7
+
+    def add(self, result):
+        # Учитывает одну игру; записи без корректной даты пропускаются
+        try:
+            date = datetime.strptime(result.get('Дата', ''), DATE_FORMAT)
+        except (TypeError, ValueError):
+            return
+        self.hours[date.hour] += 1
+        self.weekdays[date.weekday()] += 1
+
+
+class TrendReport:
+    # Набор метрик, заполняемых одним проходом
+
+    def __init__(self, window=ANALYTICS_WINDOW):
+        # Инициализация всех метрик
+        self.games = 0
+        self.rolling_win_rate = RollingWinRate(window)
+        self.streaks = StreakTracker()
+        self.scores = ScoreHistogram()
+        self.activity = ActivityHistogram()
+        self.metrics = [self.rolling_win_rate, self.streaks, self.scores, self.activity]
+
+    def add(self, result):
+        # Передает результат всем метрикам
+        self.games += 1
+        for metric in self.metrics:
+            metric.add(result)
+
+
+def analyze(results, window=ANALYTICS_WINDOW):
+    # Считает все метрики за один проход по потоку результатов
+    report = TrendReport(window)
+    for result in results:
+        report.add(result)
+    return report
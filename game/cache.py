@@ -0,0 +1,153 @@
+# Общий кэш результатов процесса
+# Один кэш на файл хранилища для всех экземпляров ScoreManager: количество записей, агрегат статистики,
+# таблица лидеров и блоки декодированных записей в порядке сортировки по дате (LRU).
+# Кэш сверяется с файлом по (mtime, размер, inode): изменения от других процессов сбрасывают его,
+# а собственные сохранения обновляют его на месте без чтения файла
+
+import os
+import threading
+from collections import OrderedDict
+from .settings import CACHE_BLOCK_SIZE, CACHE_MAX_BLOCKS, CACHE_MAX_FILES
+from .metrics import count
+
+
+class CachedResults:
+    # Кэш одного хранилища; блок N - записи с позициями [N * block_size, (N + 1) * block_size)
+    # в порядке от старых к новым, поэтому новые результаты меняют только последний блок
+
+    def __init__(self, path, block_size=CACHE_BLOCK_SIZE, max_blocks=CACHE_MAX_BLOCKS):
+        self.path = path
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.lock = threading.RLock()
+        self.key = None
+        self.count = None
+        self.blocks = OrderedDict()
+        self.stats = None
+        self.leaderboard = None
+
+    def validate(self):
+        # Сбрасывает кэш, если файл хранилища изменился не через этот кэш
+        with self.lock:
+            key = get_file_key(self.path)
+            if key != self.key:
+                self.clear()
+                self.key = key
+
+    def clear(self):
+        # Забывает все закэшированные данные
+        with self.lock:
+            self.count = None
+            self.blocks.clear()
+            self.stats = None
+            self.leaderboard = None
+
+    def get_count(self, storage):
+        # Количество результатов
+        with self.lock:
+            self.validate()
+            if self.count is None:
+                self.count = storage.count()
+            return self.count
+
+    def read_page(self, storage, start, limit):
+        # Страница от новых к старым, как ResultStorage.read_page, собранная из блоков кэша
+        with self.lock:
+            total = self.get_count(storage)
+            end = total - start
+            begin = max(end - limit, 0)
+            if begin >= end:
+                return []
+            page = []
+            for block in range(begin // self.block_size, (end - 1) // self.block_size + 1):
+                first = block * self.block_size
+                rows = self._get_block(storage, block, total)
+                page.extend(rows[max(begin - first, 0):end - first])
+            page.reverse()
+            return page
+
+    def add_results(self, results):
+        # Учитывает результаты, только что сохраненные этим процессом (вызывается под блокировкой хранилища)
+        with self.lock:
+            if self.count is not None:
+                last = (self.count - 1) // self.block_size
+                tail = self.blocks.get(last) if self.count else []
+                if tail is not None and is_sorted_after(tail[-1] if tail else None, results):
+                    for result in results:
+                        block = self.count // self.block_size
+                        if self.count % self.block_size == 0:
+                            self.blocks[block] = []
+                        self.blocks[block].append(result)
+                        self.count += 1
+                    self._evict()
+                else:
+                    # Новые записи встанут не в конец или последний блок не загружен: блоки устарели
+                    self.blocks.clear()
+                    self.count += len(results)
+            self.key = get_file_key(self.path)
+
+    def _get_block(self, storage, block, total):
+        # Блок из кэша или из хранилища
+        rows = self.blocks.get(block)
+        if rows is not None:
+            count("cache.hits")
+            self.blocks.move_to_end(block)
+            return rows
+        count("cache.misses")
+        first = block * self.block_size
+        last = min(first + self.block_size, total)
+        rows = storage.read_page(total - last, last - first)
+        rows.reverse()
+        self.blocks[block] = rows
+        self._evict()
+        return rows
+
+    def _evict(self):
+        # Вытесняет давно не использованные блоки сверх max_blocks
+        while len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+
+
+class ResultsCache:
+    # Кэши хранилищ процесса по пути к файлу; не больше max_files файлов (LRU)
+
+    def __init__(self, max_files=CACHE_MAX_FILES):
+        self.max_files = max_files
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, storage):
+        # Кэш для хранилища
+        path = os.path.abspath(storage.get_location())
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                entry = self.entries[path] = CachedResults(path)
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_files:
+                self.entries.popitem(last=False)
+            return entry
+
+
+def get_file_key(path):
+    # Ключ проверки файла: (mtime в наносекундах, размер, inode); None, если файла нет
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def is_sorted_after(last_result, results):
+    # Встают ли results в конец сортировки по дате после last_result
+    previous = last_result.get('Дата', '') if last_result else ''
+    for result in results:
+        date = result.get('Дата', '')
+        if date < previous:
+            return False
+        previous = date
+    return True
+
+
+# Кэш процесса
+results_cache = ResultsCache()
@@ -0,0 +1,424 @@
+# Колоночный бинарный архив результатов
+# Версия 4 - набор секций-массивов: дата (секунды эпохи, int64), код уровня (uint8, номер в таблице числа раундов
+# архива), счет (int16) и таблица переполнения для записей, чье число раундов не из GAME_LEVELS_CONVERT или счет
+# не помещается в int16 (у таких код уровня 0, а раунды и счет хранятся в int32). Строки лежат в блобах:
+# имя игрока, "Правила", "Стратегия", "Параметры правил" (мало разных значений) - словарем: номер значения
+# на запись (uint8/uint16/uint32 по размеру словаря, 0 - поля нет) и смещения значений в блобе словаря;
+# "Сид" и "Броски" (свои у каждой игры) - смещением конца строки на запись (старший бит - поля нет).
+# Название уровня выводится из числа раундов, как в make_result.
+# Архив хранит запись без потерь: запись, которую нельзя восстановить побайтно (дата не в DATE_FORMAT,
+# другое название уровня, лишние поля), не архивируется - write_archive сообщает о ней ошибкой.
+# Архивы прошлых версий читаются: первой (код уровня вместо числа раундов, без необязательных полей),
+# второй (только "Сид", "Броски", "Правила") и третьей (строки словарями, раунды и счет в int32).
+# Чтение через mmap и memoryview: строки декодируются только у запрошенной записи, словари при открытии
+# не разбираются (кроме архивов версий 1-3)
+
+import argparse
+import calendar
+import json
+import mmap
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from .settings import DATE_FORMAT, GAME_LEVELS_CONVERT, get_level_name
+from .fileutil import open_atomic
+from .legacy import iter_legacy_results
+
+# Заголовок: сигнатура, версия, число записей. В версиях 2-3 за ним размеры словарей (байт, строк),
+# в версии 4 - число секций и их описания (тип элемента array, число элементов)
+ARCHIVE_MAGIC = b"DICECOL"
+ARCHIVE_VERSION = 4
+ARCHIVE_HEADER = struct.Struct('<7sBQ')
+DICTIONARY_HEADER = struct.Struct('<II')
+SECTION_COUNT = struct.Struct('<I')
+SECTION_HEADER = struct.Struct('<c3xQ')
+
+# Обязательные поля записи и необязательные строковые поля в порядке make_result
+BASE_FIELDS = ("Дата", "Игрок", "Уровень игры", "Количество раундов", "Итоговый счет")
+OPTIONAL_FIELDS = ("Сид", "Броски", "Правила", "Стратегия", "Параметры правил")
+# Сколько первых необязательных полей хранит архив версий 1-3
+OPTIONAL_COUNT = {1: 0, 2: 3, 3: len(OPTIONAL_FIELDS)}
+
+# Версии 1-3: типы столбцов в порядке расположения в файле: дата, игрок, раунды (в версии 1 - код уровня),
+# счет, затем номера значений необязательных полей
+COLUMN_TYPES = {
+    1: ('q', 'I', 'B', 'h'),
+    2: ('q', 'I', 'i', 'i') + ('I',) * OPTIONAL_COUNT[2],
+    3: ('q', 'I', 'i', 'i') + ('I',) * OPTIONAL_COUNT[3]
+}
+
+# Версия 4: строковые поля в порядке секций; True - словарем, False - строкой на запись
+STRING_FIELDS = (("Игрок", True), ("Сид", False), ("Броски", False), ("Правила", True), ("Стратегия", True),
+                 ("Параметры правил", True))
+# Коды уровней: 0 - запись в таблице переполнения, далее число раундов уровней в порядке GAME_LEVELS_CONVERT
+# (в версии 4 эта таблица сохраняется в архиве, в версии 1 берется из настроек; там 0 - неизвестный уровень)
+LEVEL_ROUNDS = [0] + list(GAME_LEVELS_CONVERT)
+# Счет записи из таблицы переполнения и допустимый счет в столбце int16
+SCORE_ESCAPE = -2 ** 15
+SCORE_LIMIT = 2 ** 15
+# Признак отсутствия поля в смещении строки на запись; смещения в блобе - меньше 2^31
+ABSENT = 1 << 31
+# Версия 1: дата, которую не удалось разобрать
+UNKNOWN_DATE = -2 ** 63
+
+
+class ColumnarArchive:
+    # Архив, отображенный в память только для чтения
+
+    def __init__(self, path):
+        # Открывает архив и размечает столбцы поверх mmap
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.columns = []
+        magic, version, count = ARCHIVE_HEADER.unpack_from(self.map, 0)
+        if magic != ARCHIVE_MAGIC or (version not in COLUMN_TYPES and version != ARCHIVE_VERSION):
+            self.close()
+            raise ValueError(f"Файл {path} не является архивом результатов")
+        self.version = version
+        self.count = count
+        if version == ARCHIVE_VERSION:
+            self._open_sections()
+        else:
+            self._open_columns()
+
+    def _open_sections(self):
+        # Версия 4: секции по таблице из заголовка; строковые поля - (словарь?, секции поля)
+        offset = ARCHIVE_HEADER.size
+        (sections,) = SECTION_COUNT.unpack_from(self.map, offset)
+        offset += SECTION_COUNT.size
+        table = []
+        for _ in range(sections):
+            typecode, items = SECTION_HEADER.unpack_from(self.map, offset)
+            table.append((typecode.decode('ascii'), items))
+            offset += SECTION_HEADER.size
+        offset = align(offset)
+        view = memoryview(self.map)
+        for typecode, items in table:
+            size = items * array(typecode).itemsize
+            self.columns.append(view[offset:offset + size].cast(typecode))
+            offset = align(offset + size)
+        (self.dates, self.levels, self.scores, self.level_rounds,
+         self.overflow_rows, self.overflow_rounds, self.overflow_scores) = self.columns[:7]
+        self.strings = []
+        position = 7
+        for field, dictionary in STRING_FIELDS:
+            width = 3 if dictionary else 2
+            self.strings.append((field, dictionary, self.columns[position:position + width]))
+            position += width
+
+    def _open_columns(self):
+        # Версии 1-3: словари строк разбираются целиком, затем столбцы
+        offset = ARCHIVE_HEADER.size
+        sizes = []
+        for _ in range(1 + OPTIONAL_COUNT[self.version]):
+            sizes.append(DICTIONARY_HEADER.unpack_from(self.map, offset))
+            offset += DICTIONARY_HEADER.size
+        self.dictionaries = []
+        for size, strings in sizes:
+            text = bytes(self.map[offset:offset + size]).decode('utf-8')
+            self.dictionaries.append(text.split("\0") if strings else [])
+            offset += size
+        offset = align(offset)
+        view = memoryview(self.map)
+        for typecode in COLUMN_TYPES[self.version]:
+            size = self.count * array(typecode).itemsize
+            self.columns.append(view[offset:offset + size].cast(typecode))
+            offset = align(offset + size)
+        self.dates, self.players, self.rounds, self.scores = self.columns[:4]
+        self.optional = self.columns[4:]
+
+    def __len__(self):
+        # Количество записей
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def count_outcomes(self):
+        # Количество побед, поражений и ничьих по столбцу счета (и таблице переполнения в версии 4)
+        wins = losses = escaped = 0
+        for score in self.scores:
+            if score > 0:
+                wins += 1
+            elif score < 0:
+                if score == SCORE_ESCAPE and self.version == ARCHIVE_VERSION:
+                    escaped += 1
+                else:
+                    losses += 1
+        if escaped:
+            for score in self.overflow_scores:
+                if score > 0:
+                    wins += 1
+                elif score < 0:
+                    losses += 1
+        return wins, losses, self.count - wins - losses
+
+    def get_rounds_score(self, index):
+        # Число раундов и счет записи
+        if self.version != ARCHIVE_VERSION:
+            rounds = self.rounds[index]
+            return (LEVEL_ROUNDS[rounds] if self.version == 1 else rounds), self.scores[index]
+        code = self.levels[index]
+        if code:
+            return self.level_rounds[code], self.scores[index]
+        position = bisect_left(self.overflow_rows, index)
+        return self.overflow_rounds[position], self.overflow_scores[position]
+
+    def get_result(self, index):
+        # Запись в формате game_results.json
+        rounds, score = self.get_rounds_score(index)
+        if self.version != ARCHIVE_VERSION:
+            return self._get_legacy_result(index, rounds, score)
+        strings = {field: get_string(dictionary, sections, index) for field, dictionary, sections in self.strings}
+        result = {
+            "Дата": format_epoch(self.dates[index]),
+            "Игрок": strings["Игрок"],
+            "Уровень игры": get_level_name(rounds),
+            "Количество раундов": rounds,
+            "Итоговый счет": score
+        }
+        for field in OPTIONAL_FIELDS:
+            if strings[field] is not None:
+                result[field] = strings[field]
+        return result
+
+    def _get_legacy_result(self, index, rounds, score):
+        # Запись архива версий 1-3
+        result = {
+            "Дата": format_epoch(self.dates[index]),
+            "Игрок": self.dictionaries[0][self.players[index]],
+            "Уровень игры": get_level_name(rounds),
+            "Количество раундов": rounds,
+            "Итоговый счет": score
+        }
+        for field, column, values in zip(OPTIONAL_FIELDS, self.optional, self.dictionaries[1:]):
+            code = column[index]
+            if code:
+                result[field] = values[code - 1]
+        return result
+
+    def iter_results(self):
+        # Потоково отдает записи в формате game_results.json
+        for index in range(self.count):
+            yield self.get_result(index)
+
+    def close(self):
+        # Освобождает представления столбцов, mmap и файл
+        for column in self.columns:
+            column.release()
+        self.columns = []
+        self.optional = []
+        self.strings = []
+        self.map.close()
+        self.file.close()
+
+
+def get_string(dictionary, sections, index):
+    # Значение строкового поля записи версии 4 или None, если поля нет; декодируется только эта строка
+    if dictionary:
+        codes, offsets, blob = sections
+        code = codes[index]
+        if not code:
+            return None
+        start, end = offsets[code - 1], offsets[code]
+    else:
+        offsets, blob = sections
+        end = offsets[index + 1]
+        if end & ABSENT:
+            return None
+        start = offsets[index] & ~ABSENT
+    return str(blob[start:end], 'utf-8')
+
+
+def get_code_type(size):
+    # Наименьший тип номера значения для словаря из size значений (номер 0 - поля нет)
+    if size < 2 ** 8:
+        return 'B'
+    if size < 2 ** 16:
+        return 'H'
+    return 'I'
+
+
+def align(offset):
+    # Выравнивание смещения столбца по 8 байтам
+    return (offset + 7) & ~7
+
+
+def parse_epoch(date):
+    # Дата в формате DATE_FORMAT -> секунды эпохи (время считается UTC, чтобы преобразование было обратимым);
+    # None, если дату нельзя восстановить из секунд в точности
+    try:
+        seconds = calendar.timegm(time.strptime(date, DATE_FORMAT))
+    except (TypeError, ValueError):
+        return None
+    return seconds if format_epoch(seconds) == date else None
+
+
+def format_epoch(seconds):
+    # Секунды эпохи -> дата в формате DATE_FORMAT
+    if seconds == UNKNOWN_DATE:
+        return ""
+    return time.strftime(DATE_FORMAT, time.gmtime(seconds))
+
+
+def check_result(result, index):
+    # Ошибка, если запись нельзя хранить в архиве без потерь; иначе возвращает дату в секундах эпохи
+    extra = set(result) - set(BASE_FIELDS) - set(OPTIONAL_FIELDS)
+    missing = set(BASE_FIELDS) - set(result)
+    problem = None
+    seconds = None if extra or missing else parse_epoch(result["Дата"])
+    if extra or missing:
+        problem = f"поля {sorted(extra or missing)} {'не хранятся в архиве' if extra else 'отсутствуют'}"
+    elif seconds is None:
+        problem = f"дата {result['Дата']!r} не в формате {DATE_FORMAT}"
+    elif not all(type(result[field]) is int and -2 ** 31 <= result[field] < 2 ** 31
+                 for field in ("Количество раундов", "Итоговый счет")):
+        problem = "число раундов и счет должны быть 32-битными целыми"
+    elif result["Уровень игры"] != get_level_name(result["Количество раундов"]):
+        problem = f"уровень {result['Уровень игры']!r} не соответствует числу раундов"
+    elif not all(isinstance(result[field], str) for field, _ in STRING_FIELDS if field in result):
+        problem = "имя игрока и необязательные поля должны быть строками"
+    if problem is not None:
+        raise ValueError(f"Запись {index} нельзя архивировать без потерь: {problem}")
+    return seconds
+
+
+class StringColumn:
+    # Строковое поле при записи архива: словарь или строки на запись в общем блобе
+
+    def __init__(self, field, dictionary):
+        self.field = field
+        self.dictionary = dictionary
+        self.blob = bytearray()
+        self.offsets = array('I', [0])
+        self.codes = array('I') if dictionary else None
+        self.values = {}
+
+    def append(self, value):
+        # Добавляет значение поля очередной записи (None - поля нет)
+        if self.dictionary:
+            if value is None:
+                self.codes.append(0)
+                return
+            code = self.values.get(value)
+            if code is None:
+                # Номера значений начинаются с 1: 0 означает отсутствие поля
+                code = self.values[value] = len(self.values) + 1
+                self._add(value)
+            self.codes.append(code)
+        elif value is None:
+            self.offsets.append(len(self.blob) | ABSENT)
+        else:
+            self._add(value)
+
+    def _add(self, value):
+        # Дописывает строку в блоб
+        self.blob += value.encode('utf-8')
+        if len(self.blob) >= ABSENT:
+            raise ValueError(f"Поле {self.field}: строки архива не помещаются в 2 ГБ")
+        self.offsets.append(len(self.blob))
+
+    def get_sections(self):
+        # Секции поля в порядке файла
+        if self.dictionary:
+            return [array(get_code_type(len(self.values) + 1), self.codes), self.offsets, array('B', self.blob)]
+        return [self.offsets, array('B', self.blob)]
+
+
+def write_archive(path, results):
+    # Записывает поток результатов в колоночный архив; возвращает число записей.
+    # Запись, которую нельзя восстановить из архива в точности, прерывает запись с ValueError
+    level_codes = {rounds: code for code, rounds in enumerate(LEVEL_ROUNDS) if code}
+    dates, levels, scores = array('q'), array('B'), array('h')
+    overflow_rows, overflow_rounds, overflow_scores = array('I'), array('i'), array('i')
+    strings = [StringColumn(field, dictionary) for field, dictionary in STRING_FIELDS]
+    count = 0
+    for index, result in enumerate(results):
+        dates.append(check_result(result, index))
+        rounds, score = result["Количество раундов"], result["Итоговый счет"]
+        code = level_codes.get(rounds)
+        if code is not None and -SCORE_LIMIT < score < SCORE_LIMIT:
+            levels.append(code)
+            scores.append(score)
+        else:
+            levels.append(0)
+            scores.append(SCORE_ESCAPE)
+            overflow_rows.append(index)
+            overflow_rounds.append(rounds)
+            overflow_scores.append(score)
+        for column in strings:
+            column.append(result.get(column.field))
+        count = index + 1
+    if count >= 2 ** 32:
+        raise ValueError("В архиве не больше 2^32 записей")
+
+    sections = [dates, levels, scores, array('i', LEVEL_ROUNDS), overflow_rows, overflow_rounds, overflow_scores]
+    for column in strings:
+        sections.extend(column.get_sections())
+    header = [ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, count), SECTION_COUNT.pack(len(sections))]
+    header.extend(SECTION_HEADER.pack(section.typecode.encode('ascii'), len(section)) for section in sections)
+    with open_atomic(path) as file:
+        size = 0
+        for part in header:
+            file.write(part)
+            size += len(part)
+        for section in sections:
+            padding = align(size) - size
+            file.write(b"\0" * padding)
+            section.tofile(file)
+            size += padding + len(section) * section.itemsize
+    return count
+
+
+def export_json(archive_path, json_path):
+    # Выгружает архив в JSON-массив формата game_results.json; возвращает число записей
+    with ColumnarArchive(archive_path) as archive, open(json_path, 'w', encoding='utf-8') as file:
+        file.write("[")
+        for index, result in enumerate(archive.iter_results()):
+            text = json.dumps(result, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            file.write(("\n  " if index == 0 else ",\n  ") + text)
+        file.write("\n]" if len(archive) else "]")
+        return len(archive)
+
+
+def import_json(json_path, archive_path):
+    # Строит архив из JSON-массива формата game_results.json, читая его потоково
+    return write_archive(archive_path, iter_legacy_results(json_path))
+
+
+def main():
+    # Командная строка: python -m game.columnar archive|export|import ...
+    from .storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Колоночный архив результатов игры 'КОСТИ'")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    archive_parser = subparsers.add_parser("archive", help="архивировать текущее хранилище результатов")
+    archive_parser.add_argument("results_file")
+    archive_parser.add_argument("archive_file")
+    export_parser = subparsers.add_parser("export", help="выгрузить архив в JSON")
+    export_parser.add_argument("archive_file")
+    export_parser.add_argument("json_file")
+    import_parser = subparsers.add_parser("import", help="построить архив из JSON")
+    import_parser.add_argument("json_file")
+    import_parser.add_argument("archive_file")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "archive":
+            count = write_archive(args.archive_file, create_storage(args.results_file).iter_results())
+        elif args.command == "export":
+            count = export_json(args.archive_file, args.json_file)
+        else:
+            count = import_json(args.json_file, args.archive_file)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Записей: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# Игровой движок - конечный автомат без ввода-вывода
+# Принимает действия (бросок, продолжение, выход) и возвращает события; отрисовкой занимаются фронтенды.
+# Фронтенд, которому события не нужны (autoplay), доигрывает игру через play_out без событий и лишних вызовов
+
+from collections import namedtuple
+from .models import Player, Computer
+from .settings import DICE_MIN, REPLAY_LOG, get_level_name
+from .rules import get_outcome, get_ruleset, CLASSIC_RULESET
+from .exceptions import InvalidRollError
+from .rng import make_rng, format_seed
+from .replay import RollLog, get_log_tables
+
+# Действия игрока
+ACTION_ROLL = "roll"
+ACTION_CONTINUE = "continue"
+ACTION_EXIT = "exit"
+
+# Состояния автомата
+STATE_NEW = "new"
+STATE_ROLL = "roll"
+STATE_CONTINUE = "continue"
+STATE_FINISHED = "finished"
+STATE_ABORTED = "aborted"
+
+# События движка
+GameStarted = namedtuple("GameStarted", "player_name rounds_total level_name")
+RoundStarted = namedtuple("RoundStarted", "round_number")
+DiceRolled = namedtuple("DiceRolled", "round_number player_roll computer_roll")
+RoundTied = namedtuple("RoundTied", "round_number")
+RoundFinished = namedtuple("RoundFinished", "round_number delta player_score computer_score")
+GameFinished = namedtuple("GameFinished", "player_score computer_score outcome")
+GameAborted = namedtuple("GameAborted", "round_number")
+
+
+class GameEngine:
+    # Состояние одной игры игрока против компьютера
+
+    def __init__(self, player_name, rounds_total, computer_strategy=None, rng=None, record_rolls=REPLAY_LOG,
+                 ruleset=None):
+        # Инициализация игры; события начинаются после start()
+        # rng - собственный генератор игры (по умолчанию новый со случайным сидом)
+        # record_rolls - вести журнал бросков для проверки результата (если пары бросков правил в него помещаются)
+        # ruleset - правила из game.rules (по умолчанию RULESET из настроек)
+        self.rng = rng or make_rng()
+        self.ruleset = ruleset or get_ruleset()
+        self.player = Player(player_name, rng=self.rng, ruleset=self.ruleset)
+        if computer_strategy is not None:
+            computer_strategy.check_ruleset(self.ruleset)
+        self.computer = Computer(strategy=computer_strategy, rng=self.rng, ruleset=self.ruleset)
+        self.rounds_total = rounds_total
+        self.current_round = 0
+        self.state = STATE_NEW
+        record_rolls = record_rolls and get_log_tables(self.ruleset.name, self.ruleset.get_spec()) is not None
+        self.roll_log = RollLog(self.ruleset.name, self.ruleset.get_spec()) if record_rolls else None
+
+    def start(self):
+        # Начинает игру и первый раунд
+        if self.state != STATE_NEW:
+            raise InvalidRollError("Игра уже начата")
+        self.state = STATE_ROLL
+        self.current_round = 1
+        return [GameStarted(self.player.get_name(), self.rounds_total, get_level_name(self.rounds_total)),
+                RoundStarted(1)]
+
+    def handle(self, action):
+        # Выполняет действие и возвращает список событий
+        if action == ACTION_ROLL:
+            return self.roll()
+        if action == ACTION_CONTINUE:
+            return self.next_round()
+        if action == ACTION_EXIT:
+            return self.abort()
+        raise InvalidRollError(f"Неизвестное действие: {action}")
+
+    def roll(self):
+        # Бросок кубиков в текущем раунде; при ничьей раунд ждет повторного броска
+        if self.state != STATE_ROLL:
+            raise InvalidRollError("Сейчас нельзя бросать кубик")
+        lead = self.player.get_score()
+        player_roll = self.player.roll_dice(lead)
+        computer_roll = self.computer.roll_dice(-lead)
+        rolled = DiceRolled(self.current_round, player_roll, computer_roll)
+        if self.roll_log is not None:
+            self.roll_log.append(player_roll, computer_roll)
+        delta = self.ruleset.resolve(player_roll, computer_roll)
+        if delta is None:
+            return [rolled, RoundTied(self.current_round)]
+
+        self.player.add_score(delta)
+        finished = RoundFinished(self.current_round, delta, self.player.get_score(), self.computer.get_score())
+        if self.current_round < self.rounds_total:
+            self.state = STATE_CONTINUE
+            return [rolled, finished]
+
+        self.state = STATE_FINISHED
+        score = self.player.get_score()
+        return [rolled, finished, GameFinished(score, self.computer.get_score(), get_outcome(score))]
+
+    def play_out(self):
+        # Доигрывает игру без событий: бросок в каждом раунде и переход к следующему, как NullFrontend.
+        # Броски, журнал и счет те же, что при пошаговой игре; честный одиночный кубик бросается randint напрямую
+        if self.state not in (STATE_ROLL, STATE_CONTINUE):
+            raise InvalidRollError("Игра не идет")
+        player, computer, ruleset = self.player, self.computer, self.ruleset
+        fair = (player.strategy is None and computer.strategy is None and ruleset.dice == 1
+                and player.rng is computer.rng)
+        randint, max_face = player.rng.randint, ruleset.max_face
+        delta_table, min_value = ruleset.delta_table, ruleset.min_value
+        append = self.roll_log.append if self.roll_log is not None else None
+        score = player.score
+        round_number = self.current_round
+        if self.state == STATE_CONTINUE:
+            round_number += 1
+        rounds_total = self.rounds_total
+        while True:
+            if fair:
+                player_roll = randint(DICE_MIN, max_face)
+                computer_roll = randint(DICE_MIN, max_face)
+            else:
+                player_roll = player.roll_dice(score)
+                computer_roll = computer.roll_dice(-score)
+            if append is not None:
+                append(player_roll, computer_roll)
+            delta = delta_table[player_roll - min_value][computer_roll - min_value]
+            if delta is None:
+                continue
+            score += delta
+            if round_number >= rounds_total:
+                break
+            round_number += 1
+        player.score = score
+        self.current_round = round_number
+        self.state = STATE_FINISHED
+        return self
+
+    def next_round(self):
+        # Переход к следующему раунду
+        if self.state != STATE_CONTINUE:
+            raise InvalidRollError("Раунд еще не закончен")
+        self.state = STATE_ROLL
+        self.current_round += 1
+        return [RoundStarted(self.current_round)]
+
+    def abort(self):
+        # Выход из игры без результата
+        if self.is_over():
+            return []
+        self.state = STATE_ABORTED
+        return [GameAborted(self.current_round)]
+
+    def is_over(self):
+        # Закончена ли игра (победой, поражением, ничьей или выходом)
+        return self.state in (STATE_FINISHED, STATE_ABORTED)
+
+    def is_finished(self):
+        # Доиграна ли игра до конца
+        return self.state == STATE_FINISHED
+
+    def get_seed(self):
+        # Сид генератора игры для сохранения и повтора
+        return format_seed(self.rng)
+
+    def get_rules(self):
+        # Название правил для сохранения в результате; None для классических правил
+        return None if self.ruleset.name == CLASSIC_RULESET else self.ruleset.name
+
+    def get_strategy_name(self):
+        # Название стратегии компьютера для повтора игры; без стратегии компьютер бросает честный кубик
+        strategy = self.computer.strategy
+        return strategy.name if strategy is not None else "fair"
+
+    def get_rules_spec(self):
+        # Параметры правил для повтора игры
+        return self.ruleset.get_spec()
+
+    def get_roll_log(self):
+        # Упакованный журнал бросков или None, если журнал не ведется
+        return self.roll_log.to_text() if self.roll_log is not None else None
+
+
+def run_game(engine, frontend):
+    # Прогоняет игру: действия берутся у фронтенда, события передаются ему же
+    events = engine.start()
+    if frontend.autoplay:
+        return engine.play_out()
+    while True:
+        for event in events:
+            frontend.on_event(event)
+        if engine.is_over():
+            return engine
+        events = engine.handle(frontend.next_action(engine))
@@ -12,3 +12,18 @@ class InvalidRollError(Exception):
 class ExitToMenuError(Exception):
     # Исключение для выхода в главное меню без сохранения
     pass
+
+
+class StatisticsUpdateError(Exception):
+    # Исключение после сохранения результатов: результаты в хранилище, но статистику обновить не удалось
+    pass
+
+
+class LegacyFormatError(ValueError):
+    # Исключение для файла результатов, который не является JSON-массивом
+    pass
+
+
+class RollupError(Exception):
+    # Исключение для поврежденных итогов дней, удаленных по сроку хранения: пересчитать их по сегментам нельзя
+    pass
@@ -0,0 +1,124 @@
+# Выгрузка старого game_results.json в другие форматы и хранилища
+# Старый файл читается потоково (game.legacy.LegacyReader) и записывается пачками по EXPORT_BATCH записей.
+# Запуск: python -m game.export check game_results.json
+#         python -m game.export export game_results.json results.csv --format csv
+
+import argparse
+import csv
+import os
+import sys
+import time
+from .settings import EXPORT_BATCH, EXPORT_PROGRESS_INTERVAL, RESULTS_FILE
+from .fileutil import open_atomic, iter_batches
+from .legacy import LegacyReader, LegacyReport
+from .storage import encode_result, create_storage
+from .columnar import write_archive
+from .metrics import count, timer
+
+# Поля CSV в порядке колонок
+CSV_FIELDS = ["Дата", "Игрок", "Уровень игры", "Количество раундов", "Итоговый счет", "Сид", "Броски", "Правила",
+              "Стратегия", "Параметры правил"]
+
+# Форматы выгрузки: файлы и хранилища результатов
+EXPORT_FORMATS = ("csv", "jsonl", "columnar", "sqlite", "segments")
+
+
+def export_results(source, target, fmt, batch_size=EXPORT_BATCH, progress=None, report=None):
+    # Выгружает старый JSON-массив source в target пачками по batch_size записей; возвращает число записей.
+    # progress(записей, секунд, прочитано байтов) вызывается после каждой пачки
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    reader = LegacyReader(source, report)
+    started = time.perf_counter()
+    exported = 0
+
+    def iter_progress():
+        # Пачки с учетом выгруженных записей и вызовом progress
+        nonlocal exported
+        for batch in iter_batches(reader, batch_size):
+            yield batch
+            exported += len(batch)
+            count("export.records", len(batch))
+            if progress is not None:
+                progress(exported, time.perf_counter() - started, reader.get_position())
+
+    with timer("export.total"):
+        if fmt == "csv":
+            with open_atomic(target, 'w', encoding='utf-8', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(CSV_FIELDS)
+                for batch in iter_progress():
+                    writer.writerows([result.get(field, "") for field in CSV_FIELDS] for result in batch)
+        elif fmt == "jsonl":
+            with open_atomic(target, 'w', encoding='utf-8') as file:
+                for batch in iter_progress():
+                    file.write("".join(encode_result(result) for result in batch))
+        elif fmt == "columnar":
+            write_archive(target, (result for batch in iter_progress() for result in batch))
+        else:
+            # Хранилище открывается как в игре: target - файл результатов, рядом с которым лежит база или сегменты.
+            # Если target - сам source, хранилище при открытии перенесло бы историю еще раз
+            if os.path.abspath(target) == os.path.abspath(source):
+                raise ValueError("Файл результатов хранилища совпадает с источником: история переносится "
+                                 "автоматически при первом открытии хранилища")
+            storage = create_storage(target, fmt)
+            for batch in iter_progress():
+                storage.append_many(batch)
+    return exported
+
+
+def print_progress(records, seconds, position, size):
+    # Строка прогресса: записей, скорость и доля прочитанного файла
+    rate = records / seconds if seconds > 0 else 0
+    percent = position * 100 / size if size else 100
+    end = "\r" if sys.stdout.isatty() else "\n"
+    print(f"Записей: {records} | {rate:.0f} записей/с | прочитано {percent:.0f}%", end=end, flush=True)
+
+
+def main():
+    # Командная строка: python -m game.export check|export ...
+    parser = argparse.ArgumentParser(description="Старый файл результатов игры 'КОСТИ'")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check_parser = subparsers.add_parser("check", help="прочитать файл и показать поврежденные записи")
+    check_parser.add_argument("json_file", nargs="?", default=RESULTS_FILE)
+    export_parser = subparsers.add_parser("export", help="выгрузить записи в CSV, JSON Lines или хранилище")
+    export_parser.add_argument("json_file")
+    export_parser.add_argument("target", help="файл выгрузки; для sqlite и segments - файл результатов хранилища")
+    export_parser.add_argument("--format", default="jsonl", choices=EXPORT_FORMATS, help="формат выгрузки")
+    export_parser.add_argument("--batch", type=int, default=EXPORT_BATCH, help="записей в пачке")
+    args = parser.parse_args()
+
+    report = LegacyReport()
+    started = time.perf_counter()
+    try:
+        if args.command == "check":
+            records = sum(1 for _ in LegacyReader(args.json_file, report))
+        else:
+            size = os.path.getsize(args.json_file)
+            shown = 0.0
+
+            def progress(records, seconds, position):
+                # Прогресс не чаще EXPORT_PROGRESS_INTERVAL секунд
+                nonlocal shown
+                if seconds - shown >= EXPORT_PROGRESS_INTERVAL:
+                    shown = seconds
+                    print_progress(records, seconds, position, size)
+
+            records = export_results(args.json_file, args.target, args.format, args.batch, progress, report)
+            if shown and sys.stdout.isatty():
+                # Строка прогресса выводилась без перевода строки
+                print()
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - started
+    print(f"Записей: {records} | Пропущено поврежденных: {report.malformed} | {elapsed:.2f} с"
+          f" ({records / elapsed if elapsed > 0 else 0:.0f} записей/с)")
+    for line, message in report.errors:
+        print(f"  строка {line}: {message}")
+    if len(report.errors) < report.malformed:
+        print(f"  ... и еще {report.malformed - len(report.errors)}")
+    return 1 if report.malformed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# Общие помощники для файлов результатов: атомарная запись, снимки с журналом изменений, пачки потока
+# и предупреждения.
+# Модуль не зависит от других модулей игры, поэтому его импортируют на уровне модуля и хранилища,
+# и чтение старого файла, и архив, и метрики
+
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from itertools import islice
+
+
+def write_atomic(path, data):
+    # Записывает файл целиком через уникальный временный файл и os.replace:
+    # читатели видят либо старую, либо новую версию, а параллельные записи не мешают друг другу
+    with open_atomic(path) as file:
+        file.write(data)
+
+
+@contextmanager
+def open_atomic(path, mode='wb', **kwargs):
+    # Файл для потоковой записи, который подменяет path через os.replace только после успешной записи;
+    # при ошибке временный файл удаляется, а path остается прежним
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode, **kwargs) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def has_torn_tail(fd):
+    # Кончается ли файл недописанной строкой; запись с O_APPEND после чтения все равно идет в конец
+    size = os.lseek(fd, 0, os.SEEK_END)
+    if not size:
+        return False
+    os.lseek(fd, size - 1, os.SEEK_SET)
+    return os.read(fd, 1) != b"\n"
+
+
+def write_all(fd, data):
+    # Дописывает data целиком: os.write может записать только часть (диск заполнен, сигнал).
+    # При ошибке файл обрезается до прежнего размера, чтобы не оставить недописанную запись, и ошибка пробрасывается.
+    # Вызывать под блокировкой файла: иначе обрезка может задеть чужую дозапись
+    size = os.lseek(fd, 0, os.SEEK_END)
+    view = memoryview(data)
+    try:
+        while view:
+            written = os.write(fd, view)
+            if not written:
+                raise OSError(f"запись прервана: записано {len(data) - len(view)} из {len(data)} байт")
+            view = view[written:]
+    except BaseException:
+        os.ftruncate(fd, size)
+        raise
+
+
+# Снимок с журналом изменений: снимок JSON path переписывается целиком редко, а каждое изменение
+# дописывается строкой в журнал <path без расширения>.log. Первая строка журнала - поколение снимка:
+# журнал от другого поколения (сбой между записью снимка и сбросом журнала) уже учтен в снимке
+
+def get_delta_log(path):
+    # Путь к журналу изменений снимка
+    return os.path.splitext(path)[0] + ".log"
+
+
+def load_snapshot(path):
+    # Снимок и список изменений после него; None, если снимка нет или он или журнал повреждены.
+    # Недописанная последняя строка журнала - изменение, которое еще пишется, и не учитывается
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            snapshot = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not isinstance(snapshot, dict):
+        return None
+    generation = snapshot.get("generation")
+    try:
+        with open(get_delta_log(path), 'rb') as file:
+            lines = file.read().decode('utf-8', errors='replace').splitlines(keepends=True)
+    except FileNotFoundError:
+        lines = []
+    if generation is None or not lines or lines[0] != json.dumps({"generation": generation}) + "\n":
+        return snapshot, []
+    deltas = []
+    for line in lines[1:]:
+        if not line.endswith("\n"):
+            break
+        try:
+            deltas.append(json.loads(line))
+        except json.JSONDecodeError:
+            return None
+    return snapshot, deltas
+
+
+def save_snapshot(path, snapshot):
+    # Атомарно сохраняет снимок нового поколения и начинает пустой журнал изменений
+    generation = os.urandom(8).hex()
+    write_atomic(path, json.dumps(dict(snapshot, generation=generation), ensure_ascii=False).encode("utf-8"))
+    write_atomic(get_delta_log(path), (json.dumps({"generation": generation}) + "\n").encode("utf-8"))
+
+
+def append_delta(path, delta, max_bytes):
+    # Дописывает изменение в журнал снимка path за время, не зависящее от размера снимка.
+    # False - журнал нужно свернуть в новый снимок: его нет (снимок старого формата), он вырос больше max_bytes
+    # или кончается недописанной строкой после сбоя
+    try:
+        fd = os.open(get_delta_log(path), os.O_RDWR | os.O_APPEND)
+    except FileNotFoundError:
+        return False
+    try:
+        if has_torn_tail(fd):
+            return False
+        write_all(fd, (json.dumps(delta, ensure_ascii=False) + "\n").encode("utf-8"))
+        os.fsync(fd)
+        return os.fstat(fd).st_size <= max_bytes
+    finally:
+        os.close(fd)
+
+
+def iter_batches(results, size):
+    # Разбивает поток результатов на списки по size записей
+    results = iter(results)
+    while True:
+        batch = list(islice(results, size))
+        if not batch:
+            return
+        yield batch
+
+
+def warn(message):
+    # Предупреждение пользователю в stderr
+    print(f"Внимание: {message}", file=sys.stderr)
@@ -0,0 +1,86 @@
+# Фронтенды игрового движка
+# Абстрактный класс Frontend и фронтенды без терминала: пустой и по сценарию, повтор игры по сиду
+
+from abc import ABC, abstractmethod
+from .settings import GAME_LEVELS, LEVEL_STRATEGIES
+from .engine import GameEngine, run_game, ACTION_ROLL, ACTION_CONTINUE, STATE_ROLL
+from .strategies import get_strategy
+from .rng import make_rng, parse_seed
+from .rules import get_ruleset, parse_ruleset_spec, CLASSIC_RULESET
+
+
+class Frontend(ABC):
+    # Абстрактный фронтенд: выбирает действия и получает события движка
+
+    # Всегда бросает и продолжает, а события не читает: run_game доигрывает игру без событий
+    autoplay = False
+
+    @abstractmethod
+    def next_action(self, engine):
+        # Возвращает следующее действие для движка
+        pass
+
+    @abstractmethod
+    def on_event(self, event):
+        # Обрабатывает событие движка
+        pass
+
+
+class NullFrontend(Frontend):
+    # Пустой фронтенд: всегда бросает и продолжает, события игнорирует
+
+    autoplay = True
+
+    def next_action(self, engine):
+        # Бросок в раунде, иначе переход к следующему раунду
+        return ACTION_ROLL if engine.state == STATE_ROLL else ACTION_CONTINUE
+
+    def on_event(self, event):
+        # События не нужны
+        pass
+
+
+class ScriptedFrontend(Frontend):
+    # Фронтенд по сценарию: действия берутся из списка, события сохраняются
+
+    def __init__(self, actions):
+        # actions - последовательность действий ACTION_*
+        self.actions = iter(actions)
+        self.events = []
+
+    def next_action(self, engine):
+        # Следующее действие сценария; по окончании сценария игра доигрывается автоматически
+        action = next(self.actions, None)
+        if action is None:
+            return ACTION_ROLL if engine.state == STATE_ROLL else ACTION_CONTINUE
+        return action
+
+    def on_event(self, event):
+        # Сохраняет событие
+        self.events.append(event)
+
+
+def play_headless(player_name, rounds_total, frontend=None):
+    # Проводит игру без терминала и возвращает завершенный движок
+    return run_game(GameEngine(player_name, rounds_total), frontend or NullFrontend())
+
+
+def replay_game(result):
+    # Переигрывает сохраненную игру по ее сиду; None, если сид не сохранен
+    # Стратегия и параметры правил берутся из результата; у старых результатов без них - из текущих настроек
+    seed_text = result.get('Сид')
+    if not seed_text:
+        return None
+    seed, kind = parse_seed(seed_text)
+    rounds_total = result.get('Количество раундов', 0)
+    strategy_name = result.get('Стратегия')
+    if strategy_name is None:
+        level_choice = next((choice for choice, rounds in GAME_LEVELS.items() if rounds == rounds_total), None)
+        strategy_name = LEVEL_STRATEGIES[level_choice] if level_choice else None
+    strategy = get_strategy(strategy_name) if strategy_name else None
+    rules = result.get('Правила', CLASSIC_RULESET)
+    rules_spec = result.get('Параметры правил')
+    ruleset = parse_ruleset_spec(rules, rules_spec) if rules_spec else get_ruleset(rules)
+    engine = GameEngine(result.get('Игрок', ''), rounds_total, strategy, make_rng(seed, kind), record_rolls=False,
+                        ruleset=ruleset)
+    return run_game(engine, NullFrontend())
@@ -1,12 +1,25 @@
 # Основная логика игры - классы Game и GameUI
 
+import sys
 import time
 from datetime import datetime
-from .models import Player, Computer
-from .settings import (GAME_LEVELS, DICE_SYMBOLS, DATE_FORMAT, clear,
+from .settings import (GAME_LEVELS, LEVEL_STRATEGIES, DICE_SYMBOLS, DATE_FORMAT, TIE_DELAY, clear,
                        YES_ANSWERS, NO_ANSWERS, EXIT_ANSWERS, validate_player_name, get_level_name)
 from .exceptions import InvalidInputError, ExitToMenuError
 from .score import ScoreManager
+from .engine import (GameEngine, run_game, ACTION_ROLL, ACTION_CONTINUE, STATE_ROLL,
+                     RoundStarted, DiceRolled, RoundTied, RoundFinished, GameFinished)
+from .frontends import Frontend
+from .strategies import get_strategy
+from .metrics import timer, count
+from .render import header, block
+
+
+def pause(seconds):
+    # Пауза после сообщения: покадровый вывод показывает напечатанное только при flush или вводе,
+    # поэтому кадр выводится до паузы, иначе сообщение появится после нее или пропадет при clear()
+    sys.stdout.flush()
+    time.sleep(seconds)
 
 
 class GameUI:
@@ -57,11 +70,8 @@ class GameUI:
         while True:
             try:
                 clear()
-                print("\nВыберите уровень игры:")
-                print("1. Короткая игра (5 раундов)")
-                print("2. Средняя игра (8 раундов)")
-                print("3. Длинная игра (10 раундов)")
-                print("4. Вернуться в главное меню")
+                print(block("\nВыберите уровень игры:", "1. Короткая игра (5 раундов)", "2. Средняя игра (8 раундов)",
+                            "3. Длинная игра (10 раундов)", "4. Вернуться в главное меню"))
                 
                 choice = input("Ваш выбор (1-4): ").strip()
                 
@@ -124,18 +134,18 @@ class GameUI:
                     raise ExitToMenuError("Выход в главное меню")
 
 
-class Game:
-    # Основной класс игры
+class Game(Frontend):
+    # Основной класс игры - консольный фронтенд игрового движка
     
-    def __init__(self):
-        # Инициализация игры
+    def __init__(self, score_manager=None):
+        # Инициализация игры; результаты сохраняются через общий ScoreManager приложения
+        self.engine = None
         self.player = None
-        self.computer = Computer()
+        self.computer = None
         self.rounds_total = 0
-        self.current_round = 0
         self.start_time = None
         self.ui = GameUI()
-        self.score_manager = ScoreManager()
+        self.score_manager = score_manager or ScoreManager()
     
     def initialize_game(self):
         # Инициализирует новую игру
@@ -145,56 +155,72 @@ class Game:
         player_name = self.ui.get_player_name()
         level_choice = self.ui.get_game_level()
         
-        self.player = Player(player_name)
-        self.rounds_total = GAME_LEVELS[level_choice]
-        self.current_round = 0
+        self.engine = GameEngine(player_name, GAME_LEVELS[level_choice],
+                                 get_strategy(LEVEL_STRATEGIES[level_choice]))
+        self.player = self.engine.player
+        self.computer = self.engine.computer
+        self.rounds_total = self.engine.rounds_total
         self.start_time = datetime.now()
         
         level_name = get_level_name(self.rounds_total)
         clear()
         print(f"\nВыбран уровень: {level_name} ({self.rounds_total} раундов)")
+        if self.engine.get_rules() is not None:
+            print(f"Правила: {self.engine.ruleset.describe()}")
         input("Нажмите Enter для начала игры...")
         clear()
         
         print(f"\n🎮 Игра начинается! Удачи, {player_name}!")
-        time.sleep(1)
+        with timer("game.sleep"):
+            pause(1)
     
-    def play_round(self):
-        # Проводит один раунд игры
-        self.current_round += 1
-        clear()
-        print(f"\n{'='*20} РАУНД {self.current_round} {'='*20}")
-        
-        while True:
+    def next_action(self, engine):
+        # Запрашивает у пользователя следующее действие
+        if engine.state == STATE_ROLL:
             print("\nВаш ход:")
-            self.ui.get_dice_roll_input(self.current_round)
-            player_roll = self.player.roll_dice()
-            
-            computer_roll = self.computer.roll_dice()
-            
-            print(f"Вы бросили кубик: {DICE_SYMBOLS[player_roll]} {player_roll}")
-            print(f"Компьютер бросил кубик: {DICE_SYMBOLS[computer_roll]} {computer_roll}")
-            
-            if player_roll > computer_roll:
-                difference = player_roll - computer_roll
-                self.player.add_score(difference)
-                print(f"Вы выиграли раунд! +{difference} очков")
-                return difference, 0, True
-                
-            elif computer_roll > player_roll:
-                difference = computer_roll - player_roll
-                self.player.add_score(-difference)
-                print(f"Компьютер выиграл раунд! -{difference} очков")
-                return -difference, difference, True
-                
+            with timer("game.input_wait"):
+                self.ui.get_dice_roll_input(engine.current_round)
+            return ACTION_ROLL
+        with timer("game.input_wait"):
+            self.ui.check_exit_to_menu()
+        return ACTION_CONTINUE
+    
+    def on_event(self, event):
+        # Отображает событие движка
+        if isinstance(event, RoundStarted):
+            clear()
+            print(f"\n{'='*20} РАУНД {event.round_number} {'='*20}")
+        elif isinstance(event, DiceRolled):
+            count("game.throws")
+            print(f"Вы бросили {self.format_roll(event.player_roll)}")
+            print(f"Компьютер бросил {self.format_roll(event.computer_roll)}")
+        elif isinstance(event, RoundTied):
+            print("Ничья! Перебрасываем кубики...")
+            with timer("game.sleep"):
+                pause(TIE_DELAY)
+        elif isinstance(event, RoundFinished):
+            if event.delta > 0:
+                print(f"Вы выиграли раунд! +{event.delta} очков")
             else:
-                print("Ничья! Перебрасываем кубики...")
-                time.sleep(2)
-                continue
+                print(f"Компьютер выиграл раунд! -{-event.delta} очков")
+            self.display_game_status()
+        elif isinstance(event, GameFinished):
+            count("game.finished")
+            clear()
+            self.display_final_results()
+    
+    def format_roll(self, value):
+        # Бросок для экрана: у одного шестигранного кубика - с символом грани
+        ruleset = self.engine.ruleset
+        if ruleset.dice > 1:
+            return f"кубики: {value}"
+        if ruleset.faces == len(DICE_SYMBOLS):
+            return f"кубик: {DICE_SYMBOLS[value]} {value}"
+        return f"кубик: {value}"
     
     def display_game_status(self):
         # Отображает текущее состояние игры
-        print(f"\nСтатус игры после {self.current_round} раунда(ов) из {self.rounds_total}:")
+        print(f"\nСтатус игры после {self.engine.current_round} раунда(ов) из {self.rounds_total}:")
         print(f"Ваш счет: {self.player.get_score()}")
         print(f"Счет компьютера: {self.computer.get_score()}")
         
@@ -204,15 +230,10 @@ class Game:
             print("Компьютер впереди! 🤖")
         else:
             print("Счет равный! ⚖️")
-        
-        if self.current_round < self.rounds_total:
-            self.ui.check_exit_to_menu()
     
     def display_final_results(self):
         # Отображает финальные результаты игры
-        print("\n" + "="*60)
-        print("                 ИТОГИ ИГРЫ")
-        print("="*60)
+        print(header("                 ИТОГИ ИГРЫ", 60))
         
         print(f"Время начала игры: {self.start_time.strftime(DATE_FORMAT)}")
         print(f"Время окончания: {datetime.now().strftime(DATE_FORMAT)}")
@@ -238,19 +259,15 @@ class Game:
     
     def save_game_result(self):
         # Сохраняет результат игры
-        self.score_manager.save_result(self.player.get_name(), self.rounds_total, self.player.get_score())
+        self.score_manager.save_result(self.player.get_name(), self.rounds_total, self.player.get_score(),
+                                       self.engine.get_seed(), self.engine.get_roll_log(), self.engine.get_rules(),
+                                       self.engine.get_strategy_name(), self.engine.get_rules_spec())
     
     def start(self):
         # Запускает игру
         try:
             self.initialize_game()
-            
-            for _ in range(self.rounds_total):
-                self.play_round()
-                self.display_game_status()
-            
-            clear()
-            self.display_final_results()
+            run_game(self.engine, self)
             self.save_game_result()
             
             input("\nНажмите Enter для возврата в главное меню...")
@@ -259,12 +276,12 @@ class Game:
             clear()
             print("\n🔙 Возврат в главное меню...")
             print("Результат игры не сохранен.")
-            time.sleep(1)
+            pause(1)
         except KeyboardInterrupt:
             clear()
             print("\n🔙 Возврат в главное меню...")
             print("Результат игры не сохранен.")
-            time.sleep(1)
+            pause(1)
         except Exception as e:
             print(f"\nПроизошла ошибка во время игры: {e}")
             print("Попробуйте начать игру заново.")
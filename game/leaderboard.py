@@ -0,0 +1,110 @@
+# Таблица лидеров
+# Рейтинги игроков по сумме очков, проценту побед и лучшей игре, общие и по уровням
+
+import heapq
+from .settings import LEADERBOARD_MIN_GAMES
+from .stats import StatsBucket
+
+
+class RankedHeap:
+    # Куча игроков по убыванию ключа с ленивым удалением устаревших записей
+    # Обновление ключа и запрос топ-K стоят O(log N) на элемент
+
+    def __init__(self):
+        # Пустой рейтинг
+        self.heap = []
+        self.keys = {}
+
+    def update(self, player, key):
+        # Устанавливает игроку новый ключ; старая запись в куче становится устаревшей
+        if self.keys.get(player) == key:
+            return
+        self.keys[player] = key
+        heapq.heappush(self.heap, (-key, player))
+        if len(self.heap) > 2 * len(self.keys) + 64:
+            self._compact()
+
+    def top(self, k):
+        # Первые k игроков: список (игрок, ключ)
+        found = []
+        while self.heap and len(found) < k:
+            neg_key, player = heapq.heappop(self.heap)
+            if self.keys.get(player) == -neg_key and (not found or found[-1][0] != player):
+                found.append((player, -neg_key))
+        for player, key in found:
+            heapq.heappush(self.heap, (-key, player))
+        return found
+
+    def _compact(self):
+        # Пересобирает кучу только из актуальных записей
+        self.heap = [(-key, player) for player, key in self.keys.items()]
+        heapq.heapify(self.heap)
+
+
+class LeaderboardScope:
+    # Рейтинги внутри одного среза: все игры или один уровень
+
+    def __init__(self, min_games):
+        # Инициализация пустых рейтингов
+        self.min_games = min_games
+        self.players = {}
+        self.by_score = RankedHeap()
+        self.by_win_rate = RankedHeap()
+        self.by_best_game = RankedHeap()
+
+    def add(self, player, score):
+        # Учитывает одну игру игрока
+        bucket = self.players.setdefault(player, StatsBucket())
+        bucket.add(score)
+        self.by_score.update(player, bucket.score_sum)
+        self.by_best_game.update(player, bucket.best_score)
+        if bucket.games >= self.min_games:
+            self.by_win_rate.update(player, bucket.get_win_rate())
+
+
+class Leaderboard:
+    # Таблица лидеров, обновляемая по одному результату
+
+    def __init__(self, min_games=LEADERBOARD_MIN_GAMES):
+        # min_games - сколько игр нужно для участия в рейтинге по проценту побед
+        self.min_games = min_games
+        self.scopes = {}
+        self.marker = None
+
+    @classmethod
+    def from_results(cls, results, min_games=LEADERBOARD_MIN_GAMES):
+        # Строит таблицу одним проходом по потоку результатов
+        leaderboard = cls(min_games)
+        for result in results:
+            leaderboard.add(result)
+        return leaderboard
+
+    def add(self, result):
+        # Учитывает результат в общем рейтинге и в рейтинге его уровня
+        player = result.get('Игрок', 'Неизвестно')
+        score = result.get('Итоговый счет', 0)
+        self._get_scope(None).add(player, score)
+        self._get_scope(result.get('Уровень игры', 'Неизвестно')).add(player, score)
+
+    def top_by_score(self, k, level=None):
+        # Топ-k по суммарному счету: список (игрок, сумма очков)
+        return self._get_scope(level).by_score.top(k)
+
+    def top_by_win_rate(self, k, level=None):
+        # Топ-k по проценту побед среди игроков с min_games и более играми
+        return self._get_scope(level).by_win_rate.top(k)
+
+    def top_by_best_game(self, k, level=None):
+        # Топ-k по лучшей отдельной игре
+        return self._get_scope(level).by_best_game.top(k)
+
+    def get_player_stats(self, player, level=None):
+        # Счетчики игрока (StatsBucket) или None
+        return self._get_scope(level).players.get(player)
+
+    def _get_scope(self, level):
+        # Срез рейтинга: None - все уровни
+        scope = self.scopes.get(level)
+        if scope is None:
+            scope = self.scopes[level] = LeaderboardScope(self.min_games)
+        return scope
@@ -0,0 +1,212 @@
+# Потоковое чтение старого game_results.json
+# Файл - JSON-массив записей в формате json.dump(indent=2), который может весить гигабайты.
+# LegacyReader читает его порциями по LEGACY_CHUNK_SIZE символов и отдает записи по одной:
+# в памяти только текущая порция и одна запись. Поврежденная запись не обрывает чтение, как json.load,
+# а пропускается и попадает в отчет со строкой файла; чтение продолжается со следующей записи.
+# Проверка и выгрузка файла - game.export
+
+import json
+import re
+from .settings import LEGACY_CHUNK_SIZE, LEGACY_MAX_RECORD, LEGACY_MAX_ERRORS
+from .exceptions import LegacyFormatError
+from .fileutil import warn
+from .metrics import count
+
+# Пропуск между записями массива
+SEPARATOR = re.compile(r'[\s,]*')
+# Скобки и начало строки внутри записи; остаток строки JSON до закрывающей кавычки (без перевода строки)
+RECORD_TOKEN = re.compile(r'[{}"]')
+STRING_TAIL = re.compile(r'[^"\\\n]*(?:\\.[^"\\\n]*)*"')
+# Начало записи после сбоя: json.dump(indent=2) начинает каждую запись массива с новой строки,
+# а перевод строки внутри значений экранируется, поэтому "{" в начале строки не бывает частью строки JSON
+RECORD_START = re.compile(r'\n[ \t\r]*\{')
+
+class LegacyReport:
+    # Итоги чтения: прочитанные и пропущенные записи и первые ошибки (строка файла, описание)
+
+    def __init__(self, max_errors=LEGACY_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.records = 0
+        self.malformed = 0
+        self.errors = []
+
+    def add_error(self, line, message, skipped=True):
+        # Учитывает ошибку; skipped - пропущена запись, иначе нарушение структуры массива
+        if skipped:
+            self.malformed += 1
+            count("legacy.malformed")
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+    def format(self, path):
+        # Строка итогов для вывода пользователю
+        text = f"{path}: прочитано записей {self.records}, пропущено поврежденных {self.malformed}"
+        if self.errors:
+            line, message = self.errors[0]
+            text += f" (строка {line}: {message})"
+        return text
+
+
+class LegacyReader:
+    # Итератор записей JSON-массива, читающий файл порциями
+
+    def __init__(self, path, report=None, chunk_size=LEGACY_CHUNK_SIZE, max_record=LEGACY_MAX_RECORD):
+        self.path = path
+        self.report = report if report is not None else LegacyReport()
+        self.chunk_size = chunk_size
+        self.max_record = max_record
+        self.decoder = json.JSONDecoder()
+        self.file = None
+        self.buffer = ""
+        self.pos = 0
+        self.line = 1
+        self.eof = False
+
+    def __iter__(self):
+        with open(self.path, 'r', encoding='utf-8', errors='replace', newline='') as file:
+            self.file = file
+            self.buffer = ""
+            self.pos = 0
+            self.line = 1
+            self.eof = False
+            self._skip_separator()
+            if self.buffer.startswith("\ufeff", self.pos):
+                self.pos += 1
+                self._skip_separator()
+            if self.pos >= len(self.buffer):
+                # Пустой файл - пустая история
+                return
+            if self.buffer[self.pos] != "[":
+                raise LegacyFormatError(f"{self.path} не является JSON-массивом")
+            self.pos += 1
+            # Быстрый путь - запись целиком в буфере и декодируется сканером json без обертки raw_decode;
+            # все остальное (конец порции, повреждения) разбирает _read_record
+            match_separator = SEPARATOR.match
+            scan = self.decoder.scan_once
+            records = self.report.records
+            try:
+                while True:
+                    buffer = self.buffer
+                    pos = match_separator(buffer, self.pos).end()
+                    self.pos = pos
+                    if pos >= len(buffer):
+                        if self._read_chunk():
+                            continue
+                        self.report.add_error(self._get_line(), "нет закрывающей скобки массива", skipped=False)
+                        return
+                    char = buffer[pos]
+                    if char == "{":
+                        try:
+                            result, self.pos = scan(buffer, pos)
+                        except (StopIteration, json.JSONDecodeError):
+                            result = self._read_record()
+                            if result is None:
+                                continue
+                    elif char == "]":
+                        return
+                    else:
+                        self.report.add_error(self._get_line(), f"неожиданный символ {char!r} вместо записи")
+                        self._resync()
+                        continue
+                    self.report.records += 1
+                    yield result
+            finally:
+                count("legacy.records", self.report.records - records)
+
+    def get_position(self):
+        # Прочитано байтов файла (для прогресса)
+        return self.file.buffer.tell() if self.file is not None and not self.file.closed else 0
+
+    def _read_record(self):
+        # Декодирует запись с текущей позиции; поврежденная запись пропускается и возвращается None
+        while True:
+            try:
+                result, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as error:
+                end = find_record_end(self.buffer, self.pos)
+                if end is None and not self.eof and len(self.buffer) - self.pos < self.max_record:
+                    # Запись не поместилась в порцию: дочитываем
+                    self._read_chunk()
+                    continue
+                # Запись повреждена: если ее конец найден, чтение продолжается после нее,
+                # иначе (оборванная строка или незакрытая скобка) - со следующей записи
+                message = "запись не закончена" if end is None else f"повреждена запись: {error.msg}"
+                self.report.add_error(self._get_line(), message)
+                if end is None or end < 0:
+                    self._resync()
+                else:
+                    self.pos = end
+                return None
+            self.pos = end
+            return result
+
+    def _skip_separator(self):
+        # Пропускает пробелы и запятые между записями, дочитывая файл
+        while True:
+            self.pos = SEPARATOR.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._read_chunk():
+                return
+
+    def _resync(self):
+        # Переходит к началу следующей записи - "{" в начале строки после текущей позиции.
+        # Просто следующая "{" может оказаться внутри строки поврежденной записи
+        start = self.pos
+        while True:
+            match = RECORD_START.search(self.buffer, start)
+            if match is not None:
+                self.pos = match.end() - 1
+                return
+            # Последний перевод строки остается в буфере: начало записи может прийти со следующей порцией
+            newline = self.buffer.rfind("\n", start)
+            self.pos = newline if newline >= 0 else len(self.buffer)
+            if not self._read_chunk():
+                self.pos = len(self.buffer)
+                return
+            start = self.pos
+
+    def _read_chunk(self):
+        # Дочитывает порцию файла и отбрасывает уже разобранную часть буфера; False в конце файла
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.line += self.buffer.count("\n", 0, self.pos)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _get_line(self):
+        # Номер строки файла для текущей позиции
+        return self.line + self.buffer.count("\n", 0, self.pos)
+
+
+def find_record_end(text, start):
+    # Конец объекта JSON, начинающегося с "{" в позиции start, с учетом строк:
+    # позиция после закрывающей "}", None - объект не закончился в text, -1 - строка оборвана переводом строки
+    depth = 0
+    pos = start
+    while True:
+        match = RECORD_TOKEN.search(text, pos)
+        if match is None:
+            return None
+        pos = match.end()
+        char = match.group()
+        if char == '"':
+            string = STRING_TAIL.match(text, pos)
+            if string is None:
+                return None if text.find("\n", pos) < 0 else -1
+            pos = string.end()
+        elif char == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+def iter_legacy_results(path, report=None):
+    # Потоково отдает записи старого JSON-массива; без отчета о пропусках предупреждает в stderr
+    reader = LegacyReader(path, report)
+    yield from reader
+    if report is None and reader.report.malformed:
+        warn(reader.report.format(path))
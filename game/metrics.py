@@ -0,0 +1,236 @@
+# Метрики и профилирование
+# Таймеры, счетчики и гистограммы вокруг горячих мест игры и хранилища.
+# Пока метрики выключены, timer() возвращает общий пустой контекст, а count() и observe() сразу выходят
+# Включение: переменная окружения DICE_METRICS=1 или пункт "Диагностика" главного меню
+# Профилирование: DICE_PROFILE=cpu (cProfile) или DICE_PROFILE=memory (tracemalloc)
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from .settings import METRICS_FILE, PROFILE_FILE, PROFILE_TOP
+from .fileutil import write_atomic
+
+# Границы корзин: время от 1 мкс до ~2 минут, размеры от 1 до 2^40
+LATENCY_BOUNDS = [1e-6 * 2 ** power for power in range(28)]
+SIZE_BOUNDS = [2 ** power for power in range(41)]
+
+# Перцентили для выгрузки
+QUANTILES = (0.5, 0.99)
+
+# Режимы профилирования
+PROFILE_CPU = "cpu"
+PROFILE_MEMORY = "memory"
+
+
+class Histogram:
+    # Гистограмма с фиксированными корзинами: перцентили оцениваются по верхней границе корзины
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        # Добавляет наблюдение
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def get_quantile(self, quantile):
+        # Оценка перцентиля: граница корзины, в которую он попадает (не больше максимума)
+        if not self.count:
+            return 0
+        rank = quantile * self.count
+        cumulative = 0
+        for index, bucket in enumerate(self.buckets):
+            cumulative += bucket
+            if cumulative >= rank and bucket:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        # Сводка для выгрузки в JSON
+        summary = {"count": self.count, "sum": self.sum, "max": self.max}
+        for quantile in QUANTILES:
+            summary[f"p{round(quantile * 100)}"] = self.get_quantile(quantile)
+        return summary
+
+
+class _Timer:
+    # Контекст замера времени одного вызова
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, LATENCY_BOUNDS)
+
+
+class _NullTimer:
+    # Пустой контекст для выключенных метрик
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    # Реестр метрик процесса; обновления защищены блокировкой (запись идет и из фоновых потоков)
+
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def timer(self, name):
+        # Контекст замера времени; name - имя метрики без единиц измерения
+        return _Timer(self, name) if self.enabled else NULL_TIMER
+
+    def count(self, name, value=1):
+        # Увеличивает счетчик
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value, bounds=SIZE_BOUNDS):
+        # Добавляет наблюдение в гистограмму (по умолчанию - гистограмма размеров)
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(bounds)
+            histogram.observe(value)
+
+    def reset(self):
+        # Очищает накопленные метрики
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_dict(self):
+        # Снимок метрик для JSON
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+            }
+
+    def to_prometheus(self):
+        # Снимок метрик в текстовом формате Prometheus (гистограммы - как summary с перцентилями)
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                metric = get_metric_name(name) + "_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                metric = get_metric_name(name) + ("_seconds" if histogram.bounds is LATENCY_BOUNDS else "")
+                lines.append(f"# TYPE {metric} summary")
+                for quantile in QUANTILES:
+                    lines.append(f'{metric}{{quantile="{quantile}"}} {histogram.get_quantile(quantile):g}')
+                lines += [f"{metric}_sum {histogram.sum:g}", f"{metric}_count {histogram.count}"]
+        return "\n".join(lines) + "\n"
+
+    def save(self, path=METRICS_FILE):
+        # Сохраняет снимок в файл: .json - JSON, иначе формат Prometheus
+        if path.endswith(".json"):
+            data = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        else:
+            data = self.to_prometheus()
+        write_atomic(path, data.encode("utf-8"))
+        return path
+
+
+class Profiler:
+    # Переключаемое профилирование: cProfile для времени или tracemalloc для памяти
+
+    def __init__(self):
+        self.mode = None
+        self.profile = None
+
+    def start(self, mode):
+        # Запускает профилирование выбранного режима (предыдущее останавливается)
+        self.stop()
+        if mode == PROFILE_CPU:
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif mode == PROFILE_MEMORY:
+            import tracemalloc
+            tracemalloc.start()
+        else:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.mode = mode
+
+    def stop(self):
+        # Останавливает профилирование и сохраняет отчет; возвращает путь к отчету или None
+        if self.mode == PROFILE_CPU:
+            self.profile.disable()
+            path = f"{PROFILE_FILE}.pstats"
+            self.profile.dump_stats(path)
+            self.profile = None
+        elif self.mode == PROFILE_MEMORY:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            path = f"{PROFILE_FILE}.memory.txt"
+            lines = [str(stat) for stat in snapshot.statistics("lineno")[:PROFILE_TOP]]
+            write_atomic(path, ("\n".join(lines) + "\n").encode("utf-8"))
+        else:
+            return None
+        self.mode = None
+        return path
+
+
+def get_metric_name(name):
+    # Имя метрики Prometheus: префикс игры, точки заменены подчеркиваниями
+    return "dice_" + name.replace(".", "_").replace("-", "_")
+
+
+def configure_from_env():
+    # Включает метрики и профилирование по переменным окружения DICE_METRICS и DICE_PROFILE
+    if os.environ.get("DICE_METRICS", "") not in ("", "0"):
+        metrics.enabled = True
+    mode = os.environ.get("DICE_PROFILE")
+    if mode:
+        profiler.start(mode)
+
+
+def shutdown():
+    # При завершении процесса сохраняет метрики и отчет профилировщика
+    profiler.stop()
+    if metrics.enabled:
+        metrics.save()
+
+
+# Реестр и профилировщик процесса
+metrics = Metrics()
+profiler = Profiler()
+timer = metrics.timer
+count = metrics.count
+observe = metrics.observe
+
+atexit.register(shutdown)
@@ -1,27 +1,34 @@
 # Модели для игры
 # Содержит абстрактный класс GameParticipant и классы Player и Computer
+# Броски участника можно изменить стратегией из game.strategies, значение броска считается по правилам game.rules
 
 import random
 from abc import ABC, abstractmethod
-from .settings import DICE_MIN, DICE_MAX
+from .rules import get_ruleset
 
 
 class GameParticipant(ABC):
     # Абстрактный класс для участников игры
     
-    def __init__(self, name):
-        # Инициализация участника игры
+    def __init__(self, name, strategy=None, rng=None, ruleset=None):
+        # Инициализация участника игры; strategy - стратегия бросков (None - честный кубик),
+        # rng - генератор случайных чисел игры (None - общий модуль random), ruleset - правила броска
         self.name = name
         self.score = 0
+        self.strategy = strategy
+        self.rng = rng or random
+        self.ruleset = ruleset or get_ruleset()
     
     @abstractmethod
     def get_display_name(self):
         # Абстрактный метод для получения отображаемого имени
         pass
     
-    def roll_dice(self):
-        # Бросок кубика (одинаков для всех участников)
-        return random.randint(DICE_MIN, DICE_MAX)
+    def roll_dice(self, lead=0):
+        # Значение броска по правилам; lead - отрыв участника по счету для адаптивных стратегий
+        if self.strategy is None:
+            return self.ruleset.roll(self.rng)
+        return self.strategy.roll(self.rng, lead, self.ruleset)
     
     def add_score(self, points):
         # Добавляет очки к счету участника
@@ -43,9 +50,9 @@ class GameParticipant(ABC):
 class Player(GameParticipant):
     # Класс игрока, наследуется от GameParticipant
     
-    def __init__(self, name):
+    def __init__(self, name, rng=None, ruleset=None):
         # Инициализация игрока
-        super().__init__(name)
+        super().__init__(name, rng=rng, ruleset=ruleset)
     
     def get_display_name(self):
         # Возвращает отображаемое имя игрока
@@ -59,9 +66,9 @@ class Player(GameParticipant):
 class Computer(GameParticipant):
     # Класс компьютера, наследуется от GameParticipant
     
-    def __init__(self, name="Компьютер"):
+    def __init__(self, name="Компьютер", strategy=None, rng=None, ruleset=None):
         # Инициализация компьютера
-        super().__init__(name)
+        super().__init__(name, strategy, rng, ruleset)
     
     def get_display_name(self):
         # Возвращает отображаемое имя компьютера
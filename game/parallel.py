@@ -0,0 +1,138 @@
+# Параллельный Монте-Карло прогон симуляций на нескольких ядрах
+# Игры делятся на шарды фиксированного размера, у каждого шарда свой сид от общего мастер-сида.
+# Раунды разыгрываются выборкой исхода по таблице правил (game.rules), поэтому итоги для того же сида
+# не совпадают с прогонами, сделанными до появления правил, в том числе для правил classic
+
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from .settings import GAME_LEVELS, RULESET, get_level_name
+from .simulator import Simulator
+from .score import format_statistics
+from .vectorized import VectorSimulator, np
+from .probability import get_level_forecast
+from .rng import derive_seed
+from .rules import get_ruleset, RULESET_TABLES
+
+# Размер шарда не зависит от числа процессов, поэтому результат при одном сиде всегда одинаков
+SHARD_GAMES = 100_000
+
+
+class SimulationSummary:
+    # Сводка по сериям игр: победы, поражения, ничьи и распределение итоговых счетов
+
+    def __init__(self):
+        # Пустая сводка
+        self.total = 0
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.throws = 0
+        self.score_counts = Counter()
+
+    @classmethod
+    def from_result(cls, result):
+        # Сводка по результату Simulator или VectorSimulator
+        summary = cls()
+        summary.total = len(result)
+        summary.wins, summary.losses, summary.draws = result.count_outcomes()
+        if np is not None and isinstance(result.scores, np.ndarray):
+            values, counts = np.unique(result.scores, return_counts=True)
+            summary.score_counts.update(dict(zip(values.tolist(), counts.tolist())))
+            summary.throws = int(result.throws.sum())
+        else:
+            summary.score_counts.update(result.scores)
+            summary.throws = sum(result.throws)
+        return summary
+
+    def merge(self, other):
+        # Добавляет к сводке частичную сводку другого шарда
+        self.total += other.total
+        self.wins += other.wins
+        self.losses += other.losses
+        self.draws += other.draws
+        self.throws += other.throws
+        self.score_counts.update(other.score_counts)
+        return self
+
+    def get_win_rate(self):
+        # Процент побед игрока
+        return (self.wins / self.total) * 100 if self.total > 0 else 0
+
+    def get_mean_score(self):
+        # Средний итоговый счет
+        if self.total == 0:
+            return 0
+        return sum(score * count for score, count in self.score_counts.items()) / self.total
+
+    def format_statistics(self):
+        # Строка статистики в том же виде, что и на экране результатов
+        return format_statistics(self.total, self.wins, self.losses, self.draws)
+
+
+def _run_shard(shard):
+    # Проводит один шард игр в процессе-исполнителе
+    level_choice, games, seed, vectorized, rules = shard
+    ruleset = get_ruleset(rules)
+    simulator = VectorSimulator(seed, ruleset) if vectorized else Simulator(seed, ruleset)
+    return level_choice, SimulationSummary.from_result(simulator.run(games, level_choice))
+
+
+class ParallelRunner:
+    # Распределяет симуляцию N игр каждого уровня по пулу процессов
+
+    def __init__(self, workers=None, master_seed=0, vectorized=None, rules=RULESET):
+        # vectorized=None - использовать NumPy, если он установлен; rules - правила из RULESETS
+        self.workers = workers
+        self.master_seed = master_seed
+        self.vectorized = np is not None if vectorized is None else vectorized
+        self.rules = rules
+
+    def make_shards(self, games, level_choices):
+        # Список шардов (уровень, число игр, сид, векторно ли, правила)
+        shards = []
+        for level_choice in level_choices:
+            for index, start in enumerate(range(0, games, SHARD_GAMES)):
+                seed = derive_seed(self.master_seed, level_choice, index)
+                shards.append((level_choice, min(SHARD_GAMES, games - start), seed, self.vectorized, self.rules))
+        return shards
+
+    def run(self, games, level_choices=None):
+        # Возвращает словарь {уровень: SimulationSummary}
+        level_choices = list(level_choices or GAME_LEVELS)
+        summaries = {level_choice: SimulationSummary() for level_choice in level_choices}
+        shards = self.make_shards(games, level_choices)
+        if self.workers == 1:
+            for level_choice, partial in map(_run_shard, shards):
+                summaries[level_choice].merge(partial)
+            return summaries
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for level_choice, partial in executor.map(_run_shard, shards):
+                summaries[level_choice].merge(partial)
+        return summaries
+
+
+def main():
+    # Запуск из командной строки: python -m game.parallel --games 1000000 --seed 42
+    parser = argparse.ArgumentParser(description="Параллельная симуляция игр 'КОСТИ'")
+    parser.add_argument("--games", type=int, default=1_000_000, help="число игр на каждый уровень")
+    parser.add_argument("--seed", type=int, default=0, help="мастер-сид")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов")
+    parser.add_argument("--levels", nargs="*", default=None, help="уровни из GAME_LEVELS")
+    parser.add_argument("--rules", default=RULESET, choices=list(RULESET_TABLES), help="правила из RULESETS")
+    args = parser.parse_args()
+
+    runner = ParallelRunner(workers=args.workers, master_seed=args.seed, rules=args.rules)
+    print(f"Правила: {get_ruleset(args.rules).describe()}")
+    for level_choice, summary in runner.run(args.games, args.levels).items():
+        rounds_total = GAME_LEVELS[level_choice]
+        forecast = get_level_forecast(level_choice, args.rules)
+        print(f"{get_level_name(rounds_total)} ({rounds_total} раундов): {summary.format_statistics()}"
+              f" | Средний счет: {summary.get_mean_score():.3f}")
+        print(f"    Ожидаемо: победы {forecast['win'] * 100:.1f}% | ничьи {forecast['draw'] * 100:.1f}%"
+              f" | перебросов за игру {forecast['rerolls']:.2f},"
+              f" наблюдаемо {summary.throws / summary.total - rounds_total if summary.total else 0:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Точный расчет распределения исходов игры
+# Распределение изменения счета за раунд из таблиц правил game.rules сворачивается по числу раундов без симуляции
+
+from fractions import Fraction
+from functools import lru_cache
+from .settings import GAME_LEVELS, GAME_LEVELS_CONVERT, RULESET
+from .rules import get_ruleset
+
+
+def get_tie_probability(rules=RULESET):
+    # Вероятность ничьей при одном броске пары кубиков
+    return get_ruleset(rules).tie_probability
+
+
+def round_distribution(rules=RULESET):
+    # Распределение изменения счета игрока за раунд с учетом перебросов при ничьей
+    # Возвращает кортеж пар (изменение, вероятность)
+    return get_ruleset(rules).get_round_distribution()
+
+
+@lru_cache(maxsize=None)
+def final_score_distribution(rounds_total, rules=RULESET):
+    # Точное распределение итогового счета после rounds_total раундов
+    # Возвращает кортеж пар (счет, вероятность)
+    if rounds_total == 0:
+        return ((0, Fraction(1)),)
+    previous = final_score_distribution(rounds_total - 1, rules)
+    distribution = {}
+    for score, score_probability in previous:
+        for delta, delta_probability in round_distribution(rules):
+            distribution[score + delta] = distribution.get(score + delta, 0) + score_probability * delta_probability
+    return tuple(sorted(distribution.items()))
+
+
+@lru_cache(maxsize=None)
+def outcome_probabilities(rounds_total, rules=RULESET):
+    # Вероятности победы, поражения и ничьей игрока
+    win = loss = draw = Fraction(0)
+    for score, probability in final_score_distribution(rounds_total, rules):
+        if score > 0:
+            win += probability
+        elif score < 0:
+            loss += probability
+        else:
+            draw += probability
+    return win, loss, draw
+
+
+def expected_rerolls(rounds_total, rules=RULESET):
+    # Ожидаемое число перебросов из-за ничьих за игру
+    tie = get_tie_probability(rules)
+    return rounds_total * tie / (1 - tie)
+
+
+def get_level_forecast(level_choice, rules=RULESET):
+    # Прогноз для уровня из GAME_LEVELS: словарь с вероятностями исходов и перебросами
+    rounds_total = GAME_LEVELS[level_choice]
+    win, loss, draw = outcome_probabilities(rounds_total, rules)
+    return {
+        "level": GAME_LEVELS_CONVERT.get(rounds_total),
+        "rounds": rounds_total,
+        "win": float(win),
+        "loss": float(loss),
+        "draw": float(draw),
+        "rerolls": float(expected_rerolls(rounds_total, rules))
+    }
+
+
+def get_expected_win_rate(level_games):
+    # Ожидаемый процент побед для набора игр {название уровня: число игр}
+    rounds_by_name = {name: rounds for rounds, name in GAME_LEVELS_CONVERT.items()}
+    total = 0
+    expected_wins = Fraction(0)
+    for level_name, games in level_games.items():
+        rounds_total = rounds_by_name.get(level_name)
+        if rounds_total is None:
+            continue
+        total += games
+        expected_wins += games * outcome_probabilities(rounds_total)[0]
+    return float(expected_wins / total) * 100 if total > 0 else 0
@@ -0,0 +1,140 @@
+# Покадровый вывод в терминал
+# FrameRenderer подменяет sys.stdout: экран между clear() и ожиданием ввода собирается в кадр в памяти
+# и выводится одной записью, причем пишутся только строки, отличающиеся от предыдущего кадра.
+# Без терминала (вывод в файл или канал) renderer не включается и вывод остается прежним побайтно
+
+import io
+import os
+import shutil
+import sys
+import unicodedata
+from functools import lru_cache
+from .settings import RENDERER
+from .metrics import count, observe
+
+# Последовательность, которую выводит settings.clear()
+CLEAR_SEQUENCE = '\033[2J\033[3J\033[H\033[1;1H'
+
+# Стереть до конца строки и до конца экрана
+ERASE_LINE = '\033[K'
+ERASE_BELOW = '\033[J'
+
+
+@lru_cache(maxsize=None)
+def header(title, width, fill="="):
+    # Рамка заголовка экрана: пустая строка, линия, заголовок, линия
+    line = fill * width
+    return f"\n{line}\n{title}\n{line}"
+
+
+@lru_cache(maxsize=None)
+def block(*lines):
+    # Неизменный блок строк (пункты меню, шапка таблицы), склеенный один раз
+    return "\n".join(lines)
+
+
+class FrameRenderer(io.TextIOBase):
+    # Поток вывода, который копит кадр и выводит разницу с предыдущим кадром одной записью
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.fd = stream.fileno()
+        self.frame = [""]
+        self.text = ""
+        self.sent = None
+        self.screen = []
+        self.prompts = []
+        self.pending = False
+        self.bytes_written = 0
+        self.writes = 0
+        self.frames = 0
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return True
+
+    def write(self, text):
+        # Добавляет текст в кадр; очистка экрана начинает новый кадр
+        size = len(text)
+        while CLEAR_SEQUENCE in text:
+            _, text = text.split(CLEAR_SEQUENCE, 1)
+            self.frame = [""]
+            self.text = ""
+            self.sent = None
+            # Строки приглашений содержат введенный текст, которого нет в кадре: их нужно перерисовать
+            for row in self.prompts:
+                if row < len(self.screen):
+                    self.screen[row] = None
+            self.prompts = []
+            self.pending = True
+        if text:
+            lines = text.split("\n")
+            self.frame[-1] += lines[0]
+            self.frame.extend(lines[1:])
+            self.text += text
+            self.pending = True
+        return size
+
+    def flush(self):
+        # Выводит кадр; пустой кадр сразу после очистки откладывается до появления содержимого
+        if not self.pending or self.frame == [""]:
+            return
+        self.pending = False
+        columns, rows = shutil.get_terminal_size()
+        lines = self.frame
+        # Строка под кадром нужна для эха ввода: иначе терминал прокрутит экран и позиции строк сдвинутся
+        if self.sent is not None or len(lines) >= rows or any(get_width(line) > columns for line in lines):
+            # Кадр не помещается в окно: дальше он выводится как при обычном выводе, с прокруткой
+            data = self.text[self.sent:] if self.sent is not None else CLEAR_SEQUENCE + self.text
+            self.sent = len(self.text)
+            # Экран прокручен: следующий кадр переписывает все строки
+            self.screen = []
+        else:
+            parts = []
+            last = len(lines) - 1
+            for row, line in enumerate(lines):
+                if row == last:
+                    # Последняя строка пишется всегда: после нее курсор стоит там же, где после print
+                    parts.append(f"\033[{row + 1};1H{line}{ERASE_BELOW}")
+                elif row >= len(self.screen) or self.screen[row] != line:
+                    parts.append(f"\033[{row + 1};1H{line}{ERASE_LINE}")
+            data = "".join(parts)
+            self.screen = list(lines)
+        self._write(data.encode(self.stream.encoding or "utf-8", errors="replace"))
+        if lines[-1]:
+            # Кадр кончается приглашением input(): терминал сам выведет введенный текст и перевод строки,
+            # а до следующей очистки экрана строку приглашения переписывать нельзя, чтобы не стереть ввод
+            self.prompts.append(len(lines) - 1)
+            self.frame.append("")
+
+    def _write(self, data):
+        # Одна запись (или несколько, если терминал принял не все) и учет байтов и вызовов
+        self.frames += 1
+        observe("render.frame_bytes", len(data))
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+            self.writes += 1
+            count("render.writes")
+        self.bytes_written += len(data)
+
+    def get_stats(self):
+        # Кадров, байтов и вызовов записи с момента запуска
+        return {"frames": self.frames, "bytes": self.bytes_written, "writes": self.writes}
+
+
+def get_width(line):
+    # Ширина строки в колонках терминала (широкие символы и эмодзи занимают две)
+    return sum(2 if unicodedata.east_asian_width(char) in ("W", "F") else 1 for char in line)
+
+
+def install(kind=RENDERER):
+    # Включает покадровый вывод, если он выбран в настройках и вывод идет в терминал
+    if kind != "frame" or isinstance(sys.stdout, FrameRenderer) or not sys.stdout.isatty():
+        return None
+    sys.stdout.flush()
+    sys.stdout = FrameRenderer(sys.stdout)
+    return sys.stdout
@@ -0,0 +1,254 @@
+# Журнал бросков игры и проверка результатов по журналу
+# Пара бросков (игрок, компьютер) упаковывается в 6 бит - один символ base64,
+# поэтому журнал игры из 10 раундов занимает около 12 символов
+# Перебросы при ничьей видны как пары с равными значениями, текущий счет восстанавливается по журналу.
+# Журнал ведется для правил, у которых пара значений броска помещается в один символ (не больше 8 значений).
+# Журнал разбирается по параметрам правил из результата ("Параметры правил"), а не по текущим RULESETS:
+# правка правил в настройках не меняет проверку уже сыгранных игр
+
+import argparse
+import os
+import string
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from .settings import RESULTS_FILE, RESULTS_BACKEND
+from .rules import get_ruleset, parse_ruleset_spec, CLASSIC_RULESET
+
+# Алфавит base64: символ кодирует пару бросков (игрок - старшие, компьютер - младшие разряды)
+ALPHABET = string.ascii_uppercase + string.ascii_lowercase + string.digits + "+/"
+
+# Итоги проверки результата
+VERIFIED = "verified"
+MISMATCH = "mismatch"
+NO_LOG = "no_log"
+
+# Записей результатов в одной задаче проверки
+AUDIT_CHUNK = 20_000
+
+
+def get_log_tables(rules=CLASSIC_RULESET, spec=None):
+    # Таблицы кодирования и повтора для правил: символ -> (бросок игрока, бросок компьютера),
+    # пара -> символ и символ -> изменение счета; None, если пара значений не помещается в символ.
+    # spec - параметры правил из результата; None - текущие параметры правил rules (старые результаты)
+    if spec is None:
+        spec = get_ruleset(rules).get_spec()
+    return get_spec_tables(spec)
+
+
+@lru_cache(maxsize=None)
+def get_spec_tables(spec):
+    # Таблицы журнала по параметрам правил; кэшируются по параметрам, а не по названию правил
+    ruleset = parse_ruleset_spec(spec, spec)
+    size = len(ruleset.values)
+    if size * size > len(ALPHABET):
+        return None
+    pairs = {ALPHABET[player * size + computer]: (player_value, computer_value)
+             for player, player_value in enumerate(ruleset.values)
+             for computer, computer_value in enumerate(ruleset.values)}
+    symbols = {pair: symbol for symbol, pair in pairs.items()}
+    deltas = {symbol: ruleset.resolve(*pair) for symbol, pair in pairs.items()}
+    return pairs, symbols, deltas
+
+
+class RollLog:
+    # Журнал бросков одной игры
+
+    def __init__(self, rules=CLASSIC_RULESET, spec=None):
+        self.symbols = []
+        self.table = get_log_tables(rules, spec)[1]
+
+    def append(self, player_roll, computer_roll):
+        # Записывает пару бросков
+        self.symbols.append(self.table[(player_roll, computer_roll)])
+
+    def to_text(self):
+        # Упакованный журнал для сохранения в результате
+        return "".join(self.symbols)
+
+
+def iter_rounds(text, rules=CLASSIC_RULESET, spec=None):
+    # Раунды по журналу: (номер раунда, список пар бросков, изменение счета, счет после раунда)
+    pairs, _, deltas = get_log_tables(rules, spec)
+    score = 0
+    round_number = 1
+    rolls = []
+    for symbol in text:
+        rolls.append(pairs[symbol])
+        delta = deltas[symbol]
+        if delta is not None:
+            score += delta
+            yield round_number, rolls, delta, score
+            round_number += 1
+            rolls = []
+    if rolls:
+        yield round_number, rolls, None, score
+
+
+def replay_log(text, rules=CLASSIC_RULESET, spec=None):
+    # Быстрый повтор журнала: (счет, сыгранные раунды, есть ли незавершенный раунд)
+    deltas = get_log_tables(rules, spec)[2]
+    score = 0
+    rounds = 0
+    pending = False
+    for symbol in text:
+        delta = deltas[symbol]
+        if delta is None:
+            pending = True
+        else:
+            score += delta
+            rounds += 1
+            pending = False
+    return score, rounds, pending
+
+
+def check_log(text, rounds_total, score, rules=CLASSIC_RULESET, spec=None):
+    # Сверяет результат с журналом; возвращает (итог проверки, описание расхождения)
+    if not text:
+        return NO_LOG, ""
+    try:
+        if get_log_tables(rules, spec) is None:
+            return MISMATCH, f"для правил {rules} журнал не ведется"
+        logged_score, rounds, pending = replay_log(text, rules, spec)
+    except ValueError:
+        return MISMATCH, f"неизвестные правила {rules}" if spec is None else f"неверные параметры правил {spec}"
+    except KeyError:
+        return MISMATCH, "журнал поврежден"
+    if rounds != rounds_total or pending:
+        return MISMATCH, f"в журнале {rounds} раундов из {rounds_total}"
+    if logged_score != score:
+        return MISMATCH, f"по журналу счет {logged_score}, сохранен {score}"
+    return VERIFIED, ""
+
+
+def verify_result(result):
+    # Проверяет словарь результата в формате game_results.json
+    return check_log(result.get('Броски'), result.get('Количество раундов'), result.get('Итоговый счет'),
+                     result.get('Правила', CLASSIC_RULESET), result.get('Параметры правил'))
+
+
+class AuditReport:
+    # Итоги проверки хранилища: подтвержденные, без журнала и расхождения (позиция, дата, игрок, описание)
+
+    def __init__(self):
+        self.verified = 0
+        self.unlogged = 0
+        self.mismatches = []
+
+    def merge(self, partial):
+        # Добавляет итоги одной пачки
+        verified, unlogged, mismatches = partial
+        self.verified += verified
+        self.unlogged += unlogged
+        self.mismatches.extend(mismatches)
+
+    def get_total(self):
+        # Количество проверенных записей
+        return self.verified + self.unlogged + len(self.mismatches)
+
+
+def _check_chunk(chunk):
+    # Проверяет пачку (позиция, дата, игрок, журнал, раунды, счет, правила, их параметры) в процессе-исполнителе
+    verified = unlogged = 0
+    mismatches = []
+    for position, date, player, text, rounds_total, score, rules, spec in chunk:
+        status, message = check_log(text, rounds_total, score, rules, spec)
+        if status == VERIFIED:
+            verified += 1
+        elif status == NO_LOG:
+            unlogged += 1
+        else:
+            mismatches.append((position, date, player, message))
+    return verified, unlogged, mismatches
+
+
+def iter_chunks(results):
+    # Пачки по AUDIT_CHUNK записей; в процессы передаются только нужные для проверки поля
+    rows = enumerate(results)
+    while True:
+        chunk = [(position, result.get('Дата', ''), result.get('Игрок', ''), result.get('Броски'),
+                  result.get('Количество раундов'), result.get('Итоговый счет'),
+                  result.get('Правила', CLASSIC_RULESET), result.get('Параметры правил'))
+                 for position, result in islice(rows, AUDIT_CHUNK)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def audit(results, workers=None):
+    # Проверяет поток результатов в пуле процессов; workers=1 - в текущем процессе
+    report = AuditReport()
+    if workers == 1:
+        for chunk in iter_chunks(results):
+            report.merge(_check_chunk(chunk))
+        return report
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # В очереди не больше двух пачек на процесс, чтобы хранилище не читалось в память целиком
+        window = 2 * (workers or os.cpu_count() or 1)
+        pending = deque()
+        for chunk in iter_chunks(results):
+            pending.append(executor.submit(_check_chunk, chunk))
+            if len(pending) >= window:
+                report.merge(pending.popleft().result())
+        while pending:
+            report.merge(pending.popleft().result())
+    return report
+
+
+def main():
+    # Командная строка: python -m game.replay audit|show ...
+    from .storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Журналы бросков игры 'КОСТИ'")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    audit_parser = subparsers.add_parser("audit", help="сверить все результаты с журналами")
+    audit_parser.add_argument("results_file", nargs="?", default=RESULTS_FILE)
+    audit_parser.add_argument("--backend", default=RESULTS_BACKEND, choices=["jsonl", "sqlite", "segments"], help="хранилище")
+    audit_parser.add_argument("--workers", type=int, default=None, help="число процессов")
+    show_parser = subparsers.add_parser("show", help="показать раунды игры по номеру записи")
+    show_parser.add_argument("position", type=int, help="номер записи в порядке сохранения, с 0")
+    show_parser.add_argument("results_file", nargs="?", default=RESULTS_FILE)
+    show_parser.add_argument("--backend", default=RESULTS_BACKEND, choices=["jsonl", "sqlite", "segments"], help="хранилище")
+    args = parser.parse_args()
+
+    storage = create_storage(args.results_file, args.backend)
+
+    if args.command == "audit":
+        report = audit(storage.iter_results(), args.workers)
+        print(f"Проверено: {report.get_total()} | Подтверждено: {report.verified}"
+              f" | Без журнала: {report.unlogged} | Расхождений: {len(report.mismatches)}")
+        for position, date, player, message in report.mismatches:
+            print(f"  #{position} {date} {player}: {message}")
+        return
+
+    result = next(islice(storage.iter_results(), args.position, None), None)
+    if result is None:
+        print("Запись не найдена")
+        return
+    print(f"{result.get('Дата', '')} {result.get('Игрок', '')}: {result.get('Количество раундов')} раундов,"
+          f" счет {result.get('Итоговый счет')}")
+    text = result.get('Броски')
+    if not text:
+        print("Журнал бросков не сохранен")
+        return
+    rules = result.get('Правила', CLASSIC_RULESET)
+    spec = result.get('Параметры правил')
+    try:
+        tables = get_log_tables(rules, spec)
+    except ValueError:
+        tables = None
+    if tables is None:
+        print(f"Журнал для правил {rules} не разбирается")
+        return
+    for round_number, rolls, delta, score in iter_rounds(text, rules, spec):
+        throws = ", ".join(f"{player}:{computer}" for player, computer in rolls)
+        outcome = "не завершен" if delta is None else f"{delta:+d}, счет {score}"
+        print(f"  Раунд {round_number}: {throws} -> {outcome}")
+    status, message = verify_result(result)
+    print("Результат подтвержден журналом" if status == VERIFIED else f"Расхождение: {message}")
+
+
+if __name__ == "__main__":
+    main()
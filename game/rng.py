@@ -0,0 +1,118 @@
+# Генераторы случайных чисел для игр
+# У каждой игры свой генератор с известным сидом: игру можно переиграть по сохраненному сиду
+# Все генераторы поддерживают randint, random и choices, как random.Random
+
+import bisect
+import hashlib
+import random
+import secrets
+from itertools import accumulate
+from .settings import DICE_MIN, DICE_MAX, RNG_KIND, RNG_POOL_SIZE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Грани кубика для пула заранее брошенных значений
+FACES = list(range(DICE_MIN, DICE_MAX + 1))
+
+
+class PythonRNG(random.Random):
+    # Генератор Mersenne Twister из стандартной библиотеки
+
+    kind = "python"
+
+    def __init__(self, seed):
+        # Инициализация сидом
+        super().__init__(seed)
+        self.seed_value = seed
+
+
+class BufferedRNG(PythonRNG):
+    # Mersenne Twister с пулом заранее брошенных кубиков: один вызов choices на RNG_POOL_SIZE бросков
+
+    kind = "buffered"
+
+    def __init__(self, seed, pool_size=RNG_POOL_SIZE):
+        # Пул заполняется по мере расхода
+        super().__init__(seed)
+        self.pool_size = pool_size
+        self.pool = []
+
+    def randint(self, a, b):
+        # Бросок кубика берется из пула, остальные диапазоны - как в random.Random
+        if a != DICE_MIN or b != DICE_MAX:
+            return super().randint(a, b)
+        if not self.pool:
+            self.pool = self.choices(FACES, k=self.pool_size)
+            self.pool.reverse()
+        return self.pool.pop()
+
+
+class NumpyRNG:
+    # Генератор NumPy (PCG64 или Philox) с буферами бросков и равномерных чисел
+
+    def __init__(self, seed, kind="pcg64", pool_size=RNG_POOL_SIZE):
+        # Инициализация битового генератора
+        if np is None:
+            raise ImportError("Для генераторов PCG64/Philox нужен пакет numpy")
+        bit_generators = {"pcg64": np.random.PCG64, "philox": np.random.Philox}
+        self.kind = kind
+        self.seed_value = seed
+        self.generator = np.random.Generator(bit_generators[kind](seed))
+        self.pool_size = pool_size
+        self.dice = []
+        self.uniforms = []
+
+    def randint(self, a, b):
+        # Бросок кубика из пула; прочие диапазоны - отдельным вызовом
+        if a != DICE_MIN or b != DICE_MAX:
+            return int(self.generator.integers(a, b + 1))
+        if not self.dice:
+            self.dice = self.generator.integers(a, b + 1, size=self.pool_size).tolist()
+        return self.dice.pop()
+
+    def random(self):
+        # Равномерное число из [0, 1)
+        if not self.uniforms:
+            self.uniforms = self.generator.random(self.pool_size).tolist()
+        return self.uniforms.pop()
+
+    def choices(self, population, weights=None, cum_weights=None, k=1):
+        # Выбор с весами по образцу random.Random.choices
+        if cum_weights is None:
+            cum_weights = list(accumulate(weights)) if weights is not None else list(range(1, len(population) + 1))
+        total = cum_weights[-1]
+        last = len(population) - 1
+        return [population[min(bisect.bisect(cum_weights, self.random() * total), last)] for _ in range(k)]
+
+
+def make_rng(seed=None, kind=RNG_KIND):
+    # Создает генератор выбранного типа; без сида берется новый случайный 64-битный сид
+    if seed is None:
+        seed = secrets.randbits(64)
+    if kind == "python":
+        return PythonRNG(seed)
+    if kind == "buffered":
+        return BufferedRNG(seed)
+    if kind in ("pcg64", "philox"):
+        return NumpyRNG(seed, kind)
+    raise ValueError(f"Неизвестный тип генератора: {kind}")
+
+
+def derive_seed(master_seed, *keys):
+    # Независимый 64-битный сид для потока, полученный из мастер-сида и ключей
+    data = repr((master_seed,) + keys).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def format_seed(rng):
+    # Сид для сохранения в результате: "тип:число"
+    return f"{rng.kind}:{rng.seed_value}"
+
+
+def parse_seed(text):
+    # Разбирает сохраненный сид; возвращает (сид, тип генератора)
+    kind, _, seed = text.partition(":")
+    return int(seed), kind
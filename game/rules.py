@@ -0,0 +1,187 @@
+# Правила игры 'КОСТИ'
+# Чистые функции без ввода-вывода, общие для интерактивной игры и симуляций.
+# Ruleset - декларативные правила из settings.RULESETS. Таблицы правил считаются один раз при запуске:
+# распределение значения броска, изменение счета для каждой пары значений и распределение исхода раунда.
+# Бросок любого числа кубиков - одна выборка по таблице, раунд симуляции - выборка исхода и числа бросков
+
+import math
+import re
+from fractions import Fraction
+from functools import lru_cache
+from itertools import accumulate
+from .settings import DICE_MIN, RULESETS, RULESET
+
+# Значение броска: сумма кубиков или старший кубик
+SCORING_SUM = "sum"
+SCORING_HIGHEST = "highest"
+
+# Очки за раунд: разница значений бросков или одно очко победителю раунда
+POINTS_DIFFERENCE = "difference"
+POINTS_WIN = "win"
+
+# Правила, по которым сыграны результаты без поля "Правила"
+CLASSIC_RULESET = "classic"
+
+# Параметры правил в результате: "1d6 sum difference" (см. Ruleset.get_spec)
+SPEC_PATTERN = re.compile(r"(\d+)d(\d+) (\w+) (\w+)")
+
+
+def resolve_round(player_roll, computer_roll):
+    # Возвращает изменение счета игрока за бросок или None при ничьей (нужен переброс)
+    if player_roll == computer_roll:
+        return None
+    return player_roll - computer_roll
+
+
+def get_outcome(score):
+    # Итог игры по финальному счету игрока: 1 - победа, -1 - поражение, 0 - ничья
+    if score > 0:
+        return 1
+    if score < 0:
+        return -1
+    return 0
+
+
+@lru_cache(maxsize=1024)
+def get_throw_table(dice, faces, scoring, face_weights=None):
+    # Таблица броска dice кубиков: (значения, веса, накопленные веса) по весам граней одного кубика
+    # (None - честный кубик); при целых весах граней веса значений точные
+    weights = list(face_weights) if face_weights is not None else [1] * faces
+    if len(weights) != faces:
+        raise ValueError(f"Нужно {faces} весов граней")
+    if scoring == SCORING_SUM:
+        # Свертка распределения одного кубика с самим собой dice раз
+        distribution = [1]
+        for _ in range(dice):
+            combined = [0] * (len(distribution) + faces - 1)
+            for low, low_weight in enumerate(distribution):
+                for face, face_weight in enumerate(weights):
+                    combined[low + face] += low_weight * face_weight
+            distribution = combined
+        first = dice * DICE_MIN
+    elif scoring == SCORING_HIGHEST:
+        # Старший кубик не больше v с весом F(v)^dice, где F - накопленный вес граней
+        cumulative = [weight ** dice for weight in accumulate(weights)]
+        distribution = cumulative[:1] + [high - low for low, high in zip(cumulative, cumulative[1:])]
+        first = DICE_MIN
+    else:
+        raise ValueError(f"Неизвестный подсчет броска: {scoring}")
+    values = tuple(range(first, first + len(distribution)))
+    return values, tuple(distribution), tuple(accumulate(distribution))
+
+
+class Ruleset:
+    # Правила броска и раунда с таблицами исходов
+
+    def __init__(self, name, dice=1, faces=6, scoring=SCORING_SUM, points=POINTS_DIFFERENCE):
+        # Проверка правил и расчет таблиц
+        if dice < 1 or faces < 2:
+            raise ValueError(f"Правила {name}: нужен хотя бы один кубик и две грани")
+        if points not in (POINTS_DIFFERENCE, POINTS_WIN):
+            raise ValueError(f"Правила {name}: неизвестные очки за раунд: {points}")
+        self.name = name
+        self.dice = dice
+        self.faces = faces
+        self.scoring = scoring
+        self.points = points
+        self.max_face = DICE_MIN + faces - 1
+        self.values, self.weights, self.cum_weights = get_throw_table(dice, faces, scoring)
+        self.min_value = self.values[0]
+
+        # Изменение счета по паре значений: delta_table[игрок - min_value][компьютер - min_value]
+        self.delta_table = [[self.get_delta(player_value, computer_value) for computer_value in self.values]
+                            for player_value in self.values]
+
+        # Исход раунда: веса пар значений по изменению счета и доля ничьих
+        tied = 0
+        delta_weights = {}
+        for player_weight, row in zip(self.weights, self.delta_table):
+            for computer_weight, delta in zip(self.weights, row):
+                if delta is None:
+                    tied += player_weight * computer_weight
+                else:
+                    delta_weights[delta] = delta_weights.get(delta, 0) + player_weight * computer_weight
+        pairs = self.cum_weights[-1] ** 2
+        self.tie_probability = Fraction(tied, pairs)
+        self.deltas = tuple(sorted(delta_weights.items()))
+        decided = pairs - tied
+        self.delta_values = [delta for delta, _ in self.deltas]
+        self.delta_cum_probabilities = [float(Fraction(weight, decided))
+                                        for weight in accumulate(weight for _, weight in self.deltas)]
+        # Число бросков до раунда без ничьей - геометрическое: 1 + int(log(1 - u) / log_tie)
+        self.log_tie = math.log(self.tie_probability) if self.tie_probability else None
+
+    def get_delta(self, player_value, computer_value):
+        # Изменение счета игрока по значениям бросков; None при ничьей (переброс)
+        if player_value == computer_value:
+            return None
+        if self.points == POINTS_WIN:
+            return 1 if player_value > computer_value else -1
+        return player_value - computer_value
+
+    def resolve(self, player_value, computer_value):
+        # Изменение счета за бросок по таблице; None при ничьей
+        return self.delta_table[player_value - self.min_value][computer_value - self.min_value]
+
+    def get_throw_table(self, face_weights=None):
+        # (значения, накопленные веса) броска для весов граней одного кубика (None - честный кубик)
+        if face_weights is None:
+            return self.values, self.cum_weights
+        values, _, cum_weights = get_throw_table(self.dice, self.faces, self.scoring, tuple(face_weights))
+        return values, cum_weights
+
+    def roll(self, rng, face_weights=None):
+        # Значение одного броска одной выборкой; честный одиночный кубик бросается randint, как раньше
+        if face_weights is None and self.dice == 1:
+            return rng.randint(DICE_MIN, self.max_face)
+        values, cum_weights = self.get_throw_table(face_weights)
+        return rng.choices(values, cum_weights=cum_weights)[0]
+
+    def roll_many(self, rng, count, face_weights=None):
+        # Пачка значений бросков одним вызовом
+        values, cum_weights = self.get_throw_table(face_weights)
+        return rng.choices(values, cum_weights=cum_weights, k=count)
+
+    def get_round_distribution(self):
+        # Распределение изменения счета за раунд с учетом перебросов: кортеж пар (изменение, вероятность)
+        decided = sum(weight for _, weight in self.deltas)
+        return tuple((delta, Fraction(weight, decided)) for delta, weight in self.deltas)
+
+    def get_spec(self):
+        # Параметры правил одной строкой для сохранения в результате: по ним игра повторяется,
+        # даже если правила с этим названием в настройках потом изменятся
+        return f"{self.dice}d{self.faces} {self.scoring} {self.points}"
+
+    def describe(self):
+        # Краткое описание правил для экрана
+        scoring = "сумма" if self.scoring == SCORING_SUM else "старший кубик"
+        points = "разница" if self.points == POINTS_DIFFERENCE else "1 очко за раунд"
+        return f"{self.name}: {self.dice}d{self.faces}, {scoring}, {points}"
+
+
+def load_rulesets(specs=RULESETS):
+    # Правила из настроек с посчитанными таблицами
+    return {name: Ruleset(name, **spec) for name, spec in specs.items()}
+
+
+# Правила процесса; таблицы считаются при импорте
+RULESET_TABLES = load_rulesets()
+
+
+def get_ruleset(name=RULESET):
+    # Правила по названию
+    if name not in RULESET_TABLES:
+        raise ValueError(f"Неизвестные правила: {name}")
+    return RULESET_TABLES[name]
+
+
+def parse_ruleset_spec(name, spec):
+    # Правила по параметрам из результата; таблицы текущих правил берутся готовыми, если параметры совпадают
+    match = SPEC_PATTERN.fullmatch(spec)
+    if match is None:
+        raise ValueError(f"Правила {name}: неверные параметры {spec!r}")
+    current = RULESET_TABLES.get(name)
+    if current is not None and current.get_spec() == spec:
+        return current
+    dice, faces, scoring, points = match.groups()
+    return Ruleset(name, int(dice), int(faces), scoring, points)
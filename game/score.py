@@ -1,70 +1,233 @@
 # Модуль для работы с результатами игры
 # Класс ScoreManager для сохранения и чтения результатов
 
-import json
 from datetime import datetime
-from .settings import RESULTS_FILE, DATE_FORMAT, clear, get_level_name
+from .settings import (RESULTS_FILE, DATE_FORMAT, GAME_LEVELS, GAME_LEVELS_CONVERT, LEADERBOARD_SIZE,
+                       LEADERBOARD_MIN_GAMES, ANALYTICS_WINDOW, clear, get_level_name)
+from .storage import create_storage
+from .exceptions import StatisticsUpdateError
+from .stats import StatsAggregate, get_stats_file, load_aggregate, save_aggregate, append_aggregate
+from .leaderboard import Leaderboard
+from .probability import get_expected_win_rate
+from .writer import BufferedResultWriter
+from .analytics import analyze
+from .metrics import timer, observe
+from .cache import results_cache
+from .render import header, block
 
 
 class ScoreManager:
     # Класс для управления результатами игры
     
-    def __init__(self, results_file=RESULTS_FILE):
-        # Инициализация менеджера результатов
+    def __init__(self, results_file=RESULTS_FILE, storage=None, buffered=False):
+        # Инициализация менеджера результатов; buffered - сохранять результаты пачками в фоне
         self.results_file = results_file
+        self.storage = storage or create_storage(results_file)
+        self.stats_file = get_stats_file(results_file)
+        # Общий для процесса кэш этого хранилища: статистика, таблица лидеров и страницы результатов
+        self.cache = results_cache.get(self.storage)
+        self.writer = BufferedResultWriter(self) if buffered else None
     
-    def save_result(self, name, rounds, score):
+    def save_result(self, name, rounds, score, seed=None, rolls=None, rules=None, strategy=None, rules_spec=None):
         # Сохраняет результат игры в файл
-        result = {
-            "Дата": datetime.now().strftime(DATE_FORMAT),
-            "Игрок": name,
-            "Уровень игры": get_level_name(rounds),
-            "Количество раундов": rounds,
-            "Итоговый счет": score
-        }
-        
-        results = self._load_results()
-        results.append(result)
-        self._save_results(results)
-        print(f"\nРезультат игры сохранен в файл {self.results_file}")
-    
-    def _load_results(self):
-        # Загружает результаты из файла
-        try:
-            with open(self.results_file, 'r', encoding='utf-8') as file:
-                return json.load(file)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
-    
-    def _save_results(self, results):
-        # Сохраняет результаты в файл
+        result = make_result(name, rounds, score, seed, rolls, rules, strategy, rules_spec)
+        
+        if self.writer is not None:
+            self.writer.submit(result)
+            error = self.writer.take_error()
+            if error is not None:
+                print(f"Внимание: фоновое сохранение результатов не удалось, повтор при следующем сбросе: {error}")
+            print(f"\nРезультат игры будет сохранен в файл {self.storage.get_location()}")
+            return
+        
         try:
-            with open(self.results_file, 'w', encoding='utf-8') as file:
-                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.save_results([result])
+        except StatisticsUpdateError as e:
+            print(f"Внимание: {e}")
         except Exception as e:
             print(f"Ошибка при сохранении результата: {e}")
+            return
+        print(f"\nРезультат игры сохранен в файл {self.storage.get_location()}")
+    
+    def save_results(self, results):
+        # Сохраняет пачку результатов одной записью и обновляет статистику и таблицу лидеров
+        # Все шаги идут под блокировкой хранилища: другие процессы не вклиниваются между проверкой
+        # агрегата и его сохранением, поэтому чужие результаты не теряются в статистике
+        if not results:
+            return
+        observe("results.save_batch", len(results))
+        # Кэш блокируется раньше хранилища: в этом же порядке их берет чтение страниц
+        with self.cache.lock, self.storage.lock():
+            self.cache.validate()
+            stats = self.get_statistics()
+            if self.cache.leaderboard is not None and self.cache.leaderboard.marker != stats.marker:
+                # Хранилище менял другой процесс: таблица будет перестроена при следующем показе
+                self.cache.leaderboard = None
+            with timer("results.save"):
+                self.storage.append_many(results)
+            try:
+                for result in results:
+                    stats.add(result)
+                    if self.cache.leaderboard is not None:
+                        self.cache.leaderboard.add(result)
+                stats.marker = self.storage.get_marker()
+                append_aggregate(self.stats_file, stats, results)
+                if self.cache.leaderboard is not None:
+                    self.cache.leaderboard.marker = stats.marker
+                self.cache.add_results(results)
+            except Exception as e:
+                # Результаты уже в хранилище: кэш сбрасывается, а агрегат с устаревшей меткой
+                # пересчитается при следующем чтении статистики
+                self.cache.clear()
+                self.cache.key = None
+                raise StatisticsUpdateError(f"результаты сохранены, но статистика не обновлена: {e}") from e
+    
+    def flush(self):
+        # Сохраняет результаты, ожидающие в очереди буферизованной записи
+        if self.writer is not None:
+            self.writer.flush()
+    
+    def close(self):
+        # Дописывает очередь и останавливает фоновую запись
+        if self.writer is not None:
+            self.writer.close()
+    
+    def _iter_results(self):
+        # Потоково читает результаты из хранилища
+        return self.storage.iter_results()
+    
+    def _load_results(self):
+        # Загружает все результаты списком
+        with timer("results.load"):
+            results = list(self._iter_results())
+        observe("results.records_loaded", len(results))
+        return results
+    
+    def get_statistics(self):
+        # Возвращает агрегат статистики, сверяя его с текущим состоянием хранилища
+        marker = self.storage.get_marker()
+        if self.cache.stats is not None and (marker is None or self.cache.stats.marker == marker):
+            return self.cache.stats
+        stats = load_aggregate(self.stats_file)
+        if stats is None or (marker is not None and stats.marker != marker):
+            return self.rebuild_statistics()
+        self.cache.stats = stats
+        return stats
+    
+    def rebuild_statistics(self):
+        # Пересчитывает агрегат статистики по всем результатам и сохраняет его
+        # Под блокировкой: иначе метка могла бы учесть результат, дописанный во время пересчета
+        with self.storage.lock(), timer("results.rebuild_statistics"):
+            stats = self.storage.build_statistics() or StatsAggregate.from_results(self._iter_results())
+            stats.marker = self.storage.get_marker()
+            save_aggregate(self.stats_file, stats)
+        self.cache.stats = stats
+        return stats
+    
+    def get_leaderboard(self):
+        # Возвращает таблицу лидеров; строится один раз и дальше обновляется при сохранении
+        marker = self.storage.get_marker()
+        if self.cache.leaderboard is None or (marker is not None and self.cache.leaderboard.marker != marker):
+            with timer("results.build_leaderboard"):
+                self.cache.leaderboard = Leaderboard.from_results(self._iter_results())
+            self.cache.leaderboard.marker = marker
+        return self.cache.leaderboard
+    
+    def show_leaderboard(self):
+        # Показывает таблицу лидеров с выбором уровня
+        self.flush()
+        level = None
+        while True:
+            self._display_leaderboard(level)
+            print("\nВыберите уровень: 1-3 - уровень, 4 - все уровни, 5 - выйти в меню")
+            choice = input("Ваш выбор (1-5): ").strip()
+            if choice in GAME_LEVELS:
+                level = get_level_name(GAME_LEVELS[choice])
+            elif choice == "4":
+                level = None
+            elif choice == "5":
+                break
+            else:
+                print("❌ Неверный выбор.")
+                input("Нажмите Enter для продолжения...")
+    
+    def _display_leaderboard(self, level):
+        # Отображает три рейтинга для выбранного уровня
+        clear()
+        leaderboard = self.get_leaderboard()
+        print(header(f"                 ТАБЛИЦА ЛИДЕРОВ ({level or 'все уровни'})", 70))
+        tables = [
+            ("По сумме очков", leaderboard.top_by_score(LEADERBOARD_SIZE, level), "{:+d}"),
+            (f"По проценту побед (от {LEADERBOARD_MIN_GAMES} игр)",
+             leaderboard.top_by_win_rate(LEADERBOARD_SIZE, level), "{:.1f}%"),
+            ("По лучшей игре", leaderboard.top_by_best_game(LEADERBOARD_SIZE, level), "{:+d}")
+        ]
+        for title, rows, value_format in tables:
+            print(f"\n{title}:")
+            print("-" * 70)
+            if not rows:
+                print("Пока нет данных.")
+            for i, (player, value) in enumerate(rows, 1):
+                print(f"{i:2}. {player[:15]:15} | {value_format.format(value)}")
+        print("="*70)
+    
+    def show_analytics(self):
+        # Показывает аналитику трендов, посчитанную одним проходом по результатам
+        self.flush()
+        clear()
+        with timer("results.analyze"):
+            report = analyze(self._iter_results())
+        
+        print(header("                     АНАЛИТИКА ИГР", 70))
+        if not report.games:
+            print("\nРезультатов игр пока нет.")
+            input("\nНажмите Enter для возврата в главное меню...")
+            return
+        
+        print(f"Процент побед за последние {len(report.rolling_win_rate.window)} игр: "
+              f"{report.rolling_win_rate.get_value():.1f}% (окно {ANALYTICS_WINDOW})")
+        
+        print("\nСамые длинные серии побед:")
+        for player, length in report.streaks.get_top(5) or [("-", 0)]:
+            print(f"  {player[:15]:15} | {length}")
+        print("Самые длинные серии поражений:")
+        for player, length in report.streaks.get_top(5, losses=True) or [("-", 0)]:
+            print(f"  {player[:15]:15} | {length}")
+        
+        print("\nРаспределение счета по уровням:")
+        for level_name in GAME_LEVELS_CONVERT.values():
+            histogram = report.scores.get_histogram(level_name)
+            if histogram:
+                print(f"  {level_name:6}: " + " ".join(f"{score:+d}x{count}" for score, count in histogram))
+        
+        print("\nИгры по часам суток:")
+        print("  " + " ".join(f"{hour:02}:{count}" for hour, count in enumerate(report.activity.hours) if count))
+        weekdays = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+        print("Игры по дням недели:")
+        print("  " + " ".join(f"{weekdays[day]}:{count}" for day, count in enumerate(report.activity.weekdays)))
+        print("="*70)
+        input("\nНажмите Enter для возврата в главное меню...")
     
     def get_results(self):
         # Читает и выводит все сохраненные результаты с пагинацией
+        self.flush()
         clear()
-        results = self._load_results()
+        total_results = self.cache.get_count(self.storage)
         
-        if not results:
+        if not total_results:
             print("\nРезультатов игр пока нет.")
             print("Сыграйте несколько игр, чтобы увидеть статистику!")
             input("\nНажмите Enter для возврата в главное меню...")
             return
         
-        # Сортируем результаты по дате (новые сверху)
-        results.sort(key=lambda x: x.get('Дата', ''), reverse=True)
-        
+        # Хранилище отдает страницы уже отсортированными по дате (новые сверху)
         page = 0
         per_page = 8
-        total_pages = self._calculate_total_pages(len(results), per_page)
+        total_pages = self._calculate_total_pages(total_results, per_page)
         
         while True:
-            self._display_page(results, page, per_page, total_pages)
-            self._show_statistics(results)
+            self._display_page(page, per_page, total_pages, total_results)
+            self._show_statistics()
             action = self._get_navigation_choice(page, total_pages)
             
             if action == "previous":
@@ -93,20 +256,17 @@ class ScoreManager:
         
         print(f"{index:2}. {date} | {player:15} | {level:6} | {score_text:4} {status}")
     
-    def _display_page(self, results, page, per_page, total_pages):
-        # Отображает одну страницу результатов
+    def _display_page(self, page, per_page, total_pages, total_results):
+        # Отображает одну страницу результатов, читая из хранилища только ее
         clear()
         start = page * per_page
         end = start + per_page
-        current_results = results[start:end]
+        with timer("results.read_page"):
+            current_results = self.cache.read_page(self.storage, start, per_page)
         
-        print("\n" + "="*70)
-        print("                     РЕЗУЛЬТАТЫ ИГР")
-        print("="*70)
-        print(f"Страница {page + 1} из {total_pages} | Результаты {start + 1}-{min(end, len(results))} из {len(results)}")
-        print("-" * 70)
-        print("№   Дата и время     | Игрок           | Уровень | Счет")
-        print("-" * 70)
+        print(header("                     РЕЗУЛЬТАТЫ ИГР", 70))
+        print(f"Страница {page + 1} из {total_pages} | Результаты {start + 1}-{min(end, total_results)} из {total_results}")
+        print(block("-" * 70, "№   Дата и время     | Игрок           | Уровень | Счет", "-" * 70))
         
         for i, result in enumerate(current_results, start + 1):
             self._display_result(result, i)
@@ -135,14 +295,44 @@ class ScoreManager:
         else:
             return "invalid"
     
-    def _show_statistics(self, results):
-        # Показывает общую статистику
-        wins = len([r for r in results if r.get('Итоговый счет', 0) > 0])
-        losses = len([r for r in results if r.get('Итоговый счет', 0) < 0])
-        draws = len([r for r in results if r.get('Итоговый счет', 0) == 0])
-        
-        win_rate = (wins / len(results)) * 100 if len(results) > 0 else 0
+    def _show_statistics(self):
+        # Показывает общую статистику из агрегата без пересчета результатов
+        stats = self.get_statistics()
+        total = stats.total
+        expected_win_rate = get_expected_win_rate({name: bucket.games for name, bucket in stats.levels.items()})
         
         print("-" * 70)
-        print(f"Всего: {len(results)} | Побед: {wins} | Поражений: {losses} | Ничьих: {draws} | Процент побед: {win_rate:.1f}%")
-        print("="*70)
\ No newline at end of file
+        print(format_statistics(total.games, total.wins, total.losses, total.draws))
+        print(f"Ожидаемый процент побед при честных кубиках: {expected_win_rate:.1f}%")
+        print("="*70)
+
+
+def format_statistics(total, wins, losses, draws):
+    # Строка общей статистики в формате экрана результатов
+    win_rate = (wins / total) * 100 if total > 0 else 0
+    return f"Всего: {total} | Побед: {wins} | Поражений: {losses} | Ничьих: {draws} | Процент побед: {win_rate:.1f}%"
+
+
+def make_result(name, rounds, score, seed=None, rolls=None, rules=None, strategy=None, rules_spec=None):
+    # Словарь результата игры в формате game_results.json
+    # seed - сид генератора для повтора игры, rolls - упакованный журнал бросков (см. replay.py),
+    # rules - название правил из RULESETS (None - классические правила),
+    # strategy и rules_spec - стратегия компьютера и параметры правил, с которыми игра повторяется по сиду
+    result = {
+        "Дата": datetime.now().strftime(DATE_FORMAT),
+        "Игрок": name,
+        "Уровень игры": get_level_name(rounds),
+        "Количество раундов": rounds,
+        "Итоговый счет": score
+    }
+    if seed is not None:
+        result["Сид"] = seed
+    if rolls is not None:
+        result["Броски"] = rolls
+    if rules is not None:
+        result["Правила"] = rules
+    if strategy is not None:
+        result["Стратегия"] = strategy
+    if rules_spec is not None:
+        result["Параметры правил"] = rules_spec
+    return result
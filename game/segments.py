@@ -0,0 +1,550 @@
+# Хранилище результатов, разбитое по времени
+# Каталог <файл результатов>.segments: сегменты JSON Lines по дням (2025-01-05.jsonl), после уплотнения -
+# по месяцам (2025-01.jsonl), и сводки по месяцам в rollups/ с итогами каждого дня.
+# Итоги дней, удаленных по сроку хранения, лежат рядом со сводкой в rollups/<месяц>.expired: сводку можно
+# пересчитать по сегментам, а их - нет. Дозапись не переписывает сводку месяца, а дописывает изменение
+# в ее журнал rollups/<месяц>.log (см. fileutil.load_snapshot).
+# Количество записей, страницы, статистика и запросы по диапазону дат читают только нужные сегменты и сводки
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from datetime import date, timedelta
+from .settings import RESULTS_FILE, SEGMENTS_COMPACT_AFTER_DAYS, SEGMENTS_RETENTION_DAYS, DELTA_LOG_MAX_BYTES
+from .storage import ResultStorage, JsonLinesStorage, encode_result, decode_result
+from .fileutil import write_atomic, write_all, load_snapshot, save_snapshot, append_delta
+from .stats import StatsAggregate, get_entry
+from .metrics import timer, count, observe
+from .exceptions import RollupError
+
+SEGMENT_SUFFIX = ".jsonl"
+ROLLUP_SUFFIX = ".json"
+EXPIRED_SUFFIX = ".expired"
+INTENT_SUFFIX = ".compact"
+
+# Сегмент для результатов без разборчивой даты; в порядке сегментов он самый старый
+UNDATED = "undated"
+DAY_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}$")
+
+
+class MonthRollup:
+    # Сводка месяца: итоги каждого дня, число записей в каждом сегменте и размеры сегментов, по которым она
+    # посчитана; expired - итоги дней, сегменты которых удалены по сроку хранения (хранятся в отдельном файле)
+
+    VERSION = 2
+
+    def __init__(self, month):
+        self.month = month
+        self.signature = {}
+        self.counts = {}
+        self.days = {}
+        self.expired = {}
+
+    def add(self, segment, result):
+        # Учитывает результат, записанный в сегмент segment
+        self.counts[segment] = self.counts.get(segment, 0) + 1
+        self.days.setdefault(get_day(result), StatsAggregate()).add(result)
+
+    def add_entry(self, day, entry):
+        # Учитывает результат дневного сегмента day по записи журнала изменений (см. stats.get_entry)
+        self.counts[day] = self.counts.get(day, 0) + 1
+        self.days.setdefault(day, StatsAggregate()).add_entry(*entry)
+
+    def get_aggregate(self, date_from=None, date_to=None, include_expired=False):
+        # Итоги дней из диапазона [date_from, date_to] (даты в формате ГГГГ-ММ-ДД)
+        aggregate = StatsAggregate()
+        sources = [self.days, self.expired] if include_expired else [self.days]
+        for days in sources:
+            for day, day_aggregate in days.items():
+                if in_range(day, date_from, date_to):
+                    aggregate.merge(day_aggregate)
+        return aggregate
+
+    def to_dict(self):
+        # Словарь для сохранения в JSON
+        return {
+            "version": self.VERSION,
+            "signature": self.signature,
+            "counts": self.counts,
+            "days": {day: aggregate.to_dict() for day, aggregate in self.days.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, month, data):
+        # Восстанавливает сводку без expired; None, если версия формата не совпадает
+        if data.get("version") != cls.VERSION:
+            return None
+        rollup = cls(month)
+        rollup.signature = data["signature"]
+        rollup.counts = data["counts"]
+        rollup.days = {day: StatsAggregate.from_dict(item) for day, item in data["days"].items()}
+        return rollup
+
+
+class SegmentedStorage(ResultStorage):
+    # Результаты в сегментах по дням и месяцам со сводками
+
+    def __init__(self, directory=None, legacy_file=RESULTS_FILE):
+        # По умолчанию каталог лежит рядом со старым файлом результатов
+        self.legacy_file = legacy_file
+        self.directory = directory or get_segments_dir(legacy_file)
+        self.rollup_dir = os.path.join(self.directory, "rollups")
+        self._ready = False
+
+    def get_location(self):
+        # Возвращает путь к каталогу сегментов
+        return self.directory
+
+    def append(self, result):
+        # Дописывает один результат
+        self.append_many([result])
+
+    def append_many(self, results):
+        # Дописывает результаты в сегменты их дней и обновляет сводки затронутых месяцев
+        groups = {}
+        for result in results:
+            groups.setdefault(get_day(result), []).append(result)
+        if not groups:
+            return
+        with self.lock():
+            self._ensure_ready()
+            sizes = self._get_sizes()
+            months = {get_month(day) for day in groups}
+            rollups = {month: self._load_rollup(month) for month in months}
+            signatures = {month: get_month_sizes(sizes, month) for month in months}
+            written = 0
+            with timer("storage.append"):
+                for day, group in groups.items():
+                    data = "".join(encode_result(result) for result in group).encode("utf-8")
+                    fd = os.open(self._segment_path(day), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    try:
+                        write_all(fd, data)
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+                    written += len(data)
+                    sizes[day] = sizes.get(day, 0) + len(data)
+            observe("storage.bytes_written", written)
+            for month, rollup in rollups.items():
+                if rollup is None or rollup.signature != signatures[month]:
+                    # Сводка устарела и без этих результатов: ее пересчитает первое чтение
+                    continue
+                entries = []
+                for day, group in groups.items():
+                    if get_month(day) == month:
+                        for result in group:
+                            rollup.add(day, result)
+                            entries.append([day] + get_entry(result))
+                rollup.signature = get_month_sizes(sizes, month)
+                # В журнал сводки дописываются только новые результаты; сводка переписывается, когда журнал
+                # пора свернуть
+                delta = {"signature": rollup.signature, "add": entries}
+                if not append_delta(self._rollup_path(month), delta, DELTA_LOG_MAX_BYTES):
+                    self._save_rollup(rollup)
+            # Дозапись не меняет время каталога, а по нему кэш результатов узнает об изменениях
+            os.utime(self.directory)
+
+    def get_marker(self):
+        # Отпечаток имен и размеров сегментов: меняется при дозаписи, уплотнении и удалении
+        sizes = self._get_sizes()
+        data = repr(sorted(sizes.items())).encode("utf-8")
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+    def iter_results(self):
+        # Потоково отдает результаты по сегментам от старых к новым
+        self._ensure_ready()
+        for name in self.list_segments():
+            yield from self._read_segment(name)
+
+    def count(self):
+        # Количество записей по сводкам
+        sizes = self._get_sizes()
+        return sum(sum(rollup.counts.values()) for rollup in self._iter_rollups(sizes))
+
+    def read_page(self, start, limit):
+        # Страница от новых к старым: сегменты целиком пропускаются по числу записей из сводок
+        sizes = self._get_sizes()
+        counts = {}
+        for rollup in self._iter_rollups(sizes):
+            counts.update(rollup.counts)
+        page = []
+        skip = start
+        for name in reversed(self.list_segments(sizes)):
+            segment_count = counts.get(name, 0)
+            if skip >= segment_count:
+                skip -= segment_count
+                continue
+            rows = sorted(self._read_segment(name, sizes[name]), key=lambda x: x.get('Дата', ''))
+            rows.reverse()
+            page.extend(rows[skip:skip + limit - len(page)])
+            skip = 0
+            if len(page) >= limit:
+                break
+        return page
+
+    def build_statistics(self):
+        # Агрегат статистики из сводок без чтения сегментов
+        sizes = self._get_sizes()
+        aggregate = StatsAggregate()
+        for rollup in self._iter_rollups(sizes):
+            aggregate.merge(rollup.get_aggregate())
+        return aggregate
+
+    def query(self, date_from=None, date_to=None, player=None, level=None):
+        # Результаты из диапазона дат [date_from, date_to] с фильтрами; читаются только сегменты диапазона
+        for name in self.list_segments():
+            first_day, last_day = get_segment_days(name)
+            if not (in_range(last_day, date_from, None) and in_range(first_day, None, date_to)):
+                continue
+            for result in self._read_segment(name):
+                if (in_range(result.get('Дата', ''), date_from, date_to)
+                        and (player is None or result.get('Игрок') == player)
+                        and (level is None or result.get('Уровень игры') == level)):
+                    yield result
+
+    def get_range_statistics(self, date_from=None, date_to=None, include_expired=True):
+        # Итоги диапазона дат по сводкам месяцев; include_expired - с учетом удаленных по сроку дней
+        sizes = self._get_sizes()
+        months = set(get_month_names(sizes)) | set(self._list_rollup_months())
+        aggregate = StatsAggregate()
+        for month in sorted(months):
+            if month == UNDATED:
+                if date_from or date_to:
+                    continue
+            elif not in_range(month, date_from and date_from[:7], date_to and date_to[:7]):
+                continue
+            rollup = self._get_rollup(month, sizes)
+            if rollup is not None:
+                aggregate.merge(rollup.get_aggregate(date_from, date_to, include_expired))
+        return aggregate
+
+    def compact(self, today=None, compact_after_days=SEGMENTS_COMPACT_AFTER_DAYS,
+                retention_days=SEGMENTS_RETENTION_DAYS):
+        # Удаляет сегменты старше срока хранения, сливает старые дни в сегменты месяцев и обновляет сводки
+        # Возвращает (слито дневных сегментов, удалено сегментов)
+        today = today or date.today()
+        merged = expired = 0
+        with self.lock(), timer("storage.compact"):
+            self._ensure_ready()
+            self._recover()
+            if retention_days is not None:
+                cutoff = (today - timedelta(days=retention_days)).isoformat()
+                for name in self.list_segments():
+                    if name != UNDATED and get_segment_days(name)[1] < cutoff:
+                        self._expire_segment(name)
+                        expired += 1
+
+            cutoff = (today - timedelta(days=compact_after_days)).isoformat()
+            months = {}
+            for name in self.list_segments():
+                if DAY_PATTERN.match(name) and name < cutoff:
+                    months.setdefault(get_month(name), []).append(name)
+            for month, days in months.items():
+                self._merge_segments(month, days)
+                merged += len(days)
+
+            sizes = self._get_sizes()
+            for month in get_month_names(sizes):
+                self._get_rollup(month, sizes)
+            os.utime(self.directory)
+        count("storage.segments_merged", merged)
+        count("storage.segments_expired", expired)
+        return merged, expired
+
+    def list_segments(self, sizes=None):
+        # Имена сегментов без расширения от старых к новым
+        return sorted(sizes if sizes is not None else self._get_sizes(), key=get_segment_sort_key)
+
+    def _expire_segment(self, name):
+        # Переносит итоги сегмента в итоги удаленных дней месяца и удаляет сегмент
+        month = get_month(name)
+        expired = self._load_expired(month)
+        for result in self._read_segment(name):
+            expired.setdefault(get_day(result), StatsAggregate()).add(result)
+        # Сначала сохраняются итоги: при сбое они могут задвоиться с сегментом, но не потеряться.
+        # Сводка месяца после удаления сегмента не совпадет по подписи и будет пересчитана
+        self._save_expired(month, expired)
+        os.remove(self._segment_path(name))
+
+    def _merge_segments(self, month, days):
+        # Сливает дневные сегменты в сегмент месяца, отсортированный по дате
+        # Намерение с итоговым размером сохраняется заранее, чтобы после сбоя не задвоить записи
+        rows = list(self._read_segment(month)) if os.path.exists(self._segment_path(month)) else []
+        for day in days:
+            rows.extend(self._read_segment(day))
+        rows.sort(key=lambda x: x.get('Дата', ''))
+        data = "".join(encode_result(result) for result in rows).encode("utf-8")
+        intent_path = os.path.join(self.directory, month + INTENT_SUFFIX)
+        write_atomic(intent_path, json.dumps({"size": len(data), "merged": days}).encode("utf-8"))
+        write_atomic(self._segment_path(month), data)
+        for day in days:
+            os.remove(self._segment_path(day))
+        os.remove(intent_path)
+
+    def _recover(self):
+        # Завершает уплотнение, прерванное сбоем: удаляет уже слитые дневные сегменты
+        for name in os.listdir(self.directory):
+            if not name.endswith(INTENT_SUFFIX):
+                continue
+            intent_path = os.path.join(self.directory, name)
+            month = name[:-len(INTENT_SUFFIX)]
+            with open(intent_path, 'r', encoding='utf-8') as file:
+                intent = json.load(file)
+            try:
+                replaced = os.path.getsize(self._segment_path(month)) == intent["size"]
+            except FileNotFoundError:
+                replaced = False
+            if replaced:
+                for day in intent["merged"]:
+                    if os.path.exists(self._segment_path(day)):
+                        os.remove(self._segment_path(day))
+            os.remove(intent_path)
+
+    def _ensure_ready(self):
+        # Создает каталог и однократно переносит историю из журнала или старого JSON-массива
+        if self._ready:
+            return
+        with self.lock():
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.rollup_dir, exist_ok=True)
+                self._import_history()
+            os.makedirs(self.rollup_dir, exist_ok=True)
+            self._recover()
+            self._ready = True
+
+    def _import_history(self):
+        # Раскладывает существующую историю по дневным сегментам
+        log_storage = JsonLinesStorage(legacy_file=self.legacy_file)
+        if not os.path.exists(log_storage.log_file) and not os.path.exists(self.legacy_file):
+            return
+        groups = {}
+        for result in log_storage.iter_results():
+            groups.setdefault(get_day(result), []).append(result)
+        for day, group in groups.items():
+            write_atomic(self._segment_path(day), "".join(encode_result(r) for r in group).encode("utf-8"))
+
+    def _get_sizes(self):
+        # Размеры сегментов по именам
+        self._ensure_ready()
+        sizes = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(SEGMENT_SUFFIX):
+                    sizes[entry.name[:-len(SEGMENT_SUFFIX)]] = entry.stat().st_size
+        return sizes
+
+    def _iter_rollups(self, sizes):
+        # Актуальные сводки всех месяцев, в которых есть сегменты
+        for month in get_month_names(sizes):
+            yield self._get_rollup(month, sizes)
+
+    def _get_rollup(self, month, sizes):
+        # Сводка месяца, пересчитанная по его сегментам, если они изменились с момента ее записи
+        signature = get_month_sizes(sizes, month)
+        rollup = self._load_rollup(month)
+        if rollup is None or rollup.signature != signature:
+            # Пересчет под блокировкой: иначе он может затереть сводку, обновленную дозаписью или уплотнением
+            with self.lock():
+                rollup = self._load_rollup(month)
+                if rollup is None or rollup.signature != signature:
+                    rollup = self._rebuild_rollup(month, signature)
+        rollup.expired = self._load_expired(month)
+        return rollup
+
+    def _rebuild_rollup(self, month, signature):
+        # Пересчитывает сводку месяца по сегментам; вызывается под блокировкой
+        if not os.path.exists(self._expired_path(month)):
+            # Файл итогов удаленных дней заводится до первой сводки новой версии: так потом поврежденную
+            # сводку можно пересчитать, не гадая, были ли в ней итоги удаленных дней
+            self._save_expired(month, self._load_expired(month))
+        fresh = MonthRollup(month)
+        # Сегменты читаются только до размеров из подписи: дописанное позже войдет в следующий пересчет
+        for name, size in signature.items():
+            for result in self._read_segment(name, size):
+                fresh.add(name, result)
+        fresh.signature = signature
+        self._save_rollup(fresh)
+        count("storage.rollup_rebuilds")
+        return fresh
+
+    def _load_rollup(self, month):
+        # Сводка месяца с диска с изменениями из ее журнала; None, если ее нет или она повреждена
+        loaded = load_snapshot(self._rollup_path(month))
+        if loaded is None:
+            return None
+        snapshot, deltas = loaded
+        try:
+            rollup = MonthRollup.from_dict(month, snapshot)
+            if rollup is not None:
+                for delta in deltas:
+                    for day, *entry in delta["add"]:
+                        rollup.add_entry(day, entry)
+                    rollup.signature = delta["signature"]
+            return rollup
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return None
+
+    def _save_rollup(self, rollup):
+        # Атомарно сохраняет сводку месяца целиком и сбрасывает ее журнал изменений
+        save_snapshot(self._rollup_path(rollup.month), rollup.to_dict())
+
+    def _load_expired(self, month):
+        # Итоги удаленных по сроку дней месяца. Пересчитать их нельзя, поэтому поврежденный файл - ошибка,
+        # а не пустые итоги
+        path = self._expired_path(month)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            data = self._load_legacy_expired(month)
+        except json.JSONDecodeError as e:
+            raise RollupError(f"Итоги удаленных дней повреждены: {path}") from e
+        try:
+            return {day: StatsAggregate.from_dict(item) for day, item in data.items()}
+        except (AttributeError, KeyError, TypeError) as e:
+            raise RollupError(f"Итоги удаленных дней повреждены: {path}") from e
+
+    def _load_legacy_expired(self, month):
+        # Итоги удаленных дней из сводки первой версии, где они хранились вместе с итогами дней
+        path = self._rollup_path(month)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            raise RollupError(f"Сводка повреждена, и итоги удаленных по сроку дней в ней не восстановить: "
+                              f"{path}") from e
+        if not isinstance(data, dict):
+            raise RollupError(f"Сводка повреждена, и итоги удаленных по сроку дней в ней не восстановить: {path}")
+        return data.get("expired", {})
+
+    def _save_expired(self, month, expired):
+        # Атомарно сохраняет итоги удаленных дней месяца
+        data = json.dumps({day: aggregate.to_dict() for day, aggregate in expired.items()}, ensure_ascii=False)
+        write_atomic(self._expired_path(month), data.encode("utf-8"))
+
+    def _list_rollup_months(self):
+        # Месяцы, для которых есть сводки или итоги удаленных дней (в том числе полностью удаленные по сроку)
+        try:
+            names = os.listdir(self.rollup_dir)
+        except FileNotFoundError:
+            return []
+        months = set()
+        for name in names:
+            for suffix in (ROLLUP_SUFFIX, EXPIRED_SUFFIX):
+                if name.endswith(suffix):
+                    months.add(name[:-len(suffix)])
+        return sorted(months)
+
+    def _read_segment(self, name, size=None):
+        # Результаты сегмента; size - читать только первые size байт
+        try:
+            with open(self._segment_path(name), 'rb') as file:
+                data = file.read(size) if size is not None else file.read()
+        except FileNotFoundError:
+            return
+        parsed = 0
+        for line in data.decode('utf-8').splitlines(keepends=True):
+            result = decode_result(line)
+            if result is not None:
+                parsed += 1
+                yield result
+        count("storage.records_parsed", parsed)
+
+    def _segment_path(self, name):
+        return os.path.join(self.directory, name + SEGMENT_SUFFIX)
+
+    def _rollup_path(self, month):
+        return os.path.join(self.rollup_dir, month + ROLLUP_SUFFIX)
+
+    def _expired_path(self, month):
+        return os.path.join(self.rollup_dir, month + EXPIRED_SUFFIX)
+
+
+def get_segments_dir(results_file):
+    # Каталог сегментов для указанного файла результатов
+    return os.path.splitext(results_file)[0] + ".segments"
+
+
+def get_day(result):
+    # День результата (ГГГГ-ММ-ДД) - имя его дневного сегмента
+    day = str(result.get('Дата', ''))[:10]
+    return day if DAY_PATTERN.match(day) else UNDATED
+
+
+def get_month(name):
+    # Месяц сегмента или дня (ГГГГ-ММ)
+    return UNDATED if name == UNDATED else name[:7]
+
+
+def get_segment_days(name):
+    # Первый и последний возможный день сегмента
+    if name == UNDATED:
+        return "", ""
+    if DAY_PATTERN.match(name):
+        return name, name
+    return f"{name}-01", f"{name}-31"
+
+
+def get_segment_sort_key(name):
+    # Порядок сегментов: без даты, затем по месяцам; внутри месяца сначала сегмент месяца, потом дни
+    return name != UNDATED, get_month(name), name[8:]
+
+
+def get_month_names(sizes):
+    # Месяцы, в которых есть сегменты
+    return sorted({get_month(name) for name in sizes})
+
+
+def get_month_sizes(sizes, month):
+    # Подпись сводки: размеры сегментов месяца
+    return {name: size for name, size in sizes.items() if get_month(name) == month}
+
+
+def in_range(value, date_from, date_to):
+    # Попадает ли дата в диапазон [date_from, date_to]; границы сравниваются по своей длине
+    if date_from and value[:len(date_from)] < date_from:
+        return False
+    if date_to and value[:len(date_to)] > date_to:
+        return False
+    return True
+
+
+def main():
+    # Командная строка: python -m game.segments compact|stats ...
+    parser = argparse.ArgumentParser(description="Сегменты результатов игры 'КОСТИ'")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact_parser = subparsers.add_parser("compact", help="уплотнить сегменты и применить срок хранения")
+    compact_parser.add_argument("results_file", nargs="?", default=RESULTS_FILE)
+    compact_parser.add_argument("--compact-after", type=int, default=SEGMENTS_COMPACT_AFTER_DAYS,
+                                help="сливать дни старше N дней в сегменты месяцев")
+    compact_parser.add_argument("--retention", type=int, default=SEGMENTS_RETENTION_DAYS,
+                                help="удалять сегменты старше N дней")
+    stats_parser = subparsers.add_parser("stats", help="итоги за диапазон дат по сводкам")
+    stats_parser.add_argument("results_file", nargs="?", default=RESULTS_FILE)
+    stats_parser.add_argument("--from", dest="date_from", default=None, help="ГГГГ-ММ-ДД или ГГГГ-ММ")
+    stats_parser.add_argument("--to", dest="date_to", default=None, help="ГГГГ-ММ-ДД или ГГГГ-ММ")
+    stats_parser.add_argument("--live", action="store_true", help="без удаленных по сроку дней")
+    args = parser.parse_args()
+
+    storage = SegmentedStorage(legacy_file=args.results_file)
+    try:
+        if args.command == "compact":
+            merged, expired = storage.compact(compact_after_days=args.compact_after, retention_days=args.retention)
+            print(f"Слито дневных сегментов: {merged} | Удалено по сроку: {expired}")
+            return
+        aggregate = storage.get_range_statistics(args.date_from, args.date_to, not args.live)
+    except RollupError as e:
+        parser.error(str(e))
+    total = aggregate.total
+    print(f"Игр: {total.games} | Побед: {total.wins} | Поражений: {total.losses} | Ничьих: {total.draws}"
+          f" | Сумма счета: {total.score_sum}")
+    for level, bucket in sorted(aggregate.levels.items()):
+        print(f"  {level:12} игр {bucket.games:6} | побед {bucket.get_win_rate():.1f}% | сумма {bucket.score_sum:+d}")
+
+
+if __name__ == "__main__":
+    main()
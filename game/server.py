@@ -0,0 +1,284 @@
+# Асинхронный сетевой сервер игры 'КОСТИ'
+# Много независимых игровых сессий в одном цикле событий asyncio и общий пакетный писатель результатов
+#
+# Протокол построчный (UTF-8). Команды клиента:
+#   NAME <имя>   - представиться
+#   LEVEL <1-3>  - начать игру выбранного уровня
+#   ROLL         - бросить кубик в текущем раунде
+#   STATUS       - текущий счет
+#   QUIT         - выйти (незаконченная игра не сохраняется)
+# Ответы сервера начинаются с ключевого слова: OK, ERR, ROLL, TIE, ROUND, FINAL, STATUS, BYE
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from .settings import (GAME_LEVELS, LEVEL_STRATEGIES, TIE_DELAY, SERVER_HOST, SERVER_PORT, SERVER_BACKLOG,
+                       SERVER_WRITE_BATCH, SERVER_WRITE_INTERVAL, validate_player_name)
+from .engine import (GameEngine, ACTION_ROLL, ACTION_CONTINUE, STATE_ROLL, STATE_CONTINUE,
+                     GameStarted, DiceRolled, RoundTied, RoundFinished, GameFinished)
+from .exceptions import InvalidInputError, StatisticsUpdateError
+from .score import ScoreManager, make_result
+from .strategies import get_strategy
+
+
+class ResultWriter:
+    # Собирает завершенные игры всех сессий и сохраняет их пачками одной записью
+
+    def __init__(self, score_manager, batch_size=SERVER_WRITE_BATCH, interval=SERVER_WRITE_INTERVAL):
+        # Инициализация очереди; запись начинается после start()
+        self.score_manager = score_manager
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = asyncio.Queue()
+        # Один поток записи: пачки сохраняются по очереди, а соединение SQLite принадлежит этому потоку
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-writer")
+        self.task = None
+        self.saved = 0
+        self.lost = 0
+
+    def start(self):
+        # Запускает фоновую задачу записи
+        self.task = asyncio.create_task(self._run())
+
+    def submit(self, result):
+        # Ставит результат в очередь на запись
+        self.queue.put_nowait(result)
+
+    async def close(self):
+        # Дописывает очередь и останавливает задачу
+        self.queue.put_nowait(None)
+        await self.task
+        self.executor.shutdown()
+
+    async def _run(self):
+        # Цикл записи: пачка до размера или таймаута; пачка с ошибкой записи повторяется через interval
+        running = True
+        batch = []
+        while running or batch:
+            if running and len(batch) < self.batch_size:
+                batch, running = await self._collect(batch)
+            if not batch:
+                continue
+            batch = await self._save(batch)
+            if batch:
+                if not running:
+                    self.lost += len(batch)
+                    print(f"Результаты не сохранены при остановке сервера: {len(batch)}")
+                    break
+                await asyncio.sleep(self.interval)
+
+    async def _collect(self, batch):
+        # Ждет первый результат и добирает пачку до размера или таймаута; (пачка, False) после сигнала остановки
+        loop = asyncio.get_running_loop()
+        if not batch:
+            result = await self.queue.get()
+            if result is None:
+                return batch, False
+            batch = [result]
+        deadline = loop.time() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                result = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if result is None:
+                return batch, False
+            batch.append(result)
+        return batch, True
+
+    async def _save(self, batch):
+        # Сохраняет пачку в потоке записи; возвращает пачку, если ее нужно повторить
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.score_manager.save_results, batch)
+        except StatisticsUpdateError as e:
+            # Результаты записаны, повторять пачку нельзя
+            print(f"Внимание: {e}")
+        except Exception as e:
+            print(f"Ошибка при сохранении результатов ({len(batch)}): {e}; повтор через {self.interval} с")
+            return batch
+        self.saved += len(batch)
+        return []
+
+
+class GameSession:
+    # Сетевой фронтенд игрового движка: одна игра на подключение в каждый момент времени
+
+    def __init__(self, reader, writer, result_writer, tie_delay):
+        # Инициализация сессии для одного подключения
+        self.reader = reader
+        self.writer = writer
+        self.result_writer = result_writer
+        self.tie_delay = tie_delay
+        self.player_name = None
+        self.engine = None
+
+    def send(self, *lines):
+        # Отправляет клиенту строки ответа
+        self.writer.write("".join(f"{line}\n" for line in lines).encode("utf-8"))
+
+    async def run(self):
+        # Обрабатывает команды клиента до QUIT или разрыва соединения
+        self.send("OK КОСТИ: NAME <имя>, LEVEL <1-3>, ROLL, STATUS, QUIT")
+        try:
+            while True:
+                await self.writer.drain()
+                line = await self.reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode("utf-8").strip().partition(" ")
+                if not await self.handle(command.upper(), argument.strip()):
+                    break
+            await self.writer.drain()
+        except (ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            self.writer.close()
+
+    async def handle(self, command, argument):
+        # Выполняет одну команду; False - закрыть соединение
+        try:
+            if command == "NAME":
+                validate_player_name(argument)
+                self.player_name = argument
+                self.engine = None
+                self.send(f"OK NAME {argument}")
+            elif command == "LEVEL":
+                self.start_game(argument)
+            elif command == "ROLL":
+                await self.play_round()
+            elif command == "STATUS":
+                self.send(self.format_status())
+            elif command == "QUIT":
+                self.send("BYE")
+                return False
+            else:
+                raise InvalidInputError("Неизвестная команда")
+        except InvalidInputError as e:
+            self.send(f"ERR {e}")
+        return True
+
+    def start_game(self, level_choice):
+        # Начинает новую игру выбранного уровня
+        if self.player_name is None:
+            raise InvalidInputError("Сначала представьтесь: NAME <имя>")
+        if level_choice not in GAME_LEVELS:
+            raise InvalidInputError("Неверный уровень! Введите число от 1 до 3.")
+        try:
+            self.engine = GameEngine(self.player_name, GAME_LEVELS[level_choice],
+                                     get_strategy(LEVEL_STRATEGIES[level_choice]))
+        except ValueError as e:
+            # Стратегия уровня из настроек не подходит к правилам
+            raise InvalidInputError(str(e))
+        self.send_events(self.engine.start())
+
+    async def play_round(self):
+        # Бросает кубики, пока раунд не решится; ничья ждет без блокировки цикла событий
+        if self.engine is None or self.engine.state != STATE_ROLL:
+            raise InvalidInputError("Игра не начата: LEVEL <1-3>")
+        while True:
+            events = self.engine.handle(ACTION_ROLL)
+            self.send_events(events)
+            if not isinstance(events[-1], RoundTied):
+                break
+            await self.writer.drain()
+            await asyncio.sleep(self.tie_delay)
+        if self.engine.state == STATE_CONTINUE:
+            self.engine.handle(ACTION_CONTINUE)
+        elif self.engine.is_finished():
+            self.result_writer.submit(make_result(self.player_name, self.engine.rounds_total,
+                                                  self.engine.player.get_score(), self.engine.get_seed(),
+                                                  self.engine.get_roll_log(), self.engine.get_rules(),
+                                                  self.engine.get_strategy_name(), self.engine.get_rules_spec()))
+            self.engine = None
+
+    def send_events(self, events):
+        # Переводит события движка в строки протокола
+        for event in events:
+            if isinstance(event, GameStarted):
+                self.send(f"OK LEVEL {event.level_name} {event.rounds_total}")
+            elif isinstance(event, DiceRolled):
+                self.send(f"ROLL {event.round_number} {event.player_roll} {event.computer_roll}")
+            elif isinstance(event, RoundTied):
+                self.send("TIE")
+            elif isinstance(event, RoundFinished):
+                self.send(f"ROUND {event.round_number} {event.delta:+d} {event.player_score}")
+            elif isinstance(event, GameFinished):
+                self.send(f"FINAL {event.player_score} {event.outcome}")
+
+    def format_status(self):
+        # Строка STATUS: текущий раунд, всего раундов, счет игрока
+        if self.engine is None:
+            return "STATUS 0 0 0"
+        return f"STATUS {self.engine.current_round} {self.engine.rounds_total} {self.engine.player.get_score()}"
+
+
+class GameServer:
+    # TCP-сервер: одна GameSession на подключение, общий ResultWriter
+
+    def __init__(self, score_manager=None, host=SERVER_HOST, port=SERVER_PORT, tie_delay=TIE_DELAY):
+        # Инициализация сервера; сокет открывается в start()
+        self.score_manager = score_manager or ScoreManager()
+        self.host = host
+        self.port = port
+        self.tie_delay = tie_delay
+        self.server = None
+        self.result_writer = None
+        self.sessions = set()
+
+    async def start(self):
+        # Открывает сокет и запускает писатель результатов
+        self.result_writer = ResultWriter(self.score_manager)
+        self.result_writer.start()
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                                 backlog=SERVER_BACKLOG)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        # Закрывает сокет, прерывает сессии (незаконченные игры не сохраняются) и дописывает очередь
+        self.server.close()
+        for task in list(self.sessions):
+            task.cancel()
+        if self.sessions:
+            await asyncio.gather(*self.sessions, return_exceptions=True)
+        await self.server.wait_closed()
+        await self.result_writer.close()
+
+    async def _handle_client(self, reader, writer):
+        # Обслуживает одно подключение
+        task = asyncio.current_task()
+        self.sessions.add(task)
+        try:
+            await GameSession(reader, writer, self.result_writer, self.tie_delay).run()
+        finally:
+            self.sessions.discard(task)
+
+
+async def serve(host, port):
+    # Запускает сервер до прерывания
+    server = GameServer(host=host, port=port)
+    await server.start()
+    print(f"Сервер игры 'КОСТИ' слушает {host}:{server.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main():
+    # Запуск из командной строки: python -m game.server --port 8765
+    parser = argparse.ArgumentParser(description="Сетевой сервер игры 'КОСТИ'")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nСервер остановлен.")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,13 @@ GAME_LEVELS = {
     "3": 10  # Long
 }
 
+# Стратегия кубика компьютера для каждого уровня (см. game.strategies.STRATEGIES)
+LEVEL_STRATEGIES = {
+    "1": "fair",
+    "2": "fair",
+    "3": "fair"
+}
+
 # Обратное соответствие для названий уровней
 GAME_LEVELS_CONVERT = {
     5: "Short",
@@ -28,9 +35,95 @@ DICE_SYMBOLS = {
     6: "⚅"
 }
 
+# Правила броска: кубиков в броске (dice), граней кубика (faces, от DICE_MIN),
+# значение броска (scoring: "sum" - сумма кубиков, "highest" - старший кубик)
+# и очки за раунд (points: "difference" - разница значений, "win" - 1 очко победителю).
+# Ничья в раунде всегда перебрасывается. Таблицы исходов правил считаются при запуске (game.rules)
+RULESETS = {
+    "classic": {"dice": 1, "faces": 6, "scoring": "sum", "points": "difference"},
+    "two-dice": {"dice": 2, "faces": 6, "scoring": "sum", "points": "difference"},
+    "d20": {"dice": 1, "faces": 20, "scoring": "sum", "points": "difference"},
+    "five-highest": {"dice": 5, "faces": 6, "scoring": "highest", "points": "difference"},
+    "ten-dice-win": {"dice": 10, "faces": 6, "scoring": "sum", "points": "win"}
+}
+# Правила игры из RULESETS
+RULESET = "classic"
+
+# Генератор случайных чисел для игр: "python", "buffered" (пул бросков), "pcg64" или "philox" (нужен numpy)
+RNG_KIND = "python"
+# Размер пула бросков: у каждой игры свой генератор, а партия тратит лишь десятки бросков
+RNG_POOL_SIZE = 32
+
+# Сохранять журнал бросков каждой игры для проверки спорных результатов (python -m game.replay audit)
+REPLAY_LOG = True
+
+# Метрики (включаются переменной DICE_METRICS=1 или из меню): .json - JSON, иначе формат Prometheus
+METRICS_FILE = "game_metrics.prom"
+# Отчеты профилировщика (DICE_PROFILE=cpu|memory): game_profile.pstats и game_profile.memory.txt
+PROFILE_FILE = "game_profile"
+PROFILE_TOP = 25
+
+# Вывод в терминал: "frame" - кадрами с выводом только изменений (только для терминала), "plain" - print
+RENDERER = "frame"
+
+# Кэш результатов в памяти: записей в блоке, блоков на файл, файлов на процесс
+CACHE_BLOCK_SIZE = 64
+CACHE_MAX_BLOCKS = 256
+CACHE_MAX_FILES = 8
+
 # Файл для сохранения результатов
 RESULTS_FILE = "game_results.json"
 
+# Хранилище результатов: "jsonl" - журнал JSON Lines, "sqlite" - база SQLite,
+# "segments" - сегменты по дням со сводками (python -m game.segments compact)
+RESULTS_BACKEND = "jsonl"
+# База SQLite для RESULTS_FILE; для другого файла результатов база лежит рядом с ним (<имя>.db)
+RESULTS_DB_FILE = "game_results.db"
+
+# Сегменты: дни старше SEGMENTS_COMPACT_AFTER_DAYS сливаются в сегмент месяца,
+# сегменты старше SEGMENTS_RETENTION_DAYS удаляются (их итоги остаются в сводках); None - хранить все
+SEGMENTS_COMPACT_AFTER_DAYS = 7
+SEGMENTS_RETENTION_DAYS = None
+
+# Потоковое чтение старого game_results.json: размер порции чтения и максимальный размер одной записи, символы;
+# сколько ошибок хранить в отчете о поврежденных записях
+LEGACY_CHUNK_SIZE = 1 << 20
+LEGACY_MAX_RECORD = 1 << 20
+LEGACY_MAX_ERRORS = 20
+# Перенос старого файла в журнал при первом открытии хранилища: записей в одной записи в журнал
+LEGACY_MIGRATION_BATCH = 10_000
+
+# Журналы изменений агрегата статистики и сводок месяцев: журнал больше этого размера, байты,
+# сворачивается в новый снимок (снимок переписывается целиком только тогда и при пересчете)
+DELTA_LOG_MAX_BYTES = 1 << 20
+
+# Выгрузка результатов (python -m game.export export): записей в пачке и период вывода прогресса, секунды
+EXPORT_BATCH = 10_000
+EXPORT_PROGRESS_INTERVAL = 1.0
+
+# Буферизованная запись результатов: размер пачки и максимальная задержка сброса, секунды
+RESULTS_BATCH_SIZE = 512
+RESULTS_FLUSH_INTERVAL = 1.0
+
+# Таблица лидеров: размер и минимум игр для рейтинга по проценту побед
+LEADERBOARD_SIZE = 10
+LEADERBOARD_MIN_GAMES = 3
+
+# Пауза перед перебросом при ничьей, секунды
+TIE_DELAY = 2
+
+# Сетевой сервер игры
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+# Очередь ожидающих подключений: тысячи клиентов могут подключаться одновременно
+SERVER_BACKLOG = 4096
+# Пачка результатов для записи сервером и максимальное ожидание ее заполнения, секунды
+SERVER_WRITE_BATCH = 256
+SERVER_WRITE_INTERVAL = 0.5
+
+# Окно скользящего процента побед на экране аналитики
+ANALYTICS_WINDOW = 20
+
 # Формат даты и времени
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
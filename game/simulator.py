@@ -0,0 +1,80 @@
+# Пакетная симуляция игр без интерфейса
+# Класс Simulator проигрывает партии по правилам game.rules без input(), clear() и пауз.
+# Раунд разыгрывается по таблице исхода раунда правил, поэтому цена раунда не зависит от числа кубиков
+
+import random
+from bisect import bisect
+from math import log
+from .settings import GAME_LEVELS, get_level_name
+from .rules import get_outcome, get_ruleset
+from .exceptions import InvalidInputError
+
+
+class SimulationResult:
+    # Результаты серии симулированных игр одного уровня
+
+    def __init__(self, level_choice, rounds_total, scores, throws):
+        # scores - итоговый счет каждой игры, throws - число бросков в игре (с перебросами)
+        self.level_choice = level_choice
+        self.rounds_total = rounds_total
+        self.scores = scores
+        self.throws = throws
+
+    def get_level_name(self):
+        # Название уровня
+        return get_level_name(self.rounds_total)
+
+    def count_outcomes(self):
+        # Количество побед, поражений и ничьих игрока
+        wins = losses = 0
+        for score in self.scores:
+            outcome = get_outcome(score)
+            if outcome > 0:
+                wins += 1
+            elif outcome < 0:
+                losses += 1
+        return wins, losses, len(self.scores) - wins - losses
+
+    def __len__(self):
+        # Количество сыгранных игр
+        return len(self.scores)
+
+
+class Simulator:
+    # Безголовый движок: играет полные партии игрока против компьютера на полной скорости
+
+    def __init__(self, seed=None, ruleset=None):
+        # Инициализация с собственным генератором случайных чисел; ruleset - правила (по умолчанию RULESET)
+        self.random = random.Random(seed)
+        self.ruleset = ruleset or get_ruleset()
+
+    def play_game(self, rounds_total):
+        # Проводит одну игру и возвращает (итоговый счет, число бросков)
+        # Раунд - две выборки: изменение счета по накопленным вероятностям и число перебросов
+        ruleset = self.ruleset
+        delta_values = ruleset.delta_values
+        cum_probabilities = ruleset.delta_cum_probabilities
+        last = len(delta_values) - 1
+        log_tie = ruleset.log_tie
+        uniform = self.random.random
+        score = 0
+        throws = rounds_total
+        for _ in range(rounds_total):
+            score += delta_values[bisect(cum_probabilities, uniform(), 0, last)]
+            if log_tie is not None:
+                throws += int(log(1.0 - uniform()) / log_tie)
+        return score, throws
+
+    def run(self, games, level_choice="1"):
+        # Проводит games игр выбранного уровня из GAME_LEVELS
+        if level_choice not in GAME_LEVELS:
+            raise InvalidInputError(f"Неизвестный уровень игры: {level_choice}")
+        rounds_total = GAME_LEVELS[level_choice]
+        scores = []
+        throws = []
+        play_game = self.play_game
+        for _ in range(games):
+            score, game_throws = play_game(rounds_total)
+            scores.append(score)
+            throws.append(game_throws)
+        return SimulationResult(level_choice, rounds_total, scores, throws)
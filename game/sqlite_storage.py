@@ -0,0 +1,200 @@
+# Хранилище результатов в SQLite
+# Индексы по дате, игроку и уровню; фильтры, таблицы лидеров и агрегаты считаются в SQL
+
+import sqlite3
+import threading
+from .settings import RESULTS_DB_FILE
+from .storage import ResultStorage
+from .legacy import iter_legacy_results
+from .metrics import timer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    player TEXT NOT NULL,
+    level TEXT NOT NULL,
+    rounds INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    seed TEXT,
+    rolls TEXT,
+    rules TEXT,
+    strategy TEXT,
+    rules_spec TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_date ON results (date);
+CREATE INDEX IF NOT EXISTS idx_results_player ON results (player, date);
+CREATE INDEX IF NOT EXISTS idx_results_level ON results (level, date);
+"""
+
+# Порядок полей результата в таблице
+RESULT_COLUMNS = "date, player, level, rounds, score, seed, rolls, rules, strategy, rules_spec"
+
+# Необязательные поля результата, добавленные в схему позже: столбец -> ключ результата
+OPTIONAL_COLUMNS = {"seed": "Сид", "rolls": "Броски", "rules": "Правила", "strategy": "Стратегия",
+                    "rules_spec": "Параметры правил"}
+
+# Размер пачки при массовом импорте
+IMPORT_BATCH = 10_000
+
+
+class SQLiteStorage(ResultStorage):
+    # Результаты игр в локальной базе SQLite
+
+    def __init__(self, db_file=RESULTS_DB_FILE):
+        # Открывает (или создает) базу и схему
+        self.db_file = db_file
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        with self.lock():
+            self.connection.executescript(SCHEMA)
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(results)")]
+            for column in OPTIONAL_COLUMNS:
+                if column not in columns:
+                    # База, созданная до появления этого поля
+                    self.connection.execute(f"ALTER TABLE results ADD COLUMN {column} TEXT")
+
+    @property
+    def connection(self):
+        # Соединение текущего потока: объекты sqlite3 нельзя использовать из другого потока,
+        # а результаты сохраняются фоновым потоком записи. Между соединениями изоляцию обеспечивает SQLite
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            # check_same_thread=False нужен только для close() из другого потока
+            connection = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.local.connection = connection
+            with self.connections_lock:
+                self.connections.append(connection)
+        return connection
+
+    def get_location(self):
+        # Возвращает путь к базе
+        return self.db_file
+
+    def append(self, result):
+        # Добавляет один результат
+        self.append_many([result])
+
+    def append_many(self, results):
+        # Добавляет результаты одной транзакцией
+        with timer("storage.append"), self.connection:
+            self.connection.executemany(
+                f"INSERT INTO results ({RESULT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (result_to_row(result) for result in results))
+
+    def get_marker(self):
+        # Идентификатор последней записи: растет при каждой вставке
+        return self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM results").fetchone()[0]
+
+    def iter_results(self):
+        # Потоково отдает результаты в порядке сохранения
+        cursor = self.connection.execute(f"SELECT {RESULT_COLUMNS} FROM results ORDER BY id")
+        for row in cursor:
+            yield row_to_result(row)
+
+    def count(self):
+        # Количество результатов
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def read_page(self, start, limit):
+        # Страница результатов от новых к старым по индексу даты
+        cursor = self.connection.execute(
+            f"SELECT {RESULT_COLUMNS} FROM results ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+            (limit, start))
+        return [row_to_result(row) for row in cursor]
+
+    def query(self, player=None, level=None, date_from=None, date_to=None, limit=None):
+        # Результаты с фильтрами по игроку, уровню и диапазону дат [date_from, date_to]
+        where, params = build_filter(player, level, date_from, date_to)
+        sql = f"SELECT {RESULT_COLUMNS} FROM results{where} ORDER BY date DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [row_to_result(row) for row in self.connection.execute(sql, params)]
+
+    def aggregate(self, player=None, level=None, date_from=None, date_to=None):
+        # Игры, победы, поражения, ничьи, сумма и лучший счет по фильтру
+        where, params = build_filter(player, level, date_from, date_to)
+        row = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(score > 0), 0), COALESCE(SUM(score < 0), 0),"
+            " COALESCE(SUM(score = 0), 0), COALESCE(SUM(score), 0), MAX(score)"
+            f" FROM results{where}", params).fetchone()
+        return dict(zip(("games", "wins", "losses", "draws", "score_sum", "best_score"), row))
+
+    def top_players(self, limit=10, level=None, date_from=None, date_to=None):
+        # Таблица лидеров по суммарному счету: список (игрок, сумма счета, число игр)
+        where, params = build_filter(None, level, date_from, date_to)
+        cursor = self.connection.execute(
+            f"SELECT player, SUM(score) AS total, COUNT(*) FROM results{where}"
+            " GROUP BY player ORDER BY total DESC, player LIMIT ?", params + [limit])
+        return cursor.fetchall()
+
+    def import_json(self, json_file):
+        # Массовый импорт из старого JSON-массива (потоково, поврежденные записи пропускаются);
+        # возвращает число импортированных записей
+        return self.import_results(iter_legacy_results(json_file))
+
+    def import_results(self, results):
+        # Импорт из любого потока результатов пачками по IMPORT_BATCH
+        imported = 0
+        batch = []
+        for result in results:
+            batch.append(result)
+            if len(batch) >= IMPORT_BATCH:
+                self.append_many(batch)
+                imported += len(batch)
+                batch = []
+        self.append_many(batch)
+        return imported + len(batch)
+
+    def close(self):
+        # Закрывает соединения с базой всех потоков
+        with self.connections_lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            connection.close()
+        self.local = threading.local()
+
+
+def result_to_row(result):
+    # Строка таблицы из словаря результата
+    return (result.get('Дата', ''), result.get('Игрок', ''), result.get('Уровень игры', ''),
+            result.get('Количество раундов', 0), result.get('Итоговый счет', 0),
+            *(result.get(key) for key in OPTIONAL_COLUMNS.values()))
+
+
+def row_to_result(row):
+    # Словарь результата в формате game_results.json из строки таблицы
+    date, player, level, rounds, score = row[:5]
+    result = {
+        "Дата": date,
+        "Игрок": player,
+        "Уровень игры": level,
+        "Количество раундов": rounds,
+        "Итоговый счет": score
+    }
+    for key, value in zip(OPTIONAL_COLUMNS.values(), row[5:]):
+        if value is not None:
+            result[key] = value
+    return result
+
+
+def build_filter(player, level, date_from, date_to):
+    # Условие WHERE и параметры для фильтров
+    conditions = []
+    params = []
+    if player is not None:
+        conditions.append("player = ?")
+        params.append(player)
+    if level is not None:
+        conditions.append("level = ?")
+        params.append(level)
+    if date_from is not None:
+        conditions.append("date >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("date <= ?")
+        params.append(date_to)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
@@ -0,0 +1,188 @@
+# Инкрементальная статистика результатов
+# Агрегат StatsAggregate хранится рядом с журналом: снимок <файл>.stats.json и журнал изменений <файл>.stats.log.
+# Сохранение дописывает в журнал только новые результаты (O(1) на результат, независимо от числа игроков);
+# снимок целиком переписывается при пересчете и когда журнал вырастает больше DELTA_LOG_MAX_BYTES
+
+import argparse
+import os
+from .settings import RESULTS_FILE, DELTA_LOG_MAX_BYTES
+from .fileutil import load_snapshot, save_snapshot, append_delta
+
+
+class StatsBucket:
+    # Счетчики игр для одного среза статистики (все игры, уровень или игрок)
+
+    def __init__(self, games=0, wins=0, losses=0, draws=0, score_sum=0, best_score=None):
+        # Инициализация счетчиков
+        self.games = games
+        self.wins = wins
+        self.losses = losses
+        self.draws = draws
+        self.score_sum = score_sum
+        self.best_score = best_score
+
+    def add(self, score):
+        # Учитывает одну игру с итоговым счетом score
+        self.games += 1
+        self.score_sum += score
+        if score > 0:
+            self.wins += 1
+        elif score < 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        if self.best_score is None or score > self.best_score:
+            self.best_score = score
+
+    def merge(self, other):
+        # Добавляет счетчики другого среза
+        self.games += other.games
+        self.wins += other.wins
+        self.losses += other.losses
+        self.draws += other.draws
+        self.score_sum += other.score_sum
+        if other.best_score is not None and (self.best_score is None or other.best_score > self.best_score):
+            self.best_score = other.best_score
+
+    def get_win_rate(self):
+        # Процент побед
+        return (self.wins / self.games) * 100 if self.games > 0 else 0
+
+    def to_dict(self):
+        # Словарь для сохранения в JSON
+        return {
+            "games": self.games,
+            "wins": self.wins,
+            "losses": self.losses,
+            "draws": self.draws,
+            "score_sum": self.score_sum,
+            "best_score": self.best_score
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Восстанавливает счетчики из словаря
+        return cls(**data)
+
+
+class StatsAggregate:
+    # Сводная статистика: итог, разбивка по уровням и по игрокам
+
+    VERSION = 1
+
+    def __init__(self):
+        # Пустой агрегат
+        self.total = StatsBucket()
+        self.levels = {}
+        self.players = {}
+        self.marker = None
+
+    def add(self, result):
+        # Учитывает один результат игры
+        self.add_entry(*get_entry(result))
+
+    def add_entry(self, level, player, score):
+        # Учитывает игру по записи журнала изменений (см. get_entry)
+        self.total.add(score)
+        self.levels.setdefault(level, StatsBucket()).add(score)
+        self.players.setdefault(player, StatsBucket()).add(score)
+
+    def merge(self, other):
+        # Добавляет другой агрегат (например, итоги другого дня)
+        self.total.merge(other.total)
+        for name, bucket in other.levels.items():
+            self.levels.setdefault(name, StatsBucket()).merge(bucket)
+        for name, bucket in other.players.items():
+            self.players.setdefault(name, StatsBucket()).merge(bucket)
+        return self
+
+    @classmethod
+    def from_results(cls, results):
+        # Строит агрегат одним проходом по потоку результатов
+        aggregate = cls()
+        for result in results:
+            aggregate.add(result)
+        return aggregate
+
+    def to_dict(self):
+        # Словарь для сохранения в JSON
+        return {
+            "version": self.VERSION,
+            "marker": self.marker,
+            "total": self.total.to_dict(),
+            "levels": {name: bucket.to_dict() for name, bucket in self.levels.items()},
+            "players": {name: bucket.to_dict() for name, bucket in self.players.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Восстанавливает агрегат из словаря; None, если версия формата не совпадает
+        if data.get("version") != cls.VERSION:
+            return None
+        aggregate = cls()
+        aggregate.marker = data.get("marker")
+        aggregate.total = StatsBucket.from_dict(data["total"])
+        aggregate.levels = {name: StatsBucket.from_dict(b) for name, b in data["levels"].items()}
+        aggregate.players = {name: StatsBucket.from_dict(b) for name, b in data["players"].items()}
+        return aggregate
+
+
+def get_entry(result):
+    # Запись журнала изменений для результата: уровень, игрок и счет
+    return [result.get('Уровень игры', 'Неизвестно'), result.get('Игрок', 'Неизвестно'), result.get('Итоговый счет', 0)]
+
+
+def get_stats_file(results_file):
+    # Путь к файлу агрегата для указанного файла результатов
+    return os.path.splitext(results_file)[0] + ".stats.json"
+
+
+def load_aggregate(stats_file):
+    # Загружает агрегат из снимка и журнала изменений; None, если файла нет или он поврежден
+    loaded = load_snapshot(stats_file)
+    if loaded is None:
+        return None
+    snapshot, deltas = loaded
+    try:
+        aggregate = StatsAggregate.from_dict(snapshot)
+        if aggregate is not None:
+            for delta in deltas:
+                for entry in delta["add"]:
+                    aggregate.add_entry(*entry)
+                aggregate.marker = delta["marker"]
+        return aggregate
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def save_aggregate(stats_file, aggregate):
+    # Атомарно сохраняет снимок агрегата целиком и сбрасывает журнал изменений
+    save_snapshot(stats_file, aggregate.to_dict())
+
+
+def append_aggregate(stats_file, aggregate, results):
+    # Дописывает в журнал изменений результаты, уже учтенные в aggregate, и его новую метку;
+    # снимок переписывается, только если журнал пора свернуть
+    delta = {"marker": aggregate.marker, "add": [get_entry(result) for result in results]}
+    if not append_delta(stats_file, delta, DELTA_LOG_MAX_BYTES):
+        save_aggregate(stats_file, aggregate)
+
+
+def main():
+    # Пересчет агрегата из журнала: python -m game.stats --rebuild
+    from .score import ScoreManager
+
+    parser = argparse.ArgumentParser(description="Статистика результатов игры 'КОСТИ'")
+    parser.add_argument("results_file", nargs="?", default=RESULTS_FILE, help="файл результатов")
+    parser.add_argument("--rebuild", action="store_true", help="пересчитать агрегат из журнала")
+    args = parser.parse_args()
+
+    score_manager = ScoreManager(args.results_file)
+    if args.rebuild:
+        score_manager.rebuild_statistics()
+        print(f"Статистика пересчитана: {score_manager.stats_file}")
+    score_manager._show_statistics()
+
+
+if __name__ == "__main__":
+    main()
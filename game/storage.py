@@ -0,0 +1,441 @@
+# Хранилища результатов игры
+# Абстрактный класс ResultStorage и журнал JsonLinesStorage с дозаписью в конец файла
+# Несколько процессов могут писать в одно хранилище: изменения идут под эксклюзивной блокировкой файла
+# <хранилище>.lock, индекс читается под разделяемой (читатели не ждут друг друга, только писателей),
+# а потоковое чтение журнала обходится без блокировки - недописанная последняя строка просто пропускается
+
+import json
+import os
+import shutil
+import struct
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from .settings import RESULTS_FILE, RESULTS_BACKEND, RESULTS_DB_FILE, LEGACY_MIGRATION_BATCH
+from .exceptions import LegacyFormatError
+from .fileutil import open_atomic, write_atomic, write_all, iter_batches, warn, has_torn_tail
+from .legacy import iter_legacy_results
+from .metrics import timer, count, observe
+
+try:
+    import fcntl
+except ImportError:
+    # Без fcntl (Windows) блокировка защищает только потоки одного процесса
+    fcntl = None
+
+
+# Индекс журнала: заголовок с размером проиндексированной части и смещения записей по дате
+INDEX_HEADER = struct.Struct('<Q')
+INDEX_ENTRY = struct.Struct('<Q')
+
+
+class FileLock:
+    # Повторно входимая эксклюзивная блокировка: fcntl.flock между процессами и RLock между потоками
+
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.owner = None
+        self.fd = None
+
+    def is_owned(self):
+        # Держит ли блокировку текущий поток
+        return self.owner == threading.get_ident()
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0 and fcntl is not None:
+            try:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                with timer("storage.lock_wait"):
+                    fcntl.flock(self.fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self.fd is not None:
+                    os.close(self.fd)
+                    self.fd = None
+                self.thread_lock.release()
+                raise
+        self.depth += 1
+        self.owner = threading.get_ident()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if self.depth == 0:
+            self.owner = None
+            if self.fd is not None:
+                # Закрытие дескриптора снимает блокировку
+                os.close(self.fd)
+                self.fd = None
+        self.thread_lock.release()
+
+
+class SharedFileLock:
+    # Повторно входимая разделяемая блокировка для чтения: у каждого потока свой дескриптор с LOCK_SH,
+    # поэтому читатели не ждут друг друга, а писатель под эксклюзивной блокировкой exclusive ждет их всех.
+    # Поток, который уже держит exclusive, читает под ней. Повышать разделяемую до эксклюзивной нельзя:
+    # поток ждал бы сам себя
+
+    def __init__(self, exclusive):
+        self.exclusive = exclusive
+        self.local = threading.local()
+
+    def __enter__(self):
+        state = self.local
+        depth = getattr(state, 'depth', 0)
+        if depth == 0:
+            state.fd = None
+            if fcntl is None or self.exclusive.is_owned():
+                # Без fcntl читателей от писателей других потоков защищает только RLock
+                self.exclusive.__enter__()
+                state.nested = True
+            else:
+                state.nested = False
+                fd = os.open(self.exclusive.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    with timer("storage.lock_wait"):
+                        fcntl.flock(fd, fcntl.LOCK_SH)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                state.fd = fd
+        state.depth = depth + 1
+        return self
+
+    def __exit__(self, *exc_info):
+        state = self.local
+        state.depth -= 1
+        if state.depth == 0:
+            if state.nested:
+                self.exclusive.__exit__(*exc_info)
+            else:
+                os.close(state.fd)
+                state.fd = None
+
+
+class ResultStorage(ABC):
+    # Абстрактный класс для хранилищ результатов
+
+    @abstractmethod
+    def append(self, result):
+        # Добавляет один результат в хранилище
+        pass
+
+    @abstractmethod
+    def iter_results(self):
+        # Потоково отдает результаты в порядке сохранения
+        pass
+
+    @abstractmethod
+    def get_location(self):
+        # Возвращает описание места хранения для сообщений пользователю
+        pass
+
+    def append_many(self, results):
+        # Добавляет несколько результатов (по умолчанию по одному)
+        for result in results:
+            self.append(result)
+
+    def get_marker(self):
+        # Метка состояния хранилища для проверки агрегатов; None - хранилище ее не поддерживает
+        return None
+
+    def lock(self, shared=False):
+        # Эксклюзивная блокировка хранилища для чтения-изменения-записи из нескольких процессов;
+        # shared=True - разделяемая для чтения, под ней нельзя брать эксклюзивную
+        if getattr(self, '_lock', None) is None:
+            self._lock = FileLock(f"{self.get_location()}.lock")
+            self._shared_lock = SharedFileLock(self._lock)
+        return self._shared_lock if shared else self._lock
+
+    def count(self):
+        # Количество результатов (по умолчанию полным проходом)
+        return sum(1 for _ in self.iter_results())
+
+    def build_statistics(self):
+        # Агрегат статистики силами хранилища (например, из сводок); None - считать полным проходом
+        return None
+
+    def read_page(self, start, limit):
+        # Результаты с позиции start в порядке от новых к старым (по умолчанию сортировкой всего)
+        results = list(self.iter_results())
+        results.sort(key=lambda x: x.get('Дата', ''), reverse=True)
+        return results[start:start + limit]
+
+
+class JsonLinesStorage(ResultStorage):
+    # Журнал результатов в формате JSON Lines: одна строка - одна игра
+    # Сохранение дописывает строку в конец файла и не перечитывает историю
+
+    def __init__(self, log_file=None, legacy_file=RESULTS_FILE):
+        # Инициализация журнала; по умолчанию журнал лежит рядом со старым файлом
+        self.legacy_file = legacy_file
+        self.log_file = log_file or get_log_file(legacy_file)
+        self.index_file = f"{self.log_file}.idx"
+        # Отметка о том, что старый JSON-массив не удалось перенести и перенос нужно повторить
+        self.pending_file = f"{self.log_file}.pending"
+        self.migration_failed = False
+
+    def get_location(self):
+        # Возвращает путь к журналу
+        return self.log_file
+
+    def append(self, result):
+        # Дописывает один результат в журнал
+        self.append_many([result])
+
+    def append_many(self, results):
+        # Дописывает результаты одной операцией записи с fsync
+        data = "".join(encode_result(result) for result in results).encode("utf-8")
+        if not data:
+            return
+        self._ensure_migrated()
+        with self.lock(), timer("storage.append"):
+            fd = os.open(self.log_file, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if has_torn_tail(fd):
+                    # Недописанная строка после сбоя: без перевода строки новая запись склеилась бы с ней
+                    # и тоже потерялась. Строка завершается (целая запись без "\n" снова читается),
+                    # а индекс строится заново, так как мог пропустить ее
+                    count("storage.torn_tails")
+                    data = b"\n" + data
+                    if os.path.exists(self.index_file):
+                        os.remove(self.index_file)
+                write_all(fd, data)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        observe("storage.bytes_written", len(data))
+
+    def get_marker(self):
+        # Размер журнала в байтах: меняется при каждой дозаписи
+        self._ensure_migrated()
+        try:
+            return os.path.getsize(self.log_file)
+        except FileNotFoundError:
+            return 0
+
+    def iter_results(self):
+        # Потоково читает журнал, не собирая список в памяти
+        self._ensure_migrated()
+        parsed = 0
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as file:
+                for line in file:
+                    result = decode_result(line)
+                    if result is not None:
+                        parsed += 1
+                        yield result
+        except FileNotFoundError:
+            return
+        finally:
+            count("storage.records_parsed", parsed)
+
+    def count(self):
+        # Количество результатов по индексу без чтения журнала
+        with self._index_lock():
+            return (os.path.getsize(self.index_file) - INDEX_HEADER.size) // INDEX_ENTRY.size
+
+    def read_page(self, start, limit):
+        # Читает только запрошенную страницу: смещения берутся из индекса, строки - из журнала
+        # Индекс читается под разделяемой блокировкой, чтобы другой процесс не дописывал его в это время
+        with self._index_lock():
+            total = (os.path.getsize(self.index_file) - INDEX_HEADER.size) // INDEX_ENTRY.size
+            end = max(total - start, 0)
+            begin = max(end - limit, 0)
+            if begin >= end:
+                return []
+            with open(self.index_file, 'rb') as index:
+                index.seek(INDEX_HEADER.size + begin * INDEX_ENTRY.size)
+                data = index.read((end - begin) * INDEX_ENTRY.size)
+        offsets = [entry[0] for entry in INDEX_ENTRY.iter_unpack(data)]
+        results = []
+        with open(self.log_file, 'rb') as log:
+            for offset in reversed(offsets):
+                log.seek(offset)
+                result = decode_result(log.readline().decode('utf-8'))
+                if result is not None:
+                    results.append(result)
+        return results
+
+    @contextmanager
+    def _index_lock(self):
+        # Блокировка для чтения индекса: разделяемая, если индекс уже соответствует журналу (обычный случай),
+        # иначе эксклюзивная - индекс сначала дописывается или строится заново
+        self._ensure_migrated()
+        with self.lock(shared=True):
+            current = self._is_index_current()
+            if current:
+                yield
+        if not current:
+            with self.lock():
+                self._ensure_index()
+                yield
+
+    def _is_index_current(self):
+        # Покрывает ли индекс весь журнал; только читает файлы, так как вызывается под разделяемой блокировкой
+        try:
+            with open(self.index_file, 'rb') as index:
+                header = index.read(INDEX_HEADER.size)
+            log_size = os.path.getsize(self.log_file)
+        except FileNotFoundError:
+            return False
+        return len(header) == INDEX_HEADER.size and INDEX_HEADER.unpack(header)[0] == log_size
+
+    def _ensure_index(self):
+        # Приводит индекс в соответствие с журналом: дописывает новые записи или строит заново
+        self._ensure_migrated()
+        log_size = self.get_marker()
+        try:
+            with open(self.index_file, 'r+b') as index:
+                header = index.read(INDEX_HEADER.size)
+                if len(header) == INDEX_HEADER.size:
+                    indexed_size = INDEX_HEADER.unpack(header)[0]
+                    if indexed_size == log_size:
+                        return
+                    if indexed_size < log_size and self._extend_index(index, indexed_size, log_size):
+                        return
+        except FileNotFoundError:
+            pass
+        self._rebuild_index(log_size)
+
+    def _extend_index(self, index, indexed_size, log_size):
+        # Дописывает в индекс записи, появившиеся в журнале после indexed_size
+        # Возвращает False, если новые записи старше уже проиндексированных
+        last_date = None
+        index.seek(0, os.SEEK_END)
+        if index.tell() > INDEX_HEADER.size:
+            index.seek(-INDEX_ENTRY.size, os.SEEK_END)
+            last_date = self._read_date(INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))[0])
+        entries = []
+        for offset, result in self._scan_log(indexed_size, log_size):
+            date = result.get('Дата', '')
+            if last_date is not None and date < last_date:
+                return False
+            last_date = date
+            entries.append(offset)
+        index.seek(0, os.SEEK_END)
+        index.write(b"".join(INDEX_ENTRY.pack(offset) for offset in entries))
+        index.seek(0)
+        index.write(INDEX_HEADER.pack(log_size))
+        return True
+
+    def _rebuild_index(self, log_size):
+        # Строит индекс заново: смещения записей, отсортированные по (дата, позиция в журнале)
+        count("storage.index_rebuilds")
+        entries = [(result.get('Дата', ''), offset) for offset, result in self._scan_log(0, log_size)]
+        entries.sort()
+        data = INDEX_HEADER.pack(log_size) + b"".join(INDEX_ENTRY.pack(offset) for _, offset in entries)
+        write_atomic(self.index_file, data)
+
+    def _scan_log(self, start, end):
+        # Отдает (смещение, результат) для записей журнала в диапазоне байтов [start, end)
+        try:
+            with open(self.log_file, 'rb') as log:
+                log.seek(start)
+                offset = start
+                while offset < end:
+                    line = log.readline()
+                    if not line:
+                        break
+                    result = decode_result(line.decode('utf-8'))
+                    if result is not None:
+                        yield offset, result
+                    offset += len(line)
+        except FileNotFoundError:
+            return
+
+    def _read_date(self, offset):
+        # Дата записи журнала по смещению
+        with open(self.log_file, 'rb') as log:
+            log.seek(offset)
+            result = decode_result(log.readline().decode('utf-8'))
+        return result.get('Дата', '') if result else ''
+
+    def _ensure_migrated(self):
+        # Однократно переносит результаты из старого JSON-массива в журнал.
+        # Если массив не прочитался, остается отметка pending_file: журнал для новых результатов создается,
+        # а перенос повторяется (не чаще раза на экземпляр), пока файл не исправят; история встает перед журналом
+        if self.migration_failed or not os.path.exists(self.legacy_file):
+            return
+        if os.path.exists(self.log_file) and not os.path.exists(self.pending_file):
+            return
+        with self.lock():
+            # Другой процесс мог перенести историю, пока мы ждали блокировку
+            log_exists = os.path.exists(self.log_file)
+            if log_exists and not os.path.exists(self.pending_file):
+                return
+            # Массив читается потоково пачками: память не зависит от размера истории,
+            # поврежденные записи пропускаются с предупреждением
+            try:
+                with open_atomic(self.log_file) as log:
+                    for batch in iter_batches(iter_legacy_results(self.legacy_file), LEGACY_MIGRATION_BATCH):
+                        log.write("".join(encode_result(r) for r in batch).encode("utf-8"))
+                    if log_exists:
+                        # Результаты, сохраненные, пока история не читалась
+                        with open(self.log_file, 'rb') as saved:
+                            shutil.copyfileobj(saved, log)
+            except LegacyFormatError as error:
+                self.migration_failed = True
+                warn(f"История не перенесена: {error}")
+                if not os.path.exists(self.pending_file):
+                    write_atomic(self.pending_file, b"")
+                return
+            if log_exists:
+                # Смещения записей сдвинулись
+                if os.path.exists(self.index_file):
+                    os.remove(self.index_file)
+                os.remove(self.pending_file)
+
+
+def create_storage(results_file=RESULTS_FILE, backend=RESULTS_BACKEND):
+    # Создает хранилище выбранного типа для указанного файла результатов
+    if backend == "jsonl":
+        return JsonLinesStorage(legacy_file=results_file)
+    if backend == "segments":
+        from .segments import SegmentedStorage
+        return SegmentedStorage(legacy_file=results_file)
+    if backend == "sqlite":
+        from .sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage(get_db_file(results_file))
+        with storage.lock():
+            if storage.count() == 0:
+                # Новая база: однократно импортируем историю из журнала или старого JSON-массива
+                log_storage = JsonLinesStorage(legacy_file=results_file)
+                if os.path.exists(log_storage.log_file):
+                    storage.import_results(log_storage.iter_results())
+                elif os.path.exists(results_file):
+                    storage.import_json(results_file)
+        return storage
+    raise ValueError(f"Неизвестный тип хранилища: {backend}")
+
+
+def get_log_file(results_file):
+    # Путь к журналу JSON Lines для указанного файла результатов
+    return os.path.splitext(results_file)[0] + ".jsonl"
+
+
+def get_db_file(results_file):
+    # Путь к базе SQLite для указанного файла результатов: для файла из настроек - RESULTS_DB_FILE
+    if results_file == RESULTS_FILE:
+        return RESULTS_DB_FILE
+    return os.path.splitext(results_file)[0] + ".db"
+
+
+def encode_result(result):
+    # Кодирует результат в строку журнала
+    return json.dumps(result, ensure_ascii=False) + "\n"
+
+
+def decode_result(line):
+    # Декодирует строку журнала; недописанные и поврежденные строки пропускаются
+    if not line.endswith("\n"):
+        return None
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
@@ -0,0 +1,144 @@
+# Стратегии бросков кубика для участников игры
+# Абстрактный класс DiceStrategy и варианты: честный, взвешенный, с гандикапом и адаптивный кубик
+# Стратегия задает веса граней одного кубика из FACES; с правилами game.rules значение броска
+# из нескольких кубиков берется по таблице для этих весов. Если у кубика правил другое число граней,
+# подходит только честный кубик (check_ruleset)
+
+import random
+from abc import ABC, abstractmethod
+from itertools import accumulate
+from .settings import DICE_MIN, DICE_MAX
+
+# Грани кубика
+FACES = list(range(DICE_MIN, DICE_MAX + 1))
+
+
+class DiceStrategy(ABC):
+    # Абстрактная стратегия: распределение граней, возможно зависящее от отрыва по счету
+
+    # Зависит ли распределение от счета (такие стратегии нельзя бросать пачкой)
+    adaptive = False
+
+    def __init__(self, name):
+        # Инициализация стратегии
+        self.name = name
+
+    @abstractmethod
+    def get_weights(self, lead=0):
+        # Веса граней FACES при отрыве lead (свой счет минус счет соперника)
+        pass
+
+    def roll(self, rng=random, lead=0, ruleset=None):
+        # Один бросок одного кубика или значение броска по правилам ruleset
+        if ruleset is not None:
+            return ruleset.roll(rng, self.get_weights(lead))
+        return rng.choices(FACES, weights=self.get_weights(lead))[0]
+
+    def roll_many(self, rng, count, ruleset=None):
+        # Пачка бросков одним вызовом (только для неадаптивных стратегий)
+        if ruleset is not None:
+            return ruleset.roll_many(rng, count, self.get_weights())
+        return rng.choices(FACES, cum_weights=list(accumulate(self.get_weights())), k=count)
+
+    def supports(self, ruleset):
+        # Подходит ли стратегия к правилам: веса задаются для граней FACES
+        return ruleset is None or ruleset.faces == len(FACES)
+
+    def check_ruleset(self, ruleset):
+        # Проверка до начала игры: иначе первый же бросок упадет на таблице весов граней
+        if not self.supports(ruleset):
+            raise ValueError(f"Стратегия {self.name} задает веса {len(FACES)} граней и не подходит к правилам "
+                             f"{ruleset.name} ({ruleset.faces} граней); с этими правилами подходит только fair")
+
+    def __str__(self):
+        # Название стратегии
+        return self.name
+
+
+class FairDie(DiceStrategy):
+    # Честный кубик, как GameParticipant.roll_dice по умолчанию
+
+    def __init__(self, name="fair"):
+        super().__init__(name)
+
+    def get_weights(self, lead=0):
+        # Равные веса
+        return [1] * len(FACES)
+
+    def supports(self, ruleset):
+        # Честный кубик подходит к любым правилам
+        return True
+
+    def roll(self, rng=random, lead=0, ruleset=None):
+        # Один бросок без подсчета весов
+        if ruleset is not None:
+            return ruleset.roll(rng)
+        return rng.randint(DICE_MIN, DICE_MAX)
+
+    def roll_many(self, rng, count, ruleset=None):
+        # Пачка бросков по таблице честных кубиков правил
+        if ruleset is not None:
+            return ruleset.roll_many(rng, count)
+        return super().roll_many(rng, count)
+
+
+class WeightedDie(DiceStrategy):
+    # Кубик с заданными весами граней
+
+    def __init__(self, weights, name="weighted"):
+        super().__init__(name)
+        if len(weights) != len(FACES):
+            raise ValueError(f"Нужно {len(FACES)} весов граней")
+        self.weights = list(weights)
+
+    def get_weights(self, lead=0):
+        # Заданные веса
+        return self.weights
+
+
+class HandicapDie(DiceStrategy):
+    # Честный кубик, сдвинутый на offset граней с упором в края (offset < 0 - гандикап)
+
+    def __init__(self, offset, name=None):
+        super().__init__(name or f"handicap{offset:+d}")
+        self.weights = [0] * len(FACES)
+        for index in range(len(FACES)):
+            self.weights[min(max(index + offset, 0), len(FACES) - 1)] += 1
+
+    def get_weights(self, lead=0):
+        # Веса сдвинутого кубика
+        return self.weights
+
+
+class AdaptiveDie(DiceStrategy):
+    # Адаптивная сложность: при отставании кубик смещается к большим граням, при отрыве - к малым
+
+    adaptive = True
+
+    def __init__(self, strength=0.05, name="adaptive"):
+        super().__init__(name)
+        self.strength = strength
+
+    def get_weights(self, lead=0):
+        # Линейный наклон весов, пропорциональный отставанию
+        tilt = max(-0.9, min(0.9, -lead * self.strength))
+        middle = (len(FACES) - 1) / 2
+        return [1 + tilt * (index - middle) / middle for index in range(len(FACES))]
+
+
+# Встроенные стратегии по названиям (используются в настройках и турнирах)
+STRATEGIES = {
+    "fair": FairDie(),
+    "handicap-1": HandicapDie(-1),
+    "handicap+1": HandicapDie(1),
+    "low-weighted": WeightedDie([2, 2, 1, 1, 1, 1], "low-weighted"),
+    "high-weighted": WeightedDie([1, 1, 1, 1, 2, 2], "high-weighted"),
+    "adaptive": AdaptiveDie()
+}
+
+
+def get_strategy(name):
+    # Стратегия по названию
+    if name not in STRATEGIES:
+        raise ValueError(f"Неизвестная стратегия: {name}")
+    return STRATEGIES[name]
@@ -0,0 +1,185 @@
+# Турнир стратегий кубика
+# Круговой турнир на скорости симуляции: пакетные броски, пул процессов, рейтинг с доверительными интервалами
+
+import argparse
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, combinations
+from .settings import GAME_LEVELS, RULESET, get_level_name
+from .rules import get_ruleset, RULESET_TABLES
+from .strategies import STRATEGIES, get_strategy
+from .rng import derive_seed
+
+# Размер шарда игр одной пары и пачки бросков
+TOURNAMENT_SHARD = 50_000
+ROLL_BATCH = 4096
+
+# Квантиль нормального распределения для 95% доверительного интервала
+CONFIDENCE_Z = 1.96
+
+
+class MatchResult:
+    # Итоги игр пары стратегий: победы, поражения и ничьи первой стратегии
+
+    def __init__(self, wins=0, losses=0, draws=0):
+        self.wins = wins
+        self.losses = losses
+        self.draws = draws
+
+    def merge(self, other):
+        # Добавляет итоги другого шарда
+        self.wins += other.wins
+        self.losses += other.losses
+        self.draws += other.draws
+        return self
+
+    def get_games(self):
+        # Количество игр
+        return self.wins + self.losses + self.draws
+
+
+class StrategyStanding:
+    # Место стратегии в турнире: очки (победа - 1, ничья - 0.5) и доверительный интервал
+
+    def __init__(self, name):
+        self.name = name
+        self.result = MatchResult()
+
+    def get_score_rate(self):
+        # Средние очки за игру
+        games = self.result.get_games()
+        return (self.result.wins + 0.5 * self.result.draws) / games if games else 0
+
+    def get_confidence_interval(self):
+        # 95% доверительный интервал средних очков за игру
+        games = self.result.get_games()
+        if not games:
+            return 0, 0
+        rate = self.get_score_rate()
+        second_moment = (self.result.wins + 0.25 * self.result.draws) / games
+        margin = CONFIDENCE_Z * math.sqrt(max(second_moment - rate * rate, 0) / games)
+        return rate - margin, rate + margin
+
+
+def make_roller(strategy, rng, ruleset):
+    # Функция броска от отрыва; неадаптивные стратегии бросают пачками по ROLL_BATCH
+    strategy.check_ruleset(ruleset)
+    if strategy.adaptive:
+        return lambda lead: strategy.roll(rng, lead, ruleset)
+    supply = chain.from_iterable(iter(lambda: strategy.roll_many(rng, ROLL_BATCH, ruleset), None))
+    return lambda lead: next(supply)
+
+
+def play_match(first_name, second_name, games, rounds_total, seed, rules=RULESET):
+    # Играет games игр: первая стратегия за игрока, вторая за компьютера
+    rng = random.Random(seed)
+    ruleset = get_ruleset(rules)
+    resolve = ruleset.resolve
+    roll_first = make_roller(get_strategy(first_name), rng, ruleset)
+    roll_second = make_roller(get_strategy(second_name), rng, ruleset)
+    result = MatchResult()
+    for _ in range(games):
+        score = 0
+        for _ in range(rounds_total):
+            delta = None
+            while delta is None:
+                delta = resolve(roll_first(score), roll_second(-score))
+            score += delta
+        if score > 0:
+            result.wins += 1
+        elif score < 0:
+            result.losses += 1
+        else:
+            result.draws += 1
+    return result
+
+
+def _run_shard(shard):
+    # Проводит один шард матча в процессе-исполнителе
+    first_name, second_name, games, rounds_total, seed, rules = shard
+    return first_name, second_name, play_match(first_name, second_name, games, rounds_total, seed, rules)
+
+
+class Tournament:
+    # Круговой турнир стратегий на одном уровне из GAME_LEVELS
+
+    def __init__(self, strategy_names=None, level_choice="1", workers=None, master_seed=0, rules=RULESET):
+        # По умолчанию участвуют все встроенные стратегии, подходящие к правилам; rules - правила из RULESETS
+        ruleset = get_ruleset(rules)
+        if strategy_names:
+            for name in strategy_names:
+                get_strategy(name).check_ruleset(ruleset)
+            self.strategy_names = list(strategy_names)
+        else:
+            self.strategy_names = [name for name, strategy in STRATEGIES.items() if strategy.supports(ruleset)]
+        if len(self.strategy_names) < 2:
+            raise ValueError(f"Для турнира нужны хотя бы две стратегии, подходящие к правилам {rules}")
+        self.level_choice = level_choice
+        self.rounds_total = GAME_LEVELS[level_choice]
+        self.workers = workers
+        self.master_seed = master_seed
+        self.rules = rules
+
+    def make_shards(self, games_per_pair):
+        # Шарды для всех пар стратегий
+        shards = []
+        for first_name, second_name in combinations(self.strategy_names, 2):
+            for index, start in enumerate(range(0, games_per_pair, TOURNAMENT_SHARD)):
+                seed = derive_seed(self.master_seed, self.level_choice, first_name, second_name, index)
+                games = min(TOURNAMENT_SHARD, games_per_pair - start)
+                shards.append((first_name, second_name, games, self.rounds_total, seed, self.rules))
+        return shards
+
+    def run(self, games_per_pair):
+        # Возвращает (итоги пар, рейтинг стратегий по убыванию средних очков)
+        matches = {}
+        shards = self.make_shards(games_per_pair)
+        if self.workers == 1:
+            self._merge(matches, map(_run_shard, shards))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                self._merge(matches, executor.map(_run_shard, shards))
+
+        standings = {name: StrategyStanding(name) for name in self.strategy_names}
+        for (first_name, second_name), result in matches.items():
+            standings[first_name].result.merge(result)
+            standings[second_name].result.merge(MatchResult(result.losses, result.wins, result.draws))
+        ranking = sorted(standings.values(), key=lambda standing: -standing.get_score_rate())
+        return matches, ranking
+
+    def _merge(self, matches, partials):
+        # Складывает итоги шардов по парам
+        for first_name, second_name, partial in partials:
+            matches.setdefault((first_name, second_name), MatchResult()).merge(partial)
+
+
+def main():
+    # Запуск из командной строки: python -m game.tournament --games 100000 --level 2
+    parser = argparse.ArgumentParser(description="Турнир стратегий кубика 'КОСТИ'")
+    parser.add_argument("--games", type=int, default=100_000, help="игр на каждую пару стратегий")
+    parser.add_argument("--level", default="1", choices=list(GAME_LEVELS), help="уровень из GAME_LEVELS")
+    parser.add_argument("--strategies", nargs="*", default=None, help="названия стратегий")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов")
+    parser.add_argument("--seed", type=int, default=0, help="мастер-сид")
+    parser.add_argument("--rules", default=RULESET, choices=list(RULESET_TABLES), help="правила из RULESETS")
+    args = parser.parse_args()
+
+    try:
+        tournament = Tournament(args.strategies, args.level, args.workers, args.seed, args.rules)
+    except ValueError as e:
+        parser.error(str(e))
+    matches, ranking = tournament.run(args.games)
+    print(f"Уровень: {get_level_name(tournament.rounds_total)} ({tournament.rounds_total} раундов)")
+    print(f"Правила: {get_ruleset(args.rules).describe()}")
+    print("\nМатчи (победы-поражения-ничьи первой стратегии):")
+    for (first_name, second_name), result in matches.items():
+        print(f"  {first_name:>14} - {second_name:<14} {result.wins}-{result.losses}-{result.draws}")
+    print("\nРейтинг (средние очки за игру, 95% интервал):")
+    for place, standing in enumerate(ranking, 1):
+        low, high = standing.get_confidence_interval()
+        print(f"{place:2}. {standing.name:14} {standing.get_score_rate():.4f} [{low:.4f}; {high:.4f}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Векторизованная симуляция игр на NumPy
+# Разыгрывает раунды матрицами "игры x раунды" по таблице исхода раунда правил game.rules
+# (одна выборка исходов и одна выборка чисел бросков) и сводит результаты операциями над массивами
+
+from .settings import GAME_LEVELS
+from .simulator import SimulationResult
+from .rules import get_ruleset
+from .exceptions import InvalidInputError
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Сколько игр обрабатывается за один проход, чтобы ограничить расход памяти
+CHUNK_GAMES = 200_000
+
+
+class VectorSimulationResult(SimulationResult):
+    # Результаты векторной симуляции: scores и throws - массивы NumPy
+
+    def count_outcomes(self):
+        # Количество побед, поражений и ничьих без цикла по играм
+        wins = int(np.count_nonzero(self.scores > 0))
+        losses = int(np.count_nonzero(self.scores < 0))
+        return wins, losses, len(self.scores) - wins - losses
+
+
+class VectorSimulator:
+    # Симулятор с теми же правилами, что и Simulator, но для тысяч игр сразу
+
+    def __init__(self, seed=None, ruleset=None):
+        # Инициализация генератора NumPy и таблиц правил (по умолчанию RULESET)
+        if np is None:
+            raise ImportError("Для векторной симуляции нужен пакет numpy")
+        self.generator = np.random.default_rng(seed)
+        self.ruleset = ruleset or get_ruleset()
+        self.delta_values = np.array(self.ruleset.delta_values, dtype=np.int32)
+        self.delta_cum_probabilities = np.array(self.ruleset.delta_cum_probabilities)
+        self.decided_probability = 1 - float(self.ruleset.tie_probability)
+
+    def resolve_rounds(self, games, rounds_total):
+        # Возвращает (изменения счета, число бросков) для каждой клетки игра x раунд
+        # Исход раунда берется по накопленным вероятностям, число бросков до исхода - геометрическое
+        shape = (games, rounds_total)
+        indexes = np.searchsorted(self.delta_cum_probabilities, self.generator.random(shape), side="right")
+        deltas = self.delta_values[np.minimum(indexes, len(self.delta_values) - 1)]
+        throws = self.generator.geometric(self.decided_probability, size=shape)
+        return deltas, throws
+
+    def play_games(self, games, rounds_total):
+        # Проводит games игр и возвращает (итоговые счета, числа бросков)
+        deltas, throws = self.resolve_rounds(games, rounds_total)
+        return deltas.sum(axis=1, dtype=np.int32), throws.sum(axis=1, dtype=np.int32)
+
+    def run(self, games, level_choice="1"):
+        # Проводит games игр выбранного уровня из GAME_LEVELS частями по CHUNK_GAMES
+        if level_choice not in GAME_LEVELS:
+            raise InvalidInputError(f"Неизвестный уровень игры: {level_choice}")
+        rounds_total = GAME_LEVELS[level_choice]
+        scores = np.empty(games, dtype=np.int32)
+        throws = np.empty(games, dtype=np.int32)
+        for start in range(0, games, CHUNK_GAMES):
+            end = min(start + CHUNK_GAMES, games)
+            scores[start:end], throws[start:end] = self.play_games(end - start, rounds_total)
+        return VectorSimulationResult(level_choice, rounds_total, scores, throws)
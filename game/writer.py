@@ -0,0 +1,102 @@
+# Буферизованная запись результатов
+# Класс BufferedResultWriter копит результаты и сохраняет их пачками: одна запись и один fsync на пачку.
+# Фоновый поток ничего не выводит (stdout - буфер кадра основного потока): ошибка записи учитывается в метриках
+# и показывается основным потоком через take_error
+
+import atexit
+import threading
+from .settings import RESULTS_BATCH_SIZE, RESULTS_FLUSH_INTERVAL
+from .exceptions import StatisticsUpdateError
+from .metrics import count
+
+
+class BufferedResultWriter:
+    # Очередь результатов с групповой фиксацией по размеру пачки или по времени
+
+    def __init__(self, score_manager, batch_size=RESULTS_BATCH_SIZE, interval=RESULTS_FLUSH_INTERVAL):
+        # Запускает фоновый поток сброса и регистрирует сброс при завершении процесса
+        self.score_manager = score_manager
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = []
+        self.stopping = False
+        self.closed = False
+        # Последняя ошибка фоновой записи и последняя показанная пользователю
+        self.error = None
+        self.reported = None
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, result):
+        # Ставит результат в очередь; полная пачка будит поток сброса
+        with self.condition:
+            self.pending.append(result)
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+
+    def flush(self):
+        # Сохраняет все накопленные результаты одной пачкой
+        with self.flush_lock:
+            with self.condition:
+                batch = self.pending
+                self.pending = []
+            if not batch:
+                return 0
+            try:
+                self.score_manager.save_results(batch)
+            except StatisticsUpdateError:
+                # Пачка уже записана в хранилище: повторная запись продублировала бы результаты
+                raise
+            except Exception:
+                # Пачка не записана: она возвращается в начало очереди, чтобы не потерять результаты
+                with self.condition:
+                    self.pending = batch + self.pending
+                raise
+            with self.condition:
+                self.error = self.reported = None
+            return len(batch)
+
+    def take_error(self):
+        # Ошибка фоновой записи для показа в основном потоке; каждая ошибка возвращается один раз
+        with self.condition:
+            if self.error is None or self.error == self.reported:
+                return None
+            self.reported = self.error
+            return self.error
+
+    def close(self):
+        # Останавливает поток и дописывает очередь. Если запись не удалась, ошибка передается вызывающему,
+        # а очередь остается: повторный close (например, при завершении процесса) попробует снова
+        with self.condition:
+            if self.closed:
+                return
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
+        self.flush()
+        with self.condition:
+            self.closed = True
+        atexit.unregister(self.close)
+
+    def _run(self):
+        # Фоновый цикл: сброс по заполнению пачки или по истечении интервала
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.stopping or len(self.pending) >= self.batch_size,
+                                        timeout=self.interval)
+                if self.stopping:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                # Незаписанная пачка осталась в очереди и будет записана следующим сбросом
+                self._record_error(e)
+
+    def _record_error(self, error):
+        # Запоминает ошибку фоновой записи для основного потока
+        count("results.flush_errors")
+        with self.condition:
+            self.error = str(error)
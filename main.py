@@ -5,6 +5,8 @@ from game.game import Game
 from game.score import ScoreManager
 from game.exceptions import InvalidInputError
 from game.settings import clear
+from game.metrics import metrics, profiler, configure_from_env, PROFILE_CPU, PROFILE_MEMORY
+from game.render import install, header, block
 
 
 class GameController:
@@ -13,37 +15,74 @@ class GameController:
     def __init__(self):
         # Инициализация контроллера
         self.running = True
-        self.score_manager = ScoreManager()
+        configure_from_env()
+        self.renderer = install()
+        self.score_manager = ScoreManager(buffered=True)
     
     def show_menu(self):
         # Отображает главное меню игры
         clear()
-        print("\n" + "="*50)
-        print("           ИГРА 'КОСТИ'")
-        print("="*50)
-        print("1. Играть")
-        print("2. Посмотреть результаты")
-        print("3. Выйти")
-        print("="*50)
+        print(header("           ИГРА 'КОСТИ'", 50))
+        print(block("1. Играть", "2. Посмотреть результаты", "3. Таблица лидеров", "4. Аналитика",
+                    "5. Диагностика", "6. Выйти", "="*50))
     
     def get_menu_choice(self):
         # Получает выбор пользователя из главного меню
-        choice = input("Выберите пункт меню (1-3): ").strip()
-        if choice not in ["1", "2", "3"]:
-            raise InvalidInputError("Неверный выбор! Введите число от 1 до 3.")
+        choice = input("Выберите пункт меню (1-6): ").strip()
+        if choice not in ["1", "2", "3", "4", "5", "6"]:
+            raise InvalidInputError("Неверный выбор! Введите число от 1 до 6.")
         return choice
     
     def handle_play_game(self):
         # Обрабатывает выбор "Играть"
-        game = Game()
+        game = Game(self.score_manager)
         game.start()
     
     def handle_view_results(self):
         # Обрабатывает выбор "Посмотреть результаты"
         self.score_manager.get_results()
     
+    def handle_leaderboard(self):
+        # Обрабатывает выбор "Таблица лидеров"
+        self.score_manager.show_leaderboard()
+    
+    def handle_analytics(self):
+        # Обрабатывает выбор "Аналитика"
+        self.score_manager.show_analytics()
+    
+    def handle_diagnostics(self):
+        # Обрабатывает выбор "Диагностика": метрики и профилирование
+        while True:
+            clear()
+            print(header("           ДИАГНОСТИКА", 50))
+            print(f"Метрики: {'включены' if metrics.enabled else 'выключены'}")
+            print(f"Профилирование: {profiler.mode or 'выключено'}")
+            if self.renderer:
+                stats = self.renderer.get_stats()
+                print(f"Вывод: кадров {stats['frames']}, байт {stats['bytes']}, записей {stats['writes']}")
+            for name, summary in sorted(metrics.to_dict()["histograms"].items()):
+                print(f"  {name:28} n={summary['count']:<6} p50={summary['p50']:.6g} p99={summary['p99']:.6g}")
+            print(block("="*50, "1. Включить/выключить метрики", "2. Сохранить метрики в файл",
+                        "3. Профилирование времени (cProfile)", "4. Профилирование памяти (tracemalloc)",
+                        "5. Остановить профилирование", "6. Назад"))
+            choice = input("Ваш выбор (1-6): ").strip()
+            if choice == "1":
+                metrics.enabled = not metrics.enabled
+            elif choice == "2":
+                print(f"Метрики сохранены в файл {metrics.save()}")
+                input("Нажмите Enter для продолжения...")
+            elif choice in ("3", "4"):
+                profiler.start(PROFILE_CPU if choice == "3" else PROFILE_MEMORY)
+            elif choice == "5":
+                path = profiler.stop()
+                print(f"Отчет сохранен в файл {path}" if path else "Профилирование не запущено.")
+                input("Нажмите Enter для продолжения...")
+            elif choice == "6":
+                break
+    
     def handle_exit(self):
         # Обрабатывает выбор "Выйти"
+        self.score_manager.close()
         clear()
         print("\nСпасибо за игру! До свидания!")
         self.running = False
@@ -60,12 +99,19 @@ class GameController:
                 elif choice == "2":
                     self.handle_view_results()
                 elif choice == "3":
+                    self.handle_leaderboard()
+                elif choice == "4":
+                    self.handle_analytics()
+                elif choice == "5":
+                    self.handle_diagnostics()
+                elif choice == "6":
                     self.handle_exit()
                     
             except InvalidInputError as e:
                 print(f"Ошибка: {e}")
                 input("Нажмите Enter для продолжения...")
             except KeyboardInterrupt:
+                self.score_manager.close()
                 print("\n\nИгра прервана пользователем. До свидания!")
                 self.running = False
             except Exception as e: